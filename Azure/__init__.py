@@ -51,9 +51,13 @@ __contributors__ = {}
 __url__ = "https://github.com/oddluck/limnoria-plugins/"
 
 from . import config
+from . import httpclient
+from . import templatecache
 from . import plugin
 from imp import reload
 
+imp.reload(httpclient)
+imp.reload(templatecache)
 imp.reload(plugin)  # In case we're being reloaded.
 # Add more reloads here if you add third-party modules and want them to be
 # reloaded when this plugin is reloaded.  Don't forget to import them as well!
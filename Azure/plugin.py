@@ -37,19 +37,26 @@ import supybot.log as log
 from supybot.commands import *
 from string import Template
 import json
-import requests
+from . import httpclient
+from . import templatecache
 
 
 class Azure(callbacks.Plugin):
     def __init__(self, irc):
         self.__parent = super(Azure, self)
         self.__parent.__init__(irc)
-        r = requests.get(
+        r = httpclient.get(
             "https://api.cognitive.microsofttranslator.com/languages?api-version=3.0&scope=translation",
             timeout=10,
         )
         self.languages = json.loads(r.content.decode())
         self.languages = self.languages["translation"]
+        self.templates = templatecache.TemplateCache(Template)
+
+    def die(self):
+        self.templates.close()
+        httpclient.close()
+        self.__parent.die()
 
     def translate(self, irc, msg, args, optlist, text):
         """[--from <source>] [--to <target>] <text>
@@ -107,7 +114,7 @@ class Azure(callbacks.Plugin):
         key = self.registryValue("translate.key")
         headers = {"Ocp-Apim-Subscription-Key": key, "Content-type": "application/json"}
         body = [{"text": text}]
-        response = requests.post(url, headers=headers, json=body)
+        response = httpclient.post(url, headers=headers, json=body)
         if not response.status_code == 200:
             log.debug(
                 "Azure: Error accessing {0}: {1}".format(url, response.content.decode())
@@ -115,7 +122,9 @@ class Azure(callbacks.Plugin):
             return
         result = json.loads(response.content.decode())
         if result[0].get("translations"):
-            template = Template(self.registryValue("translate.template", msg.channel))
+            template = self.templates.get_registry(
+                self, "translate.template", msg.channel
+            )
             results = {
                 "text": result[0]["translations"][0]["text"],
                 "targetName": self.languages[target]["name"],
@@ -28,14 +28,14 @@
 # POSSIBILITY OF SUCH DAMAGE.
 ###
 
-import supybot.utils as utils
 from supybot.commands import *
 import supybot.ircmsgs as ircmsgs
 import supybot.callbacks as callbacks
 import random
 import datetime
 import os
-import requests
+from . import configsnapshot
+from . import httpclient
 import json
 
 try:
@@ -58,29 +58,42 @@ class Cayenne(callbacks.Plugin):
     def __init__(self, irc):
         self.__parent = super(Cayenne, self)
         self.__parent.__init__(irc)
+        self.config = configsnapshot.ConfigSnapshots(
+            self,
+            ("enable", "factChance", "linkChance", "throttleInSeconds", "triggerWords"),
+            self.prepare_config,
+        )
+
+    def die(self):
+        self.config.close()
+        httpclient.close()
+        self.__parent.die()
+
+    def prepare_config(self, values):
+        """
+        Converts the numbers and strips the trigger words of a config snapshot
+        """
+        for name in ("factChance", "linkChance", "throttleInSeconds"):
+            values[name] = int(values[name])
+        words = [word.strip() for word in values["triggerWords"]]
+        values["triggerWords"] = tuple(word for word in words if word)
 
     def get_fact(self):
         """
         Get a random cat fact
         """
-        data = requests.get("https://catfact.ninja/fact")
+        data = httpclient.get("https://catfact.ninja/fact")
         data = json.loads(data.content)
         return data["fact"]
 
-    def message_contains_trigger_word(self, message):
+    def message_contains_trigger_word(self, message, words):
         """
         Check prefined list of trigger words and return
         which one was found, if any
         """
-        words = self.registryValue("triggerWords")
-        if words:
-            words = [word.strip() for word in words]
-            if words:
-                for word in words:
-                    if word and word in message:
-                        return word
-            else:
-                self.log.error("Cayenne: no trigger words set apparently")
+        for word in words:
+            if word in message:
+                return word
         return False
 
     def get_link(self):
@@ -89,7 +102,7 @@ class Cayenne(callbacks.Plugin):
         """
         try:
             link_url = self.registryValue("linkURL")
-            response = utils.web.getUrl(link_url).decode("utf8")
+            response = httpclient.get(link_url).text
             # Expecting a link
             if "http" in response:
                 return response
@@ -115,17 +128,17 @@ class Cayenne(callbacks.Plugin):
         is_message_from_self = origin_nick.lower() == bot_nick.lower()
         # Only react to messages/actions in a channel and to messages that aren't from
         # the bot itself.
-        if (
-            is_channel
-            and not is_ctcp
-            and not is_message_from_self
-            and self.registryValue("enable", channel)
-        ):
+        if not is_channel or is_ctcp or is_message_from_self:
+            return
+        config = self.config.get(channel)
+        if config.enable:
             if type(message) is str and len(message):
-                fact_chance = int(self.registryValue("factChance"))
-                link_chance = int(self.registryValue("linkChance"))
-                throttle_seconds = int(self.registryValue("throttleInSeconds"))
-                triggered = self.message_contains_trigger_word(message)
+                fact_chance = config.factChance
+                link_chance = config.linkChance
+                throttle_seconds = config.throttleInSeconds
+                triggered = self.message_contains_trigger_word(
+                    message, config.triggerWords
+                )
                 now = datetime.datetime.now()
                 seconds = 0
                 if self.last_message_timestamp:
@@ -52,9 +52,13 @@ __contributors__ = {}
 __url__ = "https://github.com/oddluck/limnoria-plugins/"
 
 from . import config
+from . import httpclient
+from . import responsecache
 from . import plugin
 from imp import reload
 
+reload(httpclient)
+reload(responsecache)
 reload(plugin)
 reload(config)
 # Add more reloads here if you add third-party modules and want them to be
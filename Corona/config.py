@@ -64,3 +64,15 @@ conf.registerChannelValue(
         ),
     ),
 )
+
+conf.registerGlobalValue(
+    Corona,
+    "cacheLifetime",
+    registry.NonNegativeInteger(
+        600,
+        _(
+            "Time in seconds scraped statistics are reused before scraping"
+            " worldometers.info again. 0 disables the cache."
+        ),
+    ),
+)
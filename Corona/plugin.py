@@ -32,6 +32,8 @@ import requests
 import datetime
 import re
 from bs4 import BeautifulSoup
+from . import httpclient
+from . import responsecache
 from .codes import states, countries
 from supybot import utils, plugins, ircutils, callbacks, log
 from supybot.commands import *
@@ -60,6 +62,16 @@ class Corona(callbacks.Plugin):
         self.top = {}
         self.top["countries"] = []
         self.top["states"] = []
+        # Commands within cacheLifetime of the last scrape reuse its data, and
+        # commands arriving during a scrape wait for it instead of scraping too
+        self.cache = responsecache.ResponseCache()
+        self.get_data = self.cache.wrap(
+            self.get_data, lambda: self.registryValue("cacheLifetime")
+        )
+
+    def die(self):
+        httpclient.close()
+        self.__parent.die()
 
     def time_created(self, time):
         """
@@ -82,7 +94,9 @@ class Corona(callbacks.Plugin):
         headers["states"] = []
         OK = False
         try:
-            r = requests.get("https://www.worldometers.info/coronavirus/", timeout=10)
+            r = httpclient.get(
+                "https://www.worldometers.info/coronavirus/", timeout=10
+            )
             r.raise_for_status()
             OK = True
         except (
@@ -205,7 +219,7 @@ class Corona(callbacks.Plugin):
                             self.countries[item][value]
                         )
             try:
-                r = requests.get(
+                r = httpclient.get(
                     "https://www.worldometers.info/coronavirus/country/us/", timeout=10
                 )
                 r.raise_for_status()
@@ -443,6 +457,14 @@ class Corona(callbacks.Plugin):
             else:
                 reply_global()
 
+    @wrap(["owner"])
+    def cachestats(self, irc, msg, args):
+        """takes no arguments
+
+        Shows how often commands reused the last scrape.
+        """
+        irc.reply(self.cache.format_stats())
+
     @wrap([optional("text")])
     def top10(self, irc, msg, args, search):
         """[usa|global]
@@ -0,0 +1,322 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+responsecache: TTL/LRU response cache with an optional SQLite disk tier and
+single-flight loading.
+"""
+
+import functools
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def make_key(value):
+    """
+    Returns a hashable stand-in for value, turning the lists, dicts and sets in
+    it into tuples and frozensets
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, make_key(item)) for (key, item) in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(make_key(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(make_key(item) for item in value)
+    return value
+
+
+class DiskCache:
+    """
+    SQLite table of pickled values with absolute expiry times
+    """
+
+    def __init__(self, filename):
+        self._db = sqlite3.connect(
+            filename, check_same_thread=False, isolation_level=None
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+        self.vacuum()
+
+    def get(self, key, now=None):
+        """
+        Returns (pickled value, expiry time) for key, or None if missing or
+        expired
+        """
+        now = now or time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row and row[1] > now:
+            return row
+        return None
+
+    def set(self, key, data, expires):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, data, expires),
+            )
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def vacuum(self, now=None):
+        """
+        Deletes expired rows and returns how many there were
+        """
+        now = now or time.time()
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM cache WHERE expires <= ?", (now,)
+            ).rowcount
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM cache")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache bounded by entry count and by the size of its
+    values, where every key has its own time to live. Values are kept
+    pickled, so every lookup returns a copy that callers are free to modify.
+    If filename is given, values are also written to an SQLite database there,
+    which is looked up on memory misses and survives reloads. Values must be
+    picklable, and None is never cached.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=4194304, filename=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk = DiskCache(filename) if filename else None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.shared = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored under key, or default if missing or expired
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return pickle.loads(entry[0])
+                self._remove(key)
+        row = self.disk.get(repr(key), now) if self.disk else None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return default
+            self.disk_hits += 1
+        (data, expires) = row
+        self._store(key, data, expires)
+        return pickle.loads(data)
+
+    def set(self, key, value, ttl):
+        """
+        Stores value under key for ttl seconds. Nothing is stored if value is
+        None or ttl is not positive.
+        """
+        if value is not None:
+            self._set_data(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+        if self.disk:
+            self.disk.delete(repr(key))
+
+    def get_or_load(self, key, ttl, loader, *args, **kwargs):
+        """
+        Returns the value stored under key, calling loader(*args, **kwargs)
+        and caching its result for ttl seconds on a miss. Callers missing the
+        same key at the same time share a single call to loader.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            data = future.result()
+            return pickle.loads(data) if data is not None else None
+        try:
+            value = loader(*args, **kwargs)
+            self.loads += 1
+            if value is not None:
+                data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                self._set_data(key, data, ttl)
+                # Waiting callers get copies of their own
+                future.set_result(data)
+            else:
+                future.set_result(None)
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        future.result()
+        return value
+
+    def wrap(self, function, ttl):
+        """
+        Returns a version of function whose results are cached by arguments,
+        which may include lists and dicts. ttl is a number of seconds or a
+        function returning one, called on every miss so that configuration
+        changes apply right away.
+        """
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            seconds = ttl() if callable(ttl) else ttl
+            if seconds <= 0:
+                return function(*args, **kwargs)
+            key = (function.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                key = make_key(key)
+            return self.get_or_load(key, seconds, function, *args, **kwargs)
+
+        return wrapper
+
+    def vacuum(self):
+        """
+        Deletes expired entries from memory and from the disk tier, and returns
+        how many there were on disk. Plugins with a disk tier schedule this
+        periodically, since expired rows are otherwise only replaced on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [key for (key, entry) in self._entries.items() if entry[1] <= now]
+            for key in expired:
+                self._remove(key)
+        return self.disk.vacuum(now) if self.disk else 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk:
+            self.disk.clear()
+
+    def close(self):
+        if self.disk:
+            self.disk.close()
+            self.disk = None
+
+    def stats(self):
+        """
+        Returns a dict of cache counters
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "loads": self.loads,
+                "shared": self.shared,
+                "evictions": self.evictions,
+            }
+
+    def format_stats(self):
+        """
+        Returns the cache counters as a line of text for IRC replies
+        """
+        stats = self.stats()
+        return (
+            "{entries} entries ({bytes} bytes) :: {hits} hits, {disk_hits} disk"
+            " hits, {misses} misses ({hit_rate:.1%} hit rate) :: {loads} loads,"
+            " {shared} shared :: {evictions} evictions".format(**stats)
+        )
+
+    def _set_data(self, key, data, ttl):
+        if ttl <= 0:
+            return
+        expires = time.time() + ttl
+        self._store(key, data, expires)
+        if self.disk:
+            self.disk.set(repr(key), data, expires)
+
+    def _store(self, key, data, expires):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (data, expires)
+            self._bytes += len(data)
+            while self._entries and (
+                (self.max_entries and len(self._entries) > self.max_entries)
+                or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
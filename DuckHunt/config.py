@@ -107,5 +107,16 @@ conf.registerChannelValue(
     ),
 )
 
+conf.registerGlobalValue(
+    DuckHunt,
+    "evictAfter",
+    registry.NonNegativeInteger(
+        3600,
+        """The time after which the saved scores of a channel without a hunt are
+        removed from memory, and read again from the disk when needed (in seconds,
+        0 to keep them)""",
+    ),
+)
+
 
 # vim:set shiftwidth=4 softtabstop=4 expandtab textwidth=79:
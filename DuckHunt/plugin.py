@@ -37,8 +37,57 @@ import supybot.ircmsgs as ircmsgs
 import supybot.log as log
 import supybot.conf as conf
 from operator import itemgetter
+from itertools import islice
 
-import threading, random, pickle, os, time, datetime
+import threading, random, pickle, os, re, time, datetime, bisect
+from . import storage
+
+
+class Leaderboard:
+    """
+    Values of the players of a channel, kept sorted so that the top of the list
+    can be read without sorting all the players
+    """
+
+    def __init__(self, values={}):
+        self.values = dict(values)
+        self.entries = sorted((value, nick) for (nick, value) in self.values.items())
+        self.total = sum(self.values.values())
+
+    def set(self, nick, value):
+        """
+        Sets the value of nick, or removes nick if value is None
+        """
+        previous = self.values.pop(nick, None)
+        if previous is not None:
+            del self.entries[bisect.bisect_left(self.entries, (previous, nick))]
+            self.total -= previous
+        if value is not None:
+            self.values[nick] = value
+            bisect.insort(self.entries, (value, nick))
+            self.total += value
+
+    def highest(self, size=None):
+        """
+        Returns the (nick, value) pairs with the highest values, highest first
+        """
+        entries = islice(reversed(self.entries), self._size(size))
+        return [(nick, value) for (value, nick) in entries]
+
+    def lowest(self, size=None):
+        """
+        Returns the (nick, value) pairs with the lowest values, lowest first
+        """
+        entries = islice(self.entries, self._size(size))
+        return [(nick, value) for (value, nick) in entries]
+
+    def _size(self, size):
+        if size is None:
+            return len(self.entries)
+        return max(size, 0)
+
+    def __len__(self):
+        return len(self.entries)
 
 
 class DuckHunt(callbacks.Plugin):
@@ -66,6 +115,12 @@ class DuckHunt(callbacks.Plugin):
     missprobability = {}  # Probability to miss a duck when shooting
     week = {}  # Scores for the week
     channelweek = {}  # Saved scores for the week
+    lastused = {}  # When were the saved scores last used?
+    scoreboard = {}  # Leaderboard of the saved scores
+    timeboard = {}  # Leaderboard of the saved times
+    worsttimeboard = {}  # Leaderboard of the saved worst times
+    dayboard = {}  # Leaderboards of the day scores, by week and day
+    weekboard = {}  # Leaderboards of the week scores, by week
     leader = {}  # Who is the leader for the week?
     reloading = {}  # Who is currently reloading?
     reloadtime = {}  # Time to reload after shooting (in seconds)
@@ -102,6 +157,60 @@ class DuckHunt(callbacks.Plugin):
         "Sunday",
     ]
 
+    def __init__(self, irc):
+        self.__parent = super(DuckHunt, self)
+        self.__parent.__init__(irc)
+        self.storage = storage.Storage(self.path.dirize("DuckHunt.sqlite"), "DuckHunt")
+        self.scoredb = self.storage.table(
+            "scores",
+            (("channel", "TEXT"), ("nick", "TEXT"), ("score", "INTEGER")),
+            ("channel", "nick"),
+        )
+        self.timedb = self.storage.table(
+            "times",
+            (("channel", "TEXT"), ("nick", "TEXT"), ("time", "REAL")),
+            ("channel", "nick"),
+        )
+        self.worsttimedb = self.storage.table(
+            "worsttimes",
+            (("channel", "TEXT"), ("nick", "TEXT"), ("time", "REAL")),
+            ("channel", "nick"),
+        )
+        self.weekdb = self.storage.table(
+            "weekscores",
+            (
+                ("channel", "TEXT"),
+                ("year", "INTEGER"),
+                ("week", "INTEGER"),
+                ("day", "INTEGER"),
+                ("nick", "TEXT"),
+                ("score", "INTEGER"),
+            ),
+            ("channel", "year", "week", "day", "nick"),
+        )
+        self.storage.migrate("pickles", self._migrate_pickles)
+        schedule.addPeriodicEvent(self._evict, 60, name="DuckHunt.evict", now=False)
+        self.locks = {}
+        self.lockslock = threading.Lock()
+
+    def die(self):
+        # Disarm the duck launchers
+        for channel in self.started:
+            try:
+                schedule.removeEvent("DuckHunt_" + channel)
+            except KeyError:
+                pass
+        schedule.removeEvent("DuckHunt.evict")
+        self.storage.close()
+        self.__parent.die()
+
+    def _lock(self, channel):
+        """
+        Returns the lock held while a duck of the channel is launched or shot
+        """
+        with self.lockslock:
+            return self.locks.setdefault(channel, threading.RLock())
+
     def _calc_scores(self, channel):
         """
         Adds new scores and times to the already saved ones
@@ -151,68 +260,185 @@ class DuckHunt(callbacks.Plugin):
                 # It's a player that already has a saved score
                 self.channelweek[channel][self.woy][self.dow][player] += value
 
-    def _write_scores(self, channel):
+        # leaderboards
+        self._update_boards(channel, self.scores[channel])
+
+    def _build_boards(self, channel):
         """
-        Write scores and times to the disk
+        Builds the leaderboards from the saved scores and times
         """
-
-        # scores
-        outputfile = open(self.path.dirize(self.fileprefix + channel + ".scores"), "wb")
-        pickle.dump(self.channelscores[channel], outputfile)
-        outputfile.close()
-
-        # times
-        outputfile = open(self.path.dirize(self.fileprefix + channel + ".times"), "wb")
-        pickle.dump(self.channeltimes[channel], outputfile)
-        outputfile.close()
-
-        # worst times
-        outputfile = open(
-            self.path.dirize(self.fileprefix + channel + ".worsttimes"), "wb"
+        self.scoreboard[channel] = Leaderboard(self.channelscores[channel])
+        self.timeboard[channel] = Leaderboard(self.channeltimes[channel])
+        self.worsttimeboard[channel] = Leaderboard(self.channelworsttimes[channel])
+        self.dayboard[channel] = {}
+        self.weekboard[channel] = {}
+        for week, days in self.channelweek[channel].items():
+            weekscores = {}
+            for day, players in days.items():
+                self.dayboard[channel][(week, day)] = Leaderboard(players)
+                for player, value in players.items():
+                    weekscores.setdefault(player, 0)
+                    weekscores[player] += value
+            self.weekboard[channel][week] = Leaderboard(weekscores)
+
+    def _update_boards(self, channel, nicks):
+        """
+        Updates the leaderboards with the saved scores and times of the given
+        nicks for today
+        """
+        days = self.channelweek[channel].get(self.woy, {})
+        dayboard = self.dayboard[channel].setdefault(
+            (self.woy, self.dow), Leaderboard()
         )
-        pickle.dump(self.channelworsttimes[channel], outputfile)
-        outputfile.close()
+        weekboard = self.weekboard[channel].setdefault(self.woy, Leaderboard())
+        for nick in nicks:
+            self.scoreboard[channel].set(nick, self.channelscores[channel].get(nick))
+            self.timeboard[channel].set(nick, self.channeltimes[channel].get(nick))
+            self.worsttimeboard[channel].set(
+                nick, self.channelworsttimes[channel].get(nick)
+            )
+            dayboard.set(nick, days.get(self.dow, {}).get(nick))
+            weekscores = [players[nick] for players in days.values() if nick in players]
+            weekboard.set(nick, sum(weekscores) if weekscores else None)
 
-        # week scores
-        outputfile = open(
-            self.path.dirize(self.fileprefix + channel + self.year + ".weekscores"),
-            "wb",
-        )
-        pickle.dump(self.channelweek[channel], outputfile)
-        outputfile.close()
+    def _write_scores(self, channel, nicks):
+        """
+        Write the scores and times of the given nicks to the disk
+        """
+        with self.storage.transaction():
+            for nick in nicks:
+
+                # scores, times and worst times
+                for (table, column, saved) in (
+                    (self.scoredb, "score", self.channelscores),
+                    (self.timedb, "time", self.channeltimes),
+                    (self.worsttimedb, "time", self.channelworsttimes),
+                ):
+                    value = saved.get(channel, {}).get(nick)
+                    if value is None:
+                        table.delete(channel=channel, nick=nick)
+                    else:
+                        table.upsert({"channel": channel, "nick": nick, column: value})
+
+                # day score
+                key = {
+                    "channel": channel,
+                    "year": int(self.year),
+                    "week": self.woy,
+                    "day": self.dow,
+                    "nick": nick,
+                }
+                week = self.channelweek.get(channel, {}).get(self.woy, {})
+                value = week.get(self.dow, {}).get(nick)
+                if value is None:
+                    self.weekdb.delete(**key)
+                else:
+                    self.weekdb.upsert(dict(key, score=value))
 
     def _read_scores(self, channel):
         """
-        Reads scores and times from disk
+        Reads scores and times from disk, unless they are already in memory
         """
-        filename = self.path.dirize(self.fileprefix + channel)
-        # scores
-        if not self.channelscores.get(channel):
-            if os.path.isfile(filename + ".scores"):
-                inputfile = open(filename + ".scores", "rb")
-                self.channelscores[channel] = pickle.load(inputfile)
-                inputfile.close()
-
-        # times
-        if not self.channeltimes.get(channel):
-            if os.path.isfile(filename + ".times"):
-                inputfile = open(filename + ".times", "rb")
-                self.channeltimes[channel] = pickle.load(inputfile)
-                inputfile.close()
-
-        # worst times
-        if not self.channelworsttimes.get(channel):
-            if os.path.isfile(filename + ".worsttimes"):
-                inputfile = open(filename + ".worsttimes", "rb")
-                self.channelworsttimes[channel] = pickle.load(inputfile)
-                inputfile.close()
+        if channel not in self.lastused:
+            # scores
+            self.channelscores[channel] = {
+                row["nick"]: row["score"]
+                for row in self.scoredb.select(channel=channel)
+            }
+
+            # times
+            self.channeltimes[channel] = {
+                row["nick"]: row["time"] for row in self.timedb.select(channel=channel)
+            }
+
+            # worst times
+            self.channelworsttimes[channel] = {
+                row["nick"]: row["time"]
+                for row in self.worsttimedb.select(channel=channel)
+            }
+
+            # week scores
+            weeks = self.channelweek.setdefault(channel, {})
+            for row in self.weekdb.select(channel=channel, year=int(self.year)):
+                day = weeks.setdefault(row["week"], {}).setdefault(row["day"], {})
+                day[row["nick"]] = row["score"]
+
+            self._build_boards(channel)
+
+        self.lastused[channel] = time.time()
+
+    def _evict(self):
+        """
+        Removes from memory the saved scores of the channels without a hunt that
+        were not used recently
+        """
+        evictAfter = self.registryValue("evictAfter")
+        if not evictAfter:
+            return
+        now = time.time()
+        for channel in list(self.lastused):
+            # Not while a hunt of the channel is starting or ending
+            with self._lock(channel):
+                lastused = self.lastused.get(channel)
+                if lastused is None or self.started.get(channel):
+                    continue
+                if now - lastused < evictAfter:
+                    continue
+                del self.lastused[channel]
+                for saved in (
+                    self.channelscores,
+                    self.channeltimes,
+                    self.channelworsttimes,
+                    self.channelweek,
+                    self.scoreboard,
+                    self.timeboard,
+                    self.worsttimeboard,
+                    self.dayboard,
+                    self.weekboard,
+                ):
+                    saved.pop(channel, None)
 
-        # week scores
-        if not self.channelweek.get(channel):
-            if os.path.isfile(filename + self.year + ".weekscores"):
-                inputfile = open(filename + self.year + ".weekscores", "rb")
-                self.channelweek[channel] = pickle.load(inputfile)
-                inputfile.close()
+    def _migrate_pickles(self):
+        """
+        Imports the score files of older versions
+        """
+        prefix = re.escape(self.fileprefix)
+        for filename in os.listdir(self.path()):
+            match = re.match(prefix + r"(.+)(\d{4})\.weekscores$", filename)
+            if match:
+                (channel, year) = match.groups()
+                kind = "weekscores"
+            else:
+                match = re.match(prefix + r"(.+)\.(scores|times|worsttimes)$", filename)
+                if not match:
+                    continue
+                (channel, kind) = match.groups()
+            with open(os.path.join(self.path(), filename), "rb") as inputfile:
+                saved = pickle.load(inputfile)
+            if kind == "weekscores":
+                self.weekdb.upsert_many(
+                    {
+                        "channel": channel,
+                        "year": int(year),
+                        "week": week,
+                        "day": day,
+                        "nick": nick,
+                        "score": score,
+                    }
+                    for (week, days) in saved.items()
+                    for (day, players) in days.items()
+                    for (nick, score) in players.items()
+                )
+            else:
+                (table, column) = {
+                    "scores": (self.scoredb, "score"),
+                    "times": (self.timedb, "time"),
+                    "worsttimes": (self.worsttimedb, "time"),
+                }[kind]
+                table.upsert_many(
+                    {"channel": channel, "nick": nick, column: value}
+                    for (nick, value) in saved.items()
+                )
 
     def _initdayweekyear(self, channel):
         self.dow = int(time.strftime("%u"))  # Day of week
@@ -298,102 +524,115 @@ class DuckHunt(callbacks.Plugin):
 
         currentChannel = msg.args[0]
         if irc.isChannel(currentChannel):
+            with self._lock(currentChannel):
+                if self.started.get(currentChannel) == True:
+                    irc.reply("There is already a hunt right now!")
+                else:
 
-            if self.started.get(currentChannel) == True:
-                irc.reply("There is already a hunt right now!")
-            else:
+                    # First of all, let's read the score if needed
+                    self._read_scores(currentChannel)
 
-                # First of all, let's read the score if needed
-                self._read_scores(currentChannel)
+                    self._initthrottle(irc, msg, args, currentChannel)
 
-                self._initthrottle(irc, msg, args, currentChannel)
+                    # Init saved scores
+                    try:
+                        self.channelscores[currentChannel]
+                    except:
+                        self.channelscores[currentChannel] = {}
 
-                # Init saved scores
-                try:
-                    self.channelscores[currentChannel]
-                except:
-                    self.channelscores[currentChannel] = {}
+                    # Init saved times
+                    try:
+                        self.channeltimes[currentChannel]
+                    except:
+                        self.channeltimes[currentChannel] = {}
 
-                # Init saved times
-                try:
-                    self.channeltimes[currentChannel]
-                except:
-                    self.channeltimes[currentChannel] = {}
+                    # Init saved times
+                    try:
+                        self.channelworsttimes[currentChannel]
+                    except:
+                        self.channelworsttimes[currentChannel] = {}
 
-                # Init saved times
-                try:
-                    self.channelworsttimes[currentChannel]
-                except:
-                    self.channelworsttimes[currentChannel] = {}
+                    # Init times
+                    self.toptimes[currentChannel] = {}
+                    self.worsttimes[currentChannel] = {}
 
-                # Init times
-                self.toptimes[currentChannel] = {}
-                self.worsttimes[currentChannel] = {}
+                    # Init bangdelay
+                    self.times[currentChannel] = False
 
-                # Init bangdelay
-                self.times[currentChannel] = False
+                    # Init lastSpoke
+                    self.lastSpoke[currentChannel] = time.time()
 
-                # Init lastSpoke
-                self.lastSpoke[currentChannel] = time.time()
+                    # Reinit current hunt scores
+                    if self.scores.get(currentChannel):
+                        self.scores[currentChannel] = {}
 
-                # Reinit current hunt scores
-                if self.scores.get(currentChannel):
-                    self.scores[currentChannel] = {}
+                    # Reinit reloading
+                    self.reloading[currentChannel] = {}
 
-                # Reinit reloading
-                self.reloading[currentChannel] = {}
+                    # Reinit reloadcount
+                    self.reloadcount[currentChannel] = {}
 
-                # Reinit reloadcount
-                self.reloadcount[currentChannel] = {}
+                    # No duck launched
+                    self.duck[currentChannel] = False
 
-                # No duck launched
-                self.duck[currentChannel] = False
+                    # Hunt started
+                    self.started[currentChannel] = True
 
-                # Hunt started
-                self.started[currentChannel] = True
+                    # Init shoots
+                    self.shoots[currentChannel] = 0
 
-                # Init shoots
-                self.shoots[currentChannel] = 0
+                    # Init averagetime
+                    self.averagetime[currentChannel] = 0
 
-                # Init averagetime
-                self.averagetime[currentChannel] = 0
+                    # Init schedule
+                    self._schedulelaunch(irc, msg, currentChannel)
 
-                # Init schedule
+                    irc.reply("The hunt starts now!", prefixNick=False)
+        else:
+            irc.error("You have to be on a channel")
 
-                # First of all, stop the scheduler if it was still running
-                try:
-                    schedule.removeEvent("DuckHunt_" + currentChannel)
-                except KeyError:
-                    pass
+    starthunt = wrap(starthunt)
 
-                # Then restart it
-                def myEventCaller():
-                    self._launchEvent(irc, msg)
+    def _schedulelaunch(self, irc, msg, currentChannel):
+        """
+        Arms the launcher of the channel for the time the next duck is due.
+        Must be called with the lock of the channel held.
+        """
 
-                try:
-                    schedule.addPeriodicEvent(
-                        myEventCaller, 5, "DuckHunt_" + currentChannel, False
-                    )
-                except AssertionError:
-                    pass
+        # First of all, stop the launcher if it was still armed
+        try:
+            schedule.removeEvent("DuckHunt_" + currentChannel)
+        except KeyError:
+            pass
 
-                irc.reply("The hunt starts now!", prefixNick=False)
-        else:
-            irc.error("You have to be on a channel")
+        # Then arm it, unless there is no hunt or a duck is already flying
+        if self.started.get(currentChannel) == True:
+            if self.duck[currentChannel] == False:
 
-    starthunt = wrap(starthunt)
+                def myEventCaller():
+                    self._launchEvent(irc, msg, currentChannel)
 
-    def _launchEvent(self, irc, msg):
-        currentChannel = msg.args[0]
+                schedule.addEvent(
+                    myEventCaller,
+                    self.lastSpoke[currentChannel] + self.throttle[currentChannel],
+                    "DuckHunt_" + currentChannel,
+                )
+
+    def _launchEvent(self, irc, msg, currentChannel):
         now = time.time()
         if irc.isChannel(currentChannel):
-            if self.started.get(currentChannel) == True:
-                if self.duck[currentChannel] == False:
-                    if (
-                        now
-                        > self.lastSpoke[currentChannel] + self.throttle[currentChannel]
-                    ):
-                        self._launch(irc, msg, "")
+            with self._lock(currentChannel):
+                if self.started.get(currentChannel) == True:
+                    if self.duck[currentChannel] == False:
+                        if (
+                            now
+                            >= self.lastSpoke[currentChannel]
+                            + self.throttle[currentChannel]
+                        ):
+                            self._launch(irc, msg, "", currentChannel)
+                        else:
+                            # The deadline moved since the launcher was armed
+                            self._schedulelaunch(irc, msg, currentChannel)
 
     def stophunt(self, irc, msg, args):
         """
@@ -402,16 +641,17 @@ class DuckHunt(callbacks.Plugin):
 
         currentChannel = msg.args[0]
         if irc.isChannel(currentChannel):
-            if self.started.get(currentChannel) == True:
-                self._end(irc, msg, args)
-            else:
-                irc.reply("Nothing to stop: there's no hunt right now.")
-            # If someone uses the stop command,
-            # we stop the scheduler, even if autoRestart is enabled
-            try:
-                schedule.removeEvent("DuckHunt_" + currentChannel)
-            except:
-                pass
+            with self._lock(currentChannel):
+                if self.started.get(currentChannel) == True:
+                    self._end(irc, msg, args)
+                else:
+                    irc.reply("Nothing to stop: there's no hunt right now.")
+                # If someone uses the stop command,
+                # we stop the scheduler, even if autoRestart is enabled
+                try:
+                    schedule.removeEvent("DuckHunt_" + currentChannel)
+                except:
+                    pass
         else:
             irc.error("You have to be on a channel")
 
@@ -423,34 +663,38 @@ class DuckHunt(callbacks.Plugin):
         Enable/disable friday mode! (there are lots of ducks on friday :))
         """
         if irc.isChannel(channel):
-
-            if status == "status":
-                irc.reply(
-                    "Manual friday mode for "
-                    + channel
-                    + " is "
-                    + str(self.manualFriday.get(channel))
-                )
-                irc.reply(
-                    "Auto friday mode for "
-                    + channel
-                    + " is "
-                    + str(self.fridayMode.get(channel))
-                )
-            else:
-                if (
-                    self.manualFriday.get(channel) == None
-                    or self.manualFriday[channel] == False
-                ):
-                    self.manualFriday[channel] = True
+            with self._lock(channel):
+                if status == "status":
+                    irc.reply(
+                        "Manual friday mode for "
+                        + channel
+                        + " is "
+                        + str(self.manualFriday.get(channel))
+                    )
                     irc.reply(
-                        "Friday mode is now enabled! Shoot alllllllllllll the ducks!"
+                        "Auto friday mode for "
+                        + channel
+                        + " is "
+                        + str(self.fridayMode.get(channel))
                     )
                 else:
-                    self.manualFriday[channel] = False
-                    irc.reply("Friday mode is now disabled.")
+                    if (
+                        self.manualFriday.get(channel) == None
+                        or self.manualFriday[channel] == False
+                    ):
+                        self.manualFriday[channel] = True
+                        irc.reply(
+                            "Friday mode is now enabled! Shoot alllllllllllll the ducks!"
+                        )
+                    else:
+                        self.manualFriday[channel] = False
+                        irc.reply("Friday mode is now disabled.")
+
+                self._initthrottle(irc, msg, args, channel)
 
-            self._initthrottle(irc, msg, args, channel)
+                # The throttle changed: re-arm the launcher
+                if self.started.get(channel) == True:
+                    self._schedulelaunch(irc, msg, channel)
         else:
             irc.error("You have to be on a channel")
 
@@ -520,7 +764,8 @@ class DuckHunt(callbacks.Plugin):
                     nickfrom
                 ]
                 del self.channelscores[channel][nickfrom]
-                self._write_scores(channel)
+                self._update_boards(channel, (nickto, nickfrom))
+                self._write_scores(channel, (nickto, nickfrom))
                 irc.reply("Total scores merged")
 
             except:
@@ -542,7 +787,8 @@ class DuckHunt(callbacks.Plugin):
                     ][week][day][nickfrom]
 
                 del self.channelweek[channel][week][day][nickfrom]
-                self._write_scores(channel)
+                self._update_boards(channel, (nickto, nickfrom))
+                self._write_scores(channel, (nickto, nickfrom))
                 irc.reply("Day scores merged")
 
             except:
@@ -582,7 +828,8 @@ class DuckHunt(callbacks.Plugin):
                     ][nickfrom]
                 del self.channelworsttimes[channel][nickfrom]
 
-                self._write_scores(channel)
+                self._update_boards(channel, (nickto, nickfrom))
+                self._write_scores(channel, (nickto, nickfrom))
 
                 irc.replySuccess()
 
@@ -602,7 +849,8 @@ class DuckHunt(callbacks.Plugin):
         if irc.isChannel(channel):
             self._read_scores(channel)
             del self.channeltimes[channel][nick]
-            self._write_scores(channel)
+            self._update_boards(channel, (nick,))
+            self._write_scores(channel, (nick,))
             irc.replySuccess()
 
         else:
@@ -619,7 +867,8 @@ class DuckHunt(callbacks.Plugin):
             try:
                 self._read_scores(channel)
                 del self.channelscores[channel][nick]
-                self._write_scores(channel)
+                self._update_boards(channel, (nick,))
+                self._write_scores(channel, (nick,))
                 irc.replySuccess()
 
             except:
@@ -648,11 +897,7 @@ class DuckHunt(callbacks.Plugin):
                     if self.channelweek[channel][week].get(day):
                         # Getting all scores, to get the winner of the week
                         msgstring = ""
-                        scores = sorted(
-                            iter(self.channelweek[channel][week][day].items()),
-                            key=itemgetter(1),
-                            reverse=True,
-                        )
+                        scores = self.dayboard[channel][(week, day)].highest()
                         for item in scores:
                             msgstring += "(x{0}x: {1}) ".format(item[0], str(item[1]))
 
@@ -681,7 +926,6 @@ class DuckHunt(callbacks.Plugin):
         if irc.isChannel(channel):
 
             self._read_scores(channel)
-            weekscores = {}
 
             if not week:
                 week = self.woy
@@ -695,28 +939,20 @@ class DuckHunt(callbacks.Plugin):
                         for i in (1, 2, 3, 4, 5, 6, 7):
                             if self.channelweek[channel][week].get(i):
                                 # Getting winner of the day
-                                winnernick, winnerscore = max(
-                                    iter(self.channelweek[channel][week][i].items()),
-                                    key=lambda k_v: (k_v[1], k_v[0]),
-                                )
+                                [(winnernick, winnerscore)] = self.dayboard[channel][
+                                    (week, i)
+                                ].highest(1)
                                 msgstring += "{0}: (x{1}x: {2}) ".format(
                                     self.dayname[i - 1], winnernick, str(winnerscore)
                                 )
 
-                        # Getting all scores, to get the winner of the week
-                        for i, players in self.channelweek[channel][week].items():
-                            for player, value in players.items():
-                                weekscores.setdefault(player, 0)
-                                weekscores[player] += value
-
                         if msgstring != "":
                             irc.reply("Scores for week " + str(week) + ":")
                             irc.reply(msgstring)
                             # Who's the winner at this point?
-                            winnernick, winnerscore = max(
-                                iter(weekscores.items()),
-                                key=lambda k_v1: (k_v1[1], k_v1[0]),
-                            )
+                            [(winnernick, winnerscore)] = self.weekboard[channel][
+                                week
+                            ].highest(1)
                             irc.reply(
                                 "Leader: x%sx with %i points."
                                 % (winnernick, winnerscore)
@@ -777,13 +1013,8 @@ class DuckHunt(callbacks.Plugin):
             else:
                 listsize = size
 
-            # Sort the scores (reversed: the higher the better)
-            scores = sorted(
-                iter(self.channelscores[channel].items()),
-                key=itemgetter(1),
-                reverse=True,
-            )
-            del scores[listsize:]
+            # The best scores (the higher the better)
+            scores = self.scoreboard[channel].highest(listsize)
 
             msgstring = ""
             for item in scores:
@@ -814,10 +1045,7 @@ class DuckHunt(callbacks.Plugin):
         if irc.isChannel(channel):
             self._read_scores(channel)
             if self.channelscores.get(channel):
-                scores = self.channelscores[channel]
-                total = 0
-                for player, value in scores.items():
-                    total += value
+                total = self.scoreboard[channel].total
                 irc.reply(str(total) + " ducks have been shot in " + channel + "!")
             else:
                 irc.reply("There are no scores for this channel yet")
@@ -852,13 +1080,8 @@ class DuckHunt(callbacks.Plugin):
             else:
                 listsize = size
 
-            # Sort the times (not reversed: the lower the better)
-            times = sorted(
-                iter(self.channeltimes[channel].items()),
-                key=itemgetter(1),
-                reverse=False,
-            )
-            del times[listsize:]
+            # The best times (the lower the better)
+            times = self.timeboard[channel].lowest(listsize)
 
             msgstring = ""
             for item in times:
@@ -877,12 +1100,8 @@ class DuckHunt(callbacks.Plugin):
             else:
                 irc.reply("There aren't any best times for this channel yet.")
 
-            times = sorted(
-                iter(self.channelworsttimes[channel].items()),
-                key=itemgetter(1),
-                reverse=True,
-            )
-            del times[listsize:]
+            # The worst times (the higher the worse)
+            times = self.worsttimeboard[channel].highest(listsize)
 
             msgstring = ""
             for item in times:
@@ -925,19 +1144,34 @@ class DuckHunt(callbacks.Plugin):
         """
         currentChannel = msg.args[0]
 
+        # When was the shot fired?
+        shot = msg.tagged("DuckHunt.receivedAt") or time.monotonic_ns()
+
+        # The shots of a channel are decided one at a time: the first one gets the duck
+        with self._lock(currentChannel):
+            self._bang(irc, msg, args, shot)
+
+    bang = wrap(bang)
+
+    def _bang(self, irc, msg, args, shot):
+        """
+        Decides the outcome of a shot fired at the monotonic time shot (in ns)
+        """
+        currentChannel = msg.args[0]
+
         if irc.isChannel(currentChannel):
             if self.started.get(currentChannel) == True:
 
                 # bangdelay: how much time between the duck was launched and this shot?
-                if self.times[currentChannel]:
-                    bangdelay = time.time() - self.times[currentChannel]
+                if self.times[currentChannel] and shot >= self.times[currentChannel]:
+                    bangdelay = (shot - self.times[currentChannel]) / 1e9
                 else:
                     bangdelay = False
 
                 # Is the player reloading?
                 if (
                     self.reloading[currentChannel].get(msg.nick)
-                    and time.time() - self.reloading[currentChannel][msg.nick]
+                    and (shot - self.reloading[currentChannel][msg.nick]) / 1e9
                     < self.reloadtime[currentChannel]
                     and self.reloadcount[currentChannel][msg.nick] < 1
                 ):
@@ -949,7 +1183,7 @@ class DuckHunt(callbacks.Plugin):
                     return 0
                 if (
                     self.reloading[currentChannel].get(msg.nick)
-                    and time.time() - self.reloading[currentChannel][msg.nick]
+                    and (shot - self.reloading[currentChannel][msg.nick]) / 1e9
                     < self.reloadtime[currentChannel]
                     and self.reloadcount[currentChannel][msg.nick] > 0
                 ):
@@ -998,11 +1232,14 @@ class DuckHunt(callbacks.Plugin):
                     return 0
 
                 # This player is now reloading
-                self.reloading[currentChannel][msg.nick] = time.time()
+                self.reloading[currentChannel][msg.nick] = shot
                 self.reloadcount[currentChannel][msg.nick] = 0
 
-                # There was a duck
-                if self.duck[currentChannel] == True:
+                # There was a duck when the shot was fired
+                if (
+                    self.duck[currentChannel] == True
+                    and shot >= self.times[currentChannel]
+                ):
 
                     # Did the player missed it?
                     if random.random() < self.missprobability[currentChannel]:
@@ -1068,6 +1305,9 @@ class DuckHunt(callbacks.Plugin):
 
                                 self.averagetime[currentChannel] = 0
 
+                        # Arm the launcher for the next duck
+                        self._schedulelaunch(irc, msg, currentChannel)
+
                 # There was no duck or the duck has already been shot
                 else:
 
@@ -1120,7 +1360,11 @@ class DuckHunt(callbacks.Plugin):
         else:
             irc.error("You have to be on a channel")
 
-    bang = wrap(bang)
+    def inFilter(self, irc, msg):
+        # Timestamp the messages when they are received, to time the shots
+        if msg.command == "PRIVMSG":
+            msg.tag("DuckHunt.receivedAt", time.monotonic_ns())
+        return msg
 
     def doPrivmsg(self, irc, msg):
         currentChannel = msg.args[0]
@@ -1140,12 +1384,13 @@ class DuckHunt(callbacks.Plugin):
     def _end(self, irc, msg, args):
         """
         End of the hunt (is called when the hunts stop "naturally" or when someone uses the !stop command)
+        Must be called with the lock of the channel held
         """
 
         currentChannel = msg.args[0]
 
-        # End the hunt
-        self.started[currentChannel] = False
+        # Make sure the saved scores are in memory
+        self._read_scores(currentChannel)
 
         try:
             self.channelscores[currentChannel]
@@ -1201,10 +1446,9 @@ class DuckHunt(callbacks.Plugin):
             channelbestnick = None
             channelbesttime = None
             if self.channeltimes.get(currentChannel):
-                channelbestnick, channelbesttime = min(
-                    iter(self.channeltimes.get(currentChannel).items()),
-                    key=lambda k_v5: (k_v5[1], k_v5[0]),
-                )
+                [(channelbestnick, channelbesttime)] = self.timeboard[
+                    currentChannel
+                ].lowest(1)
 
             # Showing best time
             recordmsg = ""
@@ -1245,10 +1489,9 @@ class DuckHunt(callbacks.Plugin):
             channelworstnick = None
             channelworsttime = None
             if self.channelworsttimes.get(currentChannel):
-                channelworstnick, channelworsttime = max(
-                    iter(self.channelworsttimes.get(currentChannel).items()),
-                    key=lambda k_v7: (k_v7[1], k_v7[0]),
-                )
+                [(channelworstnick, channelworsttime)] = self.worsttimeboard[
+                    currentChannel
+                ].highest(1)
 
             # Showing worst time
             recordmsg = ""
@@ -1298,48 +1541,33 @@ class DuckHunt(callbacks.Plugin):
 
             # Write the scores and times to disk
             self._calc_scores(currentChannel)
-            self._write_scores(currentChannel)
+            self._write_scores(currentChannel, self.scores[currentChannel])
 
             # Did someone took the lead?
-            weekscores = {}
-            if self.channelweek.get(currentChannel):
-                if self.channelweek[currentChannel].get(self.woy):
-                    # for each day of week
-                    for i in (1, 2, 3, 4, 5, 6, 7):
-                        if self.channelweek[currentChannel][self.woy].get(i):
-                            # Getting all scores, to get the winner of the week
-                            for i, players in self.channelweek[currentChannel][
-                                self.woy
-                            ].items():
-                                for player, value in players.items():
-                                    weekscores.setdefault(player, 0)
-                                    weekscores[player] += value
-                            winnernick, winnerscore = max(
-                                iter(weekscores.items()),
-                                key=lambda k_v3: (k_v3[1], k_v3[0]),
-                            )
-                            if winnernick != self.leader[currentChannel]:
-                                if self.leader[currentChannel] != None:
-                                    irc.reply(
-                                        "%s took the lead for the week over %s with %i"
-                                        " points."
-                                        % (
-                                            winnernick,
-                                            self.leader[currentChannel],
-                                            winnerscore,
-                                        ),
-                                        prefixNick=False,
-                                    )
-                                else:
-                                    irc.reply(
-                                        "%s has the lead for the week with %i points."
-                                        % (winnernick, winnerscore),
-                                        prefixNick=False,
-                                    )
-                                self.leader[currentChannel] = winnernick
+            weekboard = self.weekboard[currentChannel].get(self.woy)
+            if weekboard:
+                # Getting the winner of the week
+                [(winnernick, winnerscore)] = weekboard.highest(1)
+                if winnernick != self.leader[currentChannel]:
+                    if self.leader[currentChannel] != None:
+                        irc.reply(
+                            "%s took the lead for the week over %s with %i points."
+                            % (winnernick, self.leader[currentChannel], winnerscore),
+                            prefixNick=False,
+                        )
+                    else:
+                        irc.reply(
+                            "%s has the lead for the week with %i points."
+                            % (winnernick, winnerscore),
+                            prefixNick=False,
+                        )
+                    self.leader[currentChannel] = winnernick
         else:
             irc.reply("Not a single duck was shot during this hunt!", prefixNick=False)
 
+        # End the hunt, now that its scores are saved
+        self.started[currentChannel] = False
+
         # Reinit current hunt scores
         if self.scores.get(currentChannel):
             self.scores[currentChannel] = {}
@@ -1356,39 +1584,40 @@ class DuckHunt(callbacks.Plugin):
         # Reinit number of shoots
         self.shoots[currentChannel] = 0
 
-    def _launch(self, irc, msg, args):
+    def _launch(self, irc, msg, args, currentChannel=None):
         """
         Launch a duck
         """
-        currentChannel = msg.args[0]
+        currentChannel = currentChannel or msg.args[0]
         if irc.isChannel(currentChannel):
-            if self.started[currentChannel] == True:
-                if self.duck[currentChannel] == False:
+            with self._lock(currentChannel):
+                if self.started[currentChannel] == True:
+                    if self.duck[currentChannel] == False:
 
-                    # Store the time when the duck has been launched
-                    self.times[currentChannel] = time.time()
+                        # Store the time when the duck has been launched
+                        self.times[currentChannel] = time.monotonic_ns()
 
-                    # Store the fact that there's a duck now
-                    self.duck[currentChannel] = True
+                        # Store the fact that there's a duck now
+                        self.duck[currentChannel] = True
 
-                    # Send message directly (instead of queuing it with irc.reply)
-                    irc.sendMsg(ircmsgs.privmsg(currentChannel, "\_o< quack!"))
+                        # Send message directly (instead of queuing it with irc.reply)
+                        irc.sendMsg(ircmsgs.privmsg(currentChannel, "\_o< quack!"))
 
-                    # Define a new throttle[currentChannel] for the next launch
-                    self.throttle[currentChannel] = random.randint(
-                        self.minthrottle[currentChannel],
-                        self.maxthrottle[currentChannel],
-                    )
+                        # Define a new throttle[currentChannel] for the next launch
+                        self.throttle[currentChannel] = random.randint(
+                            self.minthrottle[currentChannel],
+                            self.maxthrottle[currentChannel],
+                        )
 
-                    try:
-                        self.shoots[currentChannel] += 1
-                    except:
-                        self.shoots[currentChannel] = 1
-                else:
+                        try:
+                            self.shoots[currentChannel] += 1
+                        except:
+                            self.shoots[currentChannel] = 1
+                    else:
 
-                    irc.reply("Already a duck")
-            else:
-                irc.reply("The hunt has not started yet!")
+                        irc.reply("Already a duck")
+                else:
+                    irc.reply("The hunt has not started yet!")
         else:
             irc.error("You have to be on a channel")
 
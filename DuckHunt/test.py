@@ -28,21 +28,109 @@
 # POSSIBILITY OF SUCH DAMAGE.
 ###
 
+import os
+import pickle
+
 from supybot.test import *
+import supybot.schedule as schedule
 
-class DuckHuntTestCase(ChannelPluginTestCase):
-    plugins = ('DuckHunt',)
 
+class DuckHuntTestCase(ChannelPluginTestCase):
+    plugins = ("DuckHunt",)
+    config = {"plugins.DuckHunt.missProbability": 0.0001}
 
     def tests(self):
-	self.assertResponse("bang", "There is no hunt right now! You can start a hunt with the 'start' command")
-	self.assertResponse("stop", "Nothing to stop: there's no hunt right now.")
-	self.assertResponse("start", "The hunt starts now!")
-	self.assertResponse("start", "There is already a hunt right now!")
-	self.assertRegexp("bang", "^There was no duck!")
-	self.assertResponse("stop", "The hunt stops now!")
-	self.assertNotError("listscores")
-	self.assertNotError("weekscores")
+        self.assertResponse(
+            "bang",
+            "There is no hunt right now! You can start a hunt with the 'starthunt'"
+            " command",
+        )
+        self.assertResponse("stophunt", "Nothing to stop: there's no hunt right now.")
+        self.assertResponse("starthunt", "The hunt starts now!")
+        self.assertResponse("starthunt", "There is already a hunt right now!")
+        self.assertRegexp("bang", "^There was no duck!")
+        self.assertResponse("stophunt", "The hunt stops now!")
+        self.assertNotError("listscores")
+        self.assertNotError("weekscores")
+
+    def testScoresAreSaved(self):
+        cb = self.irc.getCallback("DuckHunt")
+        cb.debug = 1
+        try:
+            self.assertResponse("starthunt", "The hunt starts now!")
+            self.assertResponse("dbg", "\\_o< quack!")
+            self.assertRegexp("bang", "Score: 1")
+            self.assertResponse("stophunt", "The hunt stops now!")
+            while self.irc.takeMsg():
+                pass
+            self.assertRegexp("listscores", "top-5 scores")
+            self.assertIn("x%sx: 1" % self.nick, self.irc.takeMsg().args[1])
+            self.assertEqual(cb.scoredb.get(self.channel, self.nick)["score"], 1)
+
+            # The scores are read again after being evicted from memory
+            with conf.supybot.plugins.DuckHunt.evictAfter.context(1):
+                cb.lastused[self.channel] -= 10
+                cb._evict()
+            self.assertNotIn(self.channel, cb.channelscores)
+            self.assertResponse("score %s" % self.nick, "1")
+        finally:
+            cb.debug = 0
+
+    def testFridayModeRearmsTheChannel(self):
+        cb = self.irc.getCallback("DuckHunt")
+        self.assertResponse("starthunt", "The hunt starts now!")
+        try:
+            # Run from a private message, so msg.args[0] is not the channel
+            self.assertRegexp(
+                "fridaymode %s" % self.channel,
+                "Friday mode is now enabled",
+                private=True,
+            )
+            self.assertNotIn("DuckHunt_" + self.irc.nick, schedule.schedule.events)
+            deadlines = [
+                event[0]
+                for event in schedule.schedule.schedule
+                if event[1] == "DuckHunt_" + self.channel
+            ]
+            self.assertEqual(
+                deadlines,
+                [cb.lastSpoke[self.channel] + cb.throttle[self.channel]],
+            )
+        finally:
+            self.assertResponse("stophunt", "The hunt stops now!")
+            self.assertNotIn("DuckHunt_" + self.channel, schedule.schedule.events)
+
+
+class DuckHuntMigrationTestCase(ChannelPluginTestCase):
+    plugins = ("DuckHunt",)
+    cleanDataDir = False
+
+    def setUp(self):
+        # Start from the score files of an older version
+        data = conf.supybot.directories.data()
+        shutil.rmtree(data)
+        os.makedirs(data)
+        self.week = int(time.strftime("%V"))
+        for suffix, saved in (
+            (".scores", {"alice": 12, "bob": 3}),
+            (".times", {"alice": 1.5}),
+            (".worsttimes", {"alice": 40.25}),
+            (time.strftime("%Y") + ".weekscores", {self.week: {2: {"alice": 5}}}),
+        ):
+            with open(os.path.join(data, "DuckHunt_#test" + suffix), "wb") as f:
+                pickle.dump(saved, f)
+        ChannelPluginTestCase.setUp(self)
+
+    def testScoresAreMigrated(self):
+        cb = self.irc.getCallback("DuckHunt")
+        self.assertResponse("score alice", "12")
+        self.assertResponse("score bob", "3")
+        self.assertEqual(cb.channeltimes[self.channel], {"alice": 1.5})
+        self.assertEqual(cb.channelworsttimes[self.channel], {"alice": 40.25})
+        self.assertEqual(cb.channelweek[self.channel][self.week], {2: {"alice": 5}})
+        self.assertRegexp("weekscores %s alice" % self.week, "alice scores for week")
+        self.assertEqual(self.irc.takeMsg().args[1], "test: (Tuesday: 5) ")
+        self.assertEqual(self.irc.takeMsg().args[1], "test: Total: 5 points.")
 
 
 # vim:set shiftwidth=4 softtabstop=4 expandtab textwidth=79:
@@ -27,14 +27,13 @@
 # POSSIBILITY OF SUCH DAMAGE.
 ###
 
-import supybot.utils as utils
 from supybot.commands import *
 import supybot.plugins as plugins
 import supybot.ircutils as ircutils
 import supybot.callbacks as callbacks
 import supybot.ircmsgs as ircmsgs
 import random
-import requests
+from . import httpclient
 from bs4 import BeautifulSoup
 import codecs
 import os
@@ -56,13 +55,17 @@ class Fun(callbacks.Plugin):
 
     threaded = True
 
+    def die(self):
+        httpclient.close()
+        super().die()
+
     def advice(self, irc, msg, args):
         """
         Get some advice
         """
 
         channel = msg.args[0]
-        data = requests.get("https://api.adviceslip.com/advice")
+        data = httpclient.get("https://api.adviceslip.com/advice")
         data = json.loads(data.content)
         irc.reply(data["slip"]["advice"])
 
@@ -77,7 +80,7 @@ class Fun(callbacks.Plugin):
         headers = {
             "Accept": "application/json",
         }
-        data = requests.get("https://icanhazdadjoke.com/", headers=headers)
+        data = httpclient.get("https://icanhazdadjoke.com/", headers=headers)
         data = json.loads(data.content)
         irc.reply(data["joke"].replace("\n", "").replace("\r", "").replace("\t", ""))
 
@@ -89,7 +92,7 @@ class Fun(callbacks.Plugin):
         """
 
         channel = msg.args[0]
-        data = requests.get("https://catfact.ninja/fact")
+        data = httpclient.get("https://catfact.ninja/fact")
         data = json.loads(data.content)
         irc.reply(data["fact"])
 
@@ -101,7 +104,7 @@ class Fun(callbacks.Plugin):
         """
 
         channel = msg.args[0]
-        data = requests.get("https://uselessfacts.jsph.pl/random.json?language=en")
+        data = httpclient.get("https://uselessfacts.jsph.pl/random.json?language=en")
         data = json.loads(data.content)
         irc.reply(data["text"])
 
@@ -112,7 +115,7 @@ class Fun(callbacks.Plugin):
         Corporate buzzord generator
         """
         channel = msg.args[0]
-        data = requests.get("https://corporatebs-generator.sameerkumar.website")
+        data = httpclient.get("https://corporatebs-generator.sameerkumar.website")
         data = json.loads(data.content)
         irc.reply(data["phrase"])
 
@@ -123,7 +126,7 @@ class Fun(callbacks.Plugin):
         Startup generator
         """
         channel = msg.args[0]
-        data = requests.get("http://itsthisforthat.com/api.php?json")
+        data = httpclient.get("http://itsthisforthat.com/api.php?json")
         data = json.loads(data.content)
         vowels = ("a", "e", "i", "o", "u", "A", "E", "I", "O", "U")
         if data["this"].startswith(vowels):
@@ -143,7 +146,7 @@ class Fun(callbacks.Plugin):
         Insult generator. Optionally send insult to <nick> (<nick> must be in channel).
         """
         channel = msg.args[0]
-        data = requests.get("https://insult.mattbas.org/api/en/insult.json")
+        data = httpclient.get("https://insult.mattbas.org/api/en/insult.json")
         data = json.loads(data.content)
         if nick:
             response = "{0}: {1}".format(nick, data["insult"])
@@ -157,7 +160,7 @@ class Fun(callbacks.Plugin):
         """
         Returns an excuse from http://developerexcuses.com
         """
-        data = requests.get("http://developerexcuses.com")
+        data = httpclient.get("http://developerexcuses.com")
         if not data:  # http fetch breaks.
             irc.reply("ERROR")
             return
@@ -288,7 +291,7 @@ class Fun(callbacks.Plugin):
         Get a random cat .gif
         """
         try:
-            response = utils.web.getUrl("http://edgecats.net/random").decode()
+            response = httpclient.get("http://edgecats.net/random").text
             # Expecting a link
             if "http" in response:
                 irc.reply(response)
@@ -369,7 +372,7 @@ class Fun(callbacks.Plugin):
         coins = []
         coins.append(optcoin)
         coins_str = ",".join(c.upper() for c in coins)
-        data = requests.get(coin_url.format(coins=coins_str))
+        data = httpclient.get(coin_url.format(coins=coins_str))
         data = json.loads(data.content)
         if "RAW" not in data:
             irc.reply("ERROR: no coin found for {}".format(optcoin))
@@ -394,7 +397,7 @@ class Fun(callbacks.Plugin):
             "https://min-api.cryptocompare.com/data/top/totalvol?limit=10&tsym=USD"
         )
         coin_url = "https://min-api.cryptocompare.com/data/pricemultifull?fsyms={coins}&tsyms=USD"
-        data = requests.get(volm_url)
+        data = httpclient.get(volm_url)
         data = json.loads(data.content)
         coins = []
         for thing in data["Data"]:
@@ -402,7 +405,7 @@ class Fun(callbacks.Plugin):
             coins.append(name)
         coins.append("DOGE")
         coins_str = ",".join(c for c in coins)
-        data = requests.get(coin_url.format(coins=coins_str))
+        data = httpclient.get(coin_url.format(coins=coins_str))
         data = json.loads(data.content)
         output = []
         tmp = {}
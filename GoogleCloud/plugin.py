@@ -35,12 +35,16 @@ import supybot.ircutils as ircutils
 import supybot.callbacks as callbacks
 import supybot.log as log
 import supybot.conf as conf
-import requests
+from . import httpclient
 import json
 import html
 
 
 class GoogleCloud(callbacks.Plugin):
+    def die(self):
+        httpclient.close()
+        super().die()
+
     def translate(self, irc, msg, args, optlist, text):
         """[--from <source>] [--to <target>] <text>
         Translate text using Google Translate API. Uses automatic language detection
@@ -64,7 +68,7 @@ class GoogleCloud(callbacks.Plugin):
             params = {"target": target, "source": source, "key": key, "q": text}
         else:
             params = {"target": target, "key": key, "q": text}
-        response = requests.get(url, params=params, timeout=10)
+        response = httpclient.get(url, params=params, timeout=10)
         if not response.status_code == 200:
             log.debug(
                 "GoogleCloud: Error accessing {0}: {1}".format(
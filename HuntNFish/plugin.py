@@ -29,6 +29,7 @@
 ###
 
 import os
+import re
 import time
 import random as random
 import supybot.conf as conf
@@ -38,6 +39,7 @@ import supybot.plugins as plugins
 import supybot.ircutils as ircutils
 import supybot.callbacks as callbacks
 from supybot.i18n import PluginInternationalization, internationalizeDocstring
+from . import storage
 
 _ = PluginInternationalization("HuntNFish")
 
@@ -53,6 +55,55 @@ class HuntNFish(callbacks.Plugin):
         self.__parent.__init__(irc)
         self._huntersEndTime = {}
         self._fishersEndTime = {}
+        self.storage = storage.Storage(
+            conf.supybot.directories.data.dirize("HuntNFish.sqlite"), "HuntNFish"
+        )
+        self.trophies = self.storage.table(
+            "trophies",
+            (
+                ("channel", "TEXT"),
+                ("kind", "TEXT"),
+                ("nick", "TEXT"),
+                ("target", "TEXT"),
+                ("weight", "INTEGER"),
+            ),
+            ("channel", "kind"),
+        )
+        self.storage.migrate("trophies", self._migrateTrophies)
+
+    def die(self):
+        self.storage.close()
+        self.__parent.die()
+
+    def _migrateTrophies(self):
+        # Imports the hunttrophy_<channel>.db and fishtrophy_<channel>.db files
+        directory = conf.supybot.directories.data()
+        for filename in os.listdir(directory):
+            match = re.match(r"(hunt|fish)trophy_(.+)\.db$", filename)
+            if not match:
+                continue
+            (kind, channel) = match.groups()
+            with open(os.path.join(directory, filename), "r") as f:
+                data = f.read().splitlines()
+            self._setTrophy(channel, kind, data[0], data[1], int(data[2]))
+
+    def _getTrophy(self, channel, kind):
+        """Returns the highscore of channel for kind, hunt or fish."""
+        trophy = self.trophies.get(channel, kind)
+        if not trophy:
+            trophy = {"nick": "Nobody", "target": "nothing", "weight": 2}
+        return trophy
+
+    def _setTrophy(self, channel, kind, nick, target, weight):
+        self.trophies.upsert(
+            {
+                "channel": channel,
+                "kind": kind,
+                "nick": nick,
+                "target": target,
+                "weight": weight,
+            }
+        )
 
     def hunt(self, irc, msg, args):
         """takes no arguments
@@ -78,18 +129,10 @@ class HuntNFish(callbacks.Plugin):
         else:
             endTime = currentTime + timeoutLength
             self._huntersEndTime[player] = endTime
-            hunttrophy = conf.supybot.directories.data.dirize(
-                "hunttrophy_{0}.db".format(channel)
-            )
-            if not os.path.isfile(hunttrophy):
-                with open(hunttrophy, "w") as f:
-                    f.write("Nobody\nnothing\n2")
             if self.registryValue("enable", msg.args[0]):
                 animals = self.registryValue("huntTargets", channel)
                 places = self.registryValue("huntLocales", channel)
-                with open(hunttrophy, "r") as f:
-                    data = f.readlines()
-                    highScore = data[2].rstrip("\n")
+                highScore = self._getTrophy(channel, "hunt")["weight"]
                 huntrandom = random.getstate()
                 random.seed(time.time())
                 currentWhat = random.choice(animals)
@@ -115,22 +158,13 @@ class HuntNFish(callbacks.Plugin):
                             weight, weightType, currentWhat
                         )
                     )
-                    with open(hunttrophy, "r") as f:
-                        data = f.readlines()
-                        bigHunt = data[2].rstrip("\n")
-                        if weight > int(bigHunt):
-                            with open(hunttrophy, "w") as f:
-                                data[0] = msg.nick
-                                data[1] = currentWhat
-                                data[2] = weight
-                                f.write(
-                                    str(data[0])
-                                    + "\n"
-                                    + str(data[1])
-                                    + "\n"
-                                    + str(data[2])
-                                )
-                                irc.reply("You got a new highscore!")
+                    with self.storage.transaction():
+                        bigHunt = self._getTrophy(channel, "hunt")["weight"]
+                        if weight > bigHunt:
+                            self._setTrophy(
+                                channel, "hunt", msg.nick, currentWhat, weight
+                            )
+                            irc.reply("You got a new highscore!")
                 else:
                     irc.reply(
                         "Oops, you missed the {0}{1} {2}.".format(
@@ -163,18 +197,10 @@ class HuntNFish(callbacks.Plugin):
         else:
             endTime = currentTime + timeoutLength
             self._fishersEndTime[player] = endTime
-            fishtrophy = conf.supybot.directories.data.dirize(
-                "fishtrophy_{0}.db".format(channel)
-            )
-            if not os.path.isfile(fishtrophy):
-                with open(fishtrophy, "w") as f:
-                    f.write("Nobody\nnothing\n2")
             if self.registryValue("enable", msg.args[0]):
                 fishes = self.registryValue("fishTargets", channel)
                 fishSpots = self.registryValue("fishLocales", channel)
-                with open(fishtrophy, "r") as f:
-                    data = f.readlines()
-                    highScore = data[2].rstrip("\n")
+                highScore = self._getTrophy(channel, "fish")["weight"]
                 fishrandom = random.getstate()
                 random.seed(time.time())
                 currentWhat = random.choice(fishes)
@@ -200,22 +226,13 @@ class HuntNFish(callbacks.Plugin):
                             str(weight), weightType, currentWhat
                         )
                     )
-                    with open(fishtrophy, "r") as f:
-                        data = f.readlines()
-                        bigFish = data[2].rstrip("\n")
-                        if weight > int(bigFish):
-                            with open(fishtrophy, "w") as f:
-                                data[0] = msg.nick
-                                data[1] = currentWhat
-                                data[2] = weight
-                                f.writelines(
-                                    str(data[0])
-                                    + "\n"
-                                    + str(data[1])
-                                    + "\n"
-                                    + str(data[2])
-                                )
-                                irc.reply("You got a new highscore!")
+                    with self.storage.transaction():
+                        bigFish = self._getTrophy(channel, "fish")["weight"]
+                        if weight > bigFish:
+                            self._setTrophy(
+                                channel, "fish", msg.nick, currentWhat, weight
+                            )
+                            irc.reply("You got a new highscore!")
                 else:
                     irc.reply(
                         "Oops, the {0}{1} {2} got away.".format(
@@ -233,38 +250,18 @@ class HuntNFish(callbacks.Plugin):
         if not irc.isChannel(channel):
             irc.reply("This command must be run in a channel")
             return
-        hunttrophy = conf.supybot.directories.data.dirize(
-            "hunttrophy_{0}.db".format(channel)
-        )
-        fishtrophy = conf.supybot.directories.data.dirize(
-            "fishtrophy_{0}.db".format(channel)
-        )
-        if not os.path.isfile(fishtrophy):
-            with open(fishtrophy, "w") as f:
-                f.write("Nobody\nnothing\n2")
-        if not os.path.isfile(hunttrophy):
-            with open(hunttrophy, "w") as f:
-                f.write("Nobody\nnothing\n2")
         if self.registryValue("enable", msg.args[0]):
             weightType = self.registryValue("weightType")
-            with open(hunttrophy, "r") as f:
-                data = f.readlines()
-                hunter = data[0].rstrip("\n")
-                hunted = data[1].rstrip("\n")
-                size = data[2].rstrip("\n")
-                irc.reply(
-                    "Hunting highscore held by: %s with a %s%s %s"
-                    % (hunter, size, weightType, hunted)
-                )
-            with open(fishtrophy, "r") as f:
-                data = f.readlines()
-                fisherman = data[0].rstrip("\n")
-                catch = data[1].rstrip("\n")
-                size = data[2].rstrip("\n")
-                irc.reply(
-                    "Fishing highscore held by: %s with a %s%s %s"
-                    % (fisherman, size, weightType, catch)
-                )
+            data = self._getTrophy(channel, "hunt")
+            irc.reply(
+                "Hunting highscore held by: %s with a %s%s %s"
+                % (data["nick"], data["weight"], weightType, data["target"])
+            )
+            data = self._getTrophy(channel, "fish")
+            irc.reply(
+                "Fishing highscore held by: %s with a %s%s %s"
+                % (data["nick"], data["weight"], weightType, data["target"])
+            )
 
     trophy = wrap(trophy)
 
@@ -276,16 +273,7 @@ class HuntNFish(callbacks.Plugin):
         if not irc.isChannel(channel):
             irc.reply("This command must be run in a channel")
             return
-        hunttrophy = conf.supybot.directories.data.dirize(
-            "hunttrophy_{0}.db".format(channel)
-        )
-        fishtrophy = conf.supybot.directories.data.dirize(
-            "fishtrophy_{0}.db".format(channel)
-        )
-        with open(hunttrophy, "w") as f:
-            f.write("Nobody\nnothing\n2")
-        with open(fishtrophy, "w") as f:
-            f.write("Nobody\nnothing\n2")
+        self.trophies.delete(channel=channel)
         irc.replySuccess()
 
     resetscores = wrap(resetscores, ["owner"])
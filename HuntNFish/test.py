@@ -0,0 +1,189 @@
+###
+# Copyright (c) 2012, resistivecorpse
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+import os
+
+from supybot.test import *
+import supybot.world as world
+
+from . import storage
+
+
+class StorageTestCase(SupyTestCase):
+    def setUp(self):
+        SupyTestCase.setUp(self)
+        self.filename = conf.supybot.directories.data.dirize("StorageTest.sqlite")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.filename + suffix):
+                os.remove(self.filename + suffix)
+        self.storage = self.open()
+
+    def tearDown(self):
+        self.storage.close()
+        SupyTestCase.tearDown(self)
+
+    def open(self):
+        db = storage.Storage(self.filename, "StorageTest", flush_interval=0)
+        self.table = db.table(
+            "scores",
+            (
+                ("channel", "TEXT"),
+                ("nick", "TEXT"),
+                ("score", "INTEGER"),
+                ("extra", "JSON"),
+            ),
+            ("channel", "nick"),
+        )
+        return db
+
+    def reopen(self):
+        self.storage.close()
+        self.storage = self.open()
+
+    def testUpsertSelectDelete(self):
+        self.table.upsert({"channel": "#a", "nick": "foo", "score": 1})
+        self.table.upsert({"channel": "#a", "nick": "bar", "score": 5})
+        self.table.upsert({"channel": "#b", "nick": "foo", "score": 3})
+        self.assertEqual(self.table.get("#a", "foo")["score"], 1)
+        self.assertIsNone(self.table.get("#c", "foo"))
+        # Updating only some columns keeps the others
+        self.table.upsert({"channel": "#a", "nick": "foo", "extra": [1]})
+        self.assertEqual(self.table.get("#a", "foo")["score"], 1)
+        self.table.upsert({"channel": "#a", "nick": "foo", "score": 2})
+        self.assertEqual(self.table.get("#a", "foo")["extra"], [1])
+        self.assertEqual(
+            [
+                row["nick"]
+                for row in self.table.select(order="score DESC", channel="#a")
+            ],
+            ["bar", "foo"],
+        )
+        self.assertEqual(len(self.table.select(limit=2)), 2)
+        self.table.delete(channel="#a", nick="bar")
+        self.assertEqual(
+            [row["nick"] for row in self.table.select(channel="#a")], ["foo"]
+        )
+        self.table.delete(channel="#a")
+        self.assertEqual(len(self.table.select()), 1)
+        self.reopen()
+        self.assertEqual(self.table.get("#b", "foo")["score"], 3)
+
+    def testJsonColumns(self):
+        value = {"options": [1, "two", None], "enabled": True}
+        self.table.upsert({"channel": "#a", "nick": "foo", "extra": value})
+        self.table.upsert({"channel": "#a", "nick": "bar", "extra": "10"})
+        self.reopen()
+        self.assertEqual(self.table.get("#a", "foo")["extra"], value)
+        # Strings that look like numbers are not converted
+        self.assertEqual(self.table.get("#a", "bar")["extra"], "10")
+        self.assertEqual(
+            [row["nick"] for row in self.table.select(extra=value)], ["foo"]
+        )
+        self.table.upsert({"channel": "#a", "nick": "baz", "score": 1})
+        self.assertIsNone(self.table.get("#a", "baz")["extra"])
+
+    def testTransactionRollback(self):
+        self.table.upsert({"channel": "#a", "nick": "foo", "score": 1})
+        with self.assertRaises(ValueError):
+            with self.storage.transaction():
+                self.table.upsert({"channel": "#a", "nick": "foo", "score": 2})
+                self.table.upsert({"channel": "#a", "nick": "bar", "score": 2})
+                raise ValueError
+        self.assertEqual(self.table.get("#a", "foo")["score"], 1)
+        self.assertIsNone(self.table.get("#a", "bar"))
+        with self.storage.transaction():
+            self.table.upsert({"channel": "#a", "nick": "bar", "score": 2})
+        self.assertFalse(self.storage.conn.in_transaction)
+        self.reopen()
+        self.assertEqual(self.table.get("#a", "bar")["score"], 2)
+
+    def testMigrate(self):
+        calls = []
+
+        def fail():
+            self.table.upsert({"channel": "#a", "nick": "foo", "score": 1})
+            raise ValueError
+
+        def succeed():
+            calls.append(1)
+            self.table.upsert({"channel": "#a", "nick": "bar", "score": 1})
+
+        # A migration that raises is rolled back and run again next time
+        self.assertFalse(self.storage.migrate("test", fail))
+        self.assertEqual(self.table.select(), [])
+        self.assertTrue(self.storage.migrate("test", succeed))
+        self.reopen()
+        self.assertFalse(self.storage.migrate("test", succeed))
+        self.assertEqual(calls, [1])
+        self.assertEqual([row["nick"] for row in self.table.select()], ["bar"])
+
+    def testClose(self):
+        self.assertIn(self.storage.flush, world.flushers)
+        self.table.upsert({"channel": "#a", "nick": "foo", "score": 1})
+        self.storage.close()
+        self.assertNotIn(self.storage.flush, world.flushers)
+        # Closing commits pending writes
+        self.storage = self.open()
+        self.assertEqual(self.table.get("#a", "foo")["score"], 1)
+
+
+class HuntNFishTestCase(ChannelPluginTestCase):
+    plugins = ("HuntNFish",)
+    cleanDataDir = False
+
+    def setUp(self):
+        # Start from the trophy files of an older version
+        data = conf.supybot.directories.data()
+        shutil.rmtree(data)
+        os.makedirs(data)
+        with open(os.path.join(data, "fishtrophy_#test.db"), "w") as f:
+            f.write("alice\ncarp\n50")
+        ChannelPluginTestCase.setUp(self)
+
+    def testTrophiesAreMigrated(self):
+        self.assertResponse(
+            "trophy", "Hunting highscore held by: Nobody with a 2lb nothing"
+        )
+        self.assertEqual(
+            self.irc.takeMsg().args[1],
+            "test: Fishing highscore held by: alice with a 50lb carp",
+        )
+        self.assertNotError("resetscores")
+        self.assertResponse(
+            "trophy", "Hunting highscore held by: Nobody with a 2lb nothing"
+        )
+        self.assertEqual(
+            self.irc.takeMsg().args[1],
+            "test: Fishing highscore held by: Nobody with a 2lb nothing",
+        )
+
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab textwidth=79:
@@ -55,11 +55,17 @@ __contributors__ = {}
 __url__ = "https://github.com/oddluck/limnoria-plugins/"
 
 from . import config
+from . import httpclient
+from . import responsecache
+from . import templatecache
 from . import plugin
 from imp import reload
 
 # In case we're being reloaded.
 reload(config)
+reload(httpclient)
+reload(responsecache)
+reload(templatecache)
 reload(plugin)
 # Add more reloads here if you add third-party modules and want them to be
 # reloaded when this plugin is reloaded.  Don't forget to import them as well!
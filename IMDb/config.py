@@ -110,4 +110,31 @@ conf.registerGlobalValue(
     IMDb, "omdbAPI", registry.String("", _("""OMDB API Key"""), private=True)
 )
 
+conf.registerGlobalValue(
+    IMDb,
+    "cacheLifetime",
+    registry.NonNegativeInteger(
+        86400,
+        _(
+            """
+            Time in seconds OMDB API responses are cached. 0 disables the cache.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    IMDb,
+    "persistentCache",
+    registry.Boolean(
+        False,
+        _(
+            """
+            Also keep cached responses in an SQLite database in the data
+            directory, so they survive restarts. Requires reloading the plugin.
+            """
+        ),
+    ),
+)
+
 # vim:set shiftwidth=4 tabstop=4 expandtab textwidth=79:
@@ -35,8 +35,13 @@ import supybot.ircutils as ircutils
 import supybot.ircmsgs as ircmsgs
 import supybot.callbacks as callbacks
 import supybot.log as log
-import json, random, re
+import supybot.conf as conf
+import supybot.schedule as schedule
+import random, re
 from string import Template
+from . import httpclient
+from . import responsecache
+from . import templatecache
 
 try:
     from supybot.i18n import PluginInternationalization
@@ -67,6 +72,53 @@ class IMDb(callbacks.Plugin):
 
     threaded = True
 
+    def __init__(self, irc):
+        self.__parent = super(IMDb, self)
+        self.__parent.__init__(irc)
+        filename = None
+        if self.registryValue("persistentCache"):
+            filename = conf.supybot.directories.data.dirize("IMDb.cache.db")
+        self.cache = responsecache.ResponseCache(filename=filename)
+        self.get_omdb = self.cache.wrap(
+            self.get_omdb, lambda: self.registryValue("cacheLifetime")
+        )
+        self.vacuum_event = None
+        if filename:
+            # Expired rows are only replaced on a miss, so drop them hourly
+            self.vacuum_event = schedule.addPeriodicEvent(
+                self.cache.vacuum, 3600, name="IMDb.cache.vacuum", now=False
+            )
+        self.templates = templatecache.TemplateCache(lowercase_template)
+
+    def die(self):
+        if self.vacuum_event:
+            schedule.removeEvent(self.vacuum_event)
+        self.cache.close()
+        self.templates.close()
+        httpclient.close()
+        self.__parent.die()
+
+    def get_omdb(self, field, value):
+        """
+        Returns the OMDB API response for an IMDb ID (field i) or a title
+        (field t), or None if there is no match. Matches are cached for
+        cacheLifetime.
+        """
+        url = "http://www.omdbapi.com/?" + utils.web.urlencode(
+            {
+                field: value,
+                "plot": "short",
+                "r": "json",
+                "apikey": self.registryValue("omdbAPI"),
+            }
+        )
+        log.debug("IMDb: requesting %s" % url)
+        response = httpclient.get(url).json()
+        if response["Response"] != "False" and not response.get("Error"):
+            return response
+        if response.get("Error"):
+            log.debug("IMDb: OMDB API: %s" % response["Error"])
+
     def dosearch(self, irc, channel, text):
         google = None
         ddg = None
@@ -142,31 +194,11 @@ class IMDb(callbacks.Plugin):
             url = self.dosearch(irc, msg.channel, query)
         if url:
             id = url.split("/title/")[1].rstrip("/")
-            url = "http://www.omdbapi.com/?" + utils.web.urlencode(
-                {
-                    "i": id,
-                    "plot": "short",
-                    "r": "json",
-                    "apikey": self.registryValue("omdbAPI"),
-                }
-            )
-            log.debug("IMDb: requesting %s" % url)
+            response = self.get_omdb("i", id)
         else:
-            url = "http://www.omdbapi.com/?" + utils.web.urlencode(
-                {
-                    "t": query,
-                    "plot": "short",
-                    "r": "json",
-                    "apikey": self.registryValue("omdbAPI"),
-                }
-            )
-            log.debug("IMDb: requesting %s" % url)
-        request = utils.web.getUrl(url).decode()
-        response = json.loads(request)
-        if response["Response"] != "False" and not response.get("Error"):
-            imdb_template = lowercase_template(
-                self.registryValue("template", msg.channel)
-            )
+            response = self.get_omdb("t", query)
+        if response:
+            imdb_template = self.templates.get_registry(self, "template", msg.channel)
             response["logo"] = self.registryValue("logo", msg.channel)
             response["tomatometer"] = "N/A"
             response["metascore"] = "N/A"
@@ -176,8 +208,6 @@ class IMDb(callbacks.Plugin):
                 if rating["Source"] == "Metacritic":
                     response["metascore"] = "{0}%".format(rating["Value"].split("/")[0])
             result = imdb_template.safe_substitute(response)
-        elif response.get("Error"):
-            log.debug("IMDb: OMDB API: %s" % response["Error"])
         if result:
             irc.reply(result, prefixNick=False)
         else:
@@ -185,6 +215,15 @@ class IMDb(callbacks.Plugin):
 
     imdb = wrap(imdb, ["text"])
 
+    def cachestats(self, irc, msg, args):
+        """takes no arguments
+
+        Shows the size and hit rate of the OMDB API response cache.
+        """
+        irc.reply(self.cache.format_stats())
+
+    cachestats = wrap(cachestats, ["owner"])
+
 
 Class = IMDb
 
@@ -2,4 +2,7 @@ from supybot.setup import plugin_setup
 
 plugin_setup(
     'IMDb',
+    install_requires=[
+        'requests',
+    ],
 )
@@ -0,0 +1,143 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+
+"""
+templatecache: bounded cache of compiled templates keyed by template source.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class TemplateCache:
+    """
+    Thread-safe LRU cache of compiled templates keyed by template source, so
+    each distinct template is only compiled once. Templates read from the
+    registry are also cached by value name, channel and network, in a second
+    LRU of the same size, until a registry callback reports that the value
+    changed. Call close() when the plugin dies.
+    """
+
+    def __init__(self, factory, max_entries=64):
+        self.factory = factory
+        self.max_entries = max_entries
+        self._templates = OrderedDict()
+        self._registry = OrderedDict()
+        self._generation = 0
+        self._hooked = {}
+        self._lock = threading.Lock()
+        # Registry callbacks are removed by identity, so keep one bound method
+        self._callback = self.invalidate
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._templates)
+
+    def get(self, source):
+        """
+        Returns the compiled template for source
+        """
+        with self._lock:
+            template = self._templates.get(source)
+            if template is not None:
+                self._templates.move_to_end(source)
+                self.hits += 1
+                return template
+        # Compile outside the lock; a syntax error is raised to the caller
+        # and nothing is cached.
+        template = self.factory(source)
+        with self._lock:
+            self.misses += 1
+            self._templates[source] = template
+            self._templates.move_to_end(source)
+            while self.max_entries and len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+        return template
+
+    def get_registry(self, plugin, name, channel=None, network=None):
+        """
+        Returns the compiled template stored in the plugin's registry value
+        name, for the given channel and network.
+        """
+        key = (name, channel, network)
+        with self._lock:
+            template = self._registry.get(key)
+            if template is not None:
+                self._registry.move_to_end(key)
+                self.hits += 1
+                return template
+            generation = self._generation
+        value = plugin.registryValue(name, value=False)
+        source = value.getSpecific(network, channel, check=False)()
+        self._hook(value)
+        template = self.get(source)
+        with self._lock:
+            # Don't keep a template if a value changed while it was read
+            if generation == self._generation:
+                self._registry[key] = template
+                while self.max_entries and len(self._registry) > self.max_entries:
+                    self._registry.popitem(last=False)
+        return template
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._registry.clear()
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._templates.clear()
+            self._registry.clear()
+
+    def close(self):
+        """
+        Removes the registry callbacks, call this when the plugin dies
+        """
+        with self._lock:
+            for value in self._hooked.values():
+                value.removeCallback(self._callback)
+            self._hooked.clear()
+            self._registry.clear()
+
+    def _hook(self, value):
+        # Channel and network specific values are children of the global value
+        # and don't run its callbacks, so every child gets the callback too.
+        # Children created later are hooked when a template first reads them.
+        with self._lock:
+            stack = [value]
+            while stack:
+                value = stack.pop()
+                if id(value) not in self._hooked:
+                    value.addCallback(self._callback)
+                    self._hooked[id(value)] = value
+                stack.extend(value._children.values())
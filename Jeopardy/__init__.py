@@ -63,9 +63,15 @@ __contributors__ = {
 __url__ = "https://github.com/oddluck/limnoria-plugins/"
 
 from . import config
+from . import httpclient
+from . import storage
+from . import templatecache
 from . import plugin
 from imp import reload
 
+reload(httpclient)
+reload(storage)
+reload(templatecache)
 reload(plugin)  # In case we're being reloaded.
 reload(config)
 # Add more reloads here if you add third-party modules and want them to be
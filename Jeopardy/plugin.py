@@ -39,6 +39,9 @@ import os
 import random
 import re
 import requests
+from . import httpclient
+from . import storage
+from . import templatecache
 from unidecode import unidecode
 import json
 import string
@@ -66,6 +69,55 @@ class Jeopardy(callbacks.Plugin):
         self.games = requests.structures.CaseInsensitiveDict()
         self.history = requests.structures.CaseInsensitiveDict()
         self.jserviceUrl = self.registryValue("jserviceUrl").strip("/")
+        self.templates = templatecache.TemplateCache(Template)
+        self.storage = storage.Storage(
+            conf.supybot.directories.data.dirize("Jeopardy.sqlite"), "Jeopardy"
+        )
+        self.scoreDb = self.storage.table(
+            "scores",
+            (
+                ("channel", "TEXT COLLATE NOCASE"),
+                ("nick", "TEXT COLLATE NOCASE"),
+                ("score", "INTEGER"),
+            ),
+            ("channel", "nick"),
+        )
+        self.historyDb = self.storage.table(
+            "history",
+            (("channel", "TEXT COLLATE NOCASE"), ("id", "INTEGER")),
+            ("channel", "id"),
+        )
+        self.storage.migrate("files", self._migrateFiles)
+
+    def die(self):
+        for game in self.games.values():
+            game.clear()
+        self.templates.close()
+        self.storage.close()
+        httpclient.close()
+        self.__parent.die()
+
+    def _migrateFiles(self):
+        # Imports the scores_<channel>.txt and history_<channel>.txt files
+        directory = conf.supybot.directories.data.dirize("jeopardy/")
+        if not os.path.isdir(directory):
+            return
+        for filename in os.listdir(directory):
+            match = re.match(r"(scores|history)_(.+)\.txt$", filename)
+            if not match:
+                continue
+            (kind, channel) = match.groups()
+            with open(os.path.join(directory, filename), "r") as f:
+                lines = [line.split() for line in f if line.strip()]
+            if kind == "scores":
+                self.scoreDb.upsert_many(
+                    {"channel": channel, "nick": name, "score": int(score)}
+                    for (name, score) in lines
+                )
+            else:
+                self.historyDb.upsert_many(
+                    {"channel": channel, "id": int(id)} for (id,) in lines
+                )
 
     def doPrivmsg(self, irc, msg):
         channel = msg.channel
@@ -74,6 +126,10 @@ class Jeopardy(callbacks.Plugin):
         if self.registryValue("enabled", channel) and channel in self.games:
             self.games[channel].answer(msg)
 
+    def getTemplate(self, name, channel):
+        """Returns the compiled template stored in the registry value name."""
+        return self.templates.get_registry(self, name, channel)
+
     class Game:
         def __init__(
             self,
@@ -91,6 +147,7 @@ class Jeopardy(callbacks.Plugin):
             plugin,
         ):
             self.registryValue = plugin.registryValue
+            self.getTemplate = plugin.getTemplate
             defaultPoints = self.registryValue("defaultPointValue")
             self.active = True
             self.answered = 0
@@ -99,21 +156,18 @@ class Jeopardy(callbacks.Plugin):
             self.channel = channel
             self.correct = True
             if restart:
-                self.correct_template = Template(
-                    self.registryValue("template.restart.correct", channel)
+                self.correct_template = self.getTemplate(
+                    "template.restart.correct", channel
                 )
             else:
-                self.correct_template = Template(
-                    self.registryValue("template.correct", channel)
-                )
+                self.correct_template = self.getTemplate("template.correct", channel)
             self.currentHint = ""
             self.delay = self.registryValue("delay", channel)
-            self.directory = conf.supybot.directories.data.dirize("jeopardy/")
             self.flexibility = self.registryValue("flexibility", channel)
             self.games = plugin.games
-            self.hint_template = Template(self.registryValue("template.hint", channel))
+            self.hint_template = self.getTemplate("template.hint", channel)
             self.history = plugin.history
-            self.historyFile = "{0}/history_{1}.txt".format(self.directory, channel)
+            self.historyDb = plugin.historyDb
             self.irc = irc
             self.jserviceUrl = plugin.jserviceUrl
             self.num = num
@@ -122,27 +176,26 @@ class Jeopardy(callbacks.Plugin):
             self.numHints = hints
             self.question = ""
             if restart:
-                self.question_template = Template(
-                    self.registryValue("template.restart.question", channel)
+                self.question_template = self.getTemplate(
+                    "template.restart.question", channel
                 )
             else:
-                self.question_template = Template(
-                    self.registryValue("template.question", channel)
-                )
+                self.question_template = self.getTemplate("template.question", channel)
             self.questions = []
             self.points = 0
             self.reduction = self.registryValue("hintReduction", self.channel)
             self.restart = restart
             self.roundscores = requests.structures.CaseInsensitiveDict()
-            self.scoreFile = "{0}/scores_{1}.txt".format(self.directory, channel)
+            self.scoreDb = plugin.scoreDb
             self.scores = requests.structures.CaseInsensitiveDict()
             self.showBlank = showBlank
             self.showHints = showHints
             self.showTime = showTime
             self.shuffled = shuffle
-            self.skip_template = Template(self.registryValue("template.skip", channel))
-            self.stop_template = Template(self.registryValue("template.stop", channel))
-            self.time_template = Template(self.registryValue("template.time", channel))
+            self.skip_template = self.getTemplate("template.skip", channel)
+            self.stop_template = self.getTemplate("template.stop", channel)
+            self.storage = plugin.storage
+            self.time_template = self.getTemplate("template.time", channel)
             self.timeout = timeout
             self.timeReplies = self.registryValue("timeReplies", self.channel)
             self.total = num
@@ -151,29 +204,13 @@ class Jeopardy(callbacks.Plugin):
                 self.waitTime = timeout / (hints + 1)
             elif timeout > 0 and showTime:
                 self.waitTime = timeout / (self.timeReplies + 1)
-            if not os.path.exists(self.directory):
-                os.makedirs(self.directory)
             if self.registryValue("keepHistory", channel):
-                if not os.path.exists(self.historyFile):
-                    f = open(self.historyFile, "w")
-                    f.close()
                 if not self.history.get(channel):
-                    self.history[channel] = []
-                    f = open(self.historyFile, "r")
-                    lines = f.readlines()
-                    for line in lines:
-                        self.history[channel].append(int(line))
-                    f.close()
-            if not os.path.exists(self.scoreFile):
-                f = open(self.scoreFile, "w")
-                f.close()
-            if not self.scores:
-                f = open(self.scoreFile, "r")
-                lines = f.readlines()
-                for line in lines:
-                    (name, score) = line.split(" ")
-                    self.scores[name] = int(score)
-                f.close()
+                    self.history[channel] = [
+                        row["id"] for row in self.historyDb.select(channel=channel)
+                    ]
+            for row in self.scoreDb.select(channel=channel):
+                self.scores[row["nick"]] = row["score"]
             cluecount = self.num
             asked = []
             if self.categories == "random":
@@ -183,12 +220,12 @@ class Jeopardy(callbacks.Plugin):
                         break
                     try:
                         if self.jserviceUrl == "http://jservice.io":
-                            data = requests.get(
+                            data = httpclient.get(
                                 "{0}/api/random".format(self.jserviceUrl), timeout=5
                             )
                             data = json.loads(data.content.decode())
                         else:
-                            data = requests.get(
+                            data = httpclient.get(
                                 "{0}/api/random?count={1}".format(
                                     self.jserviceUrl, self.num + 5
                                 ),
@@ -262,7 +299,7 @@ class Jeopardy(callbacks.Plugin):
                             break
                         try:
                             category = int(category)
-                            data = requests.get(
+                            data = httpclient.get(
                                 "{0}/api/clues?category={1}".format(
                                     self.jserviceUrl, category
                                 )
@@ -277,7 +314,7 @@ class Jeopardy(callbacks.Plugin):
                             if cluecount > 100:
                                 data.extend(
                                     json.loads(
-                                        requests.get(
+                                        httpclient.get(
                                             "{0}/api/clues?&category={1}&offset=100"
                                             .format(self.jserviceUrl, category),
                                             timeout=5,
@@ -287,7 +324,7 @@ class Jeopardy(callbacks.Plugin):
                             if cluecount > 200:
                                 data.extend(
                                     json.loads(
-                                        requests.get(
+                                        httpclient.get(
                                             "{0}/api/clues?&category={1}&offset=200"
                                             .format(self.jserviceUrl, category),
                                             timeout=5,
@@ -297,7 +334,7 @@ class Jeopardy(callbacks.Plugin):
                             if cluecount > 300:
                                 data.extend(
                                     json.loads(
-                                        requests.get(
+                                        httpclient.get(
                                             "{0}/api/clues?&category={1}&offset=300"
                                             .format(self.jserviceUrl, category),
                                             timeout=5,
@@ -307,7 +344,7 @@ class Jeopardy(callbacks.Plugin):
                             if cluecount > 400:
                                 data.extend(
                                     json.loads(
-                                        requests.get(
+                                        httpclient.get(
                                             "{0}/api/clues?&category={1}&offset=400"
                                             .format(self.jserviceUrl, category),
                                             timeout=5,
@@ -317,7 +354,7 @@ class Jeopardy(callbacks.Plugin):
                             if cluecount > 500:
                                 data.extend(
                                     json.loads(
-                                        requests.get(
+                                        httpclient.get(
                                             "{0}/api/clues?&category={1}&offset=500"
                                             .format(self.jserviceUrl, category),
                                             timeout=5,
@@ -485,6 +522,7 @@ class Jeopardy(callbacks.Plugin):
             self.correct = False
             if self.registryValue("keepHistory", self.channel):
                 self.history[self.channel].append(int(self.id))
+                self.historyDb.upsert({"channel": self.channel, "id": int(self.id)})
             self.reply(self.question)
             if self.timeout > 0:
 
@@ -706,6 +744,13 @@ class Jeopardy(callbacks.Plugin):
                     if not msg.nick in self.scores:
                         self.scores[msg.nick] = 0
                     self.scores[msg.nick] += self.p
+                    self.scoreDb.upsert(
+                        {
+                            "channel": self.channel,
+                            "nick": msg.nick,
+                            "score": self.scores[msg.nick],
+                        }
+                    )
                     if not msg.nick in self.roundscores:
                         self.roundscores[msg.nick] = 0
                     self.roundscores[msg.nick] += self.p
@@ -730,15 +775,7 @@ class Jeopardy(callbacks.Plugin):
                 self.irc.queueMsg(ircmsgs.privmsg(self.channel, s))
 
         def write(self):
-            f = open(self.scoreFile, "w")
-            for score in self.scores.items():
-                f.write("%s %s\n" % (score[0], score[1]))
-            f.close()
-            if self.registryValue("keepHistory", self.channel):
-                f = open(self.historyFile, "w")
-                for id in self.history[self.channel]:
-                    f.write("%s\n" % (id))
-                f.close()
+            self.storage.flush()
 
     def start(self, irc, msg, args, channel, optlist, categories):
         """[--num <#>] [--no-hints] [--shuffle] [<category1>, <category2>, etc.]
@@ -809,7 +846,7 @@ class Jeopardy(callbacks.Plugin):
                 seed = random.randint(0, 184) * 100
             else:
                 seed = random.randint(0, 250) * 100
-            data = requests.get(
+            data = httpclient.get(
                 "{0}/api/categories?count=100&offset={1}".format(
                     self.jserviceUrl, int(seed)
                 ),
@@ -832,7 +869,7 @@ class Jeopardy(callbacks.Plugin):
                     results.append(category)
                 else:
                     url = "{0}/search?query={1}".format(self.jserviceUrl, category)
-                    data = requests.get(url, timeout=5)
+                    data = httpclient.get(url, timeout=5)
                     soup = BeautifulSoup(data.content)
                     searches = soup.find_all("a")
                     for i in range(len(searches)):
@@ -1003,41 +1040,27 @@ class Jeopardy(callbacks.Plugin):
                 else:
                     return
         except KeyError:
-            scores = requests.structures.CaseInsensitiveDict()
-            scoreFile = "{0}/jeopardy/scores_{1}.txt".format(
-                conf.supybot.directories.data, channel
-            )
-            if not os.path.exists(scoreFile):
-                return
             if nick:
-                f = open(scoreFile, "r")
-                line = f.readline()
-                while line:
-                    (name, score) = line.split(" ")
-                    scores[name] = int(score.strip("\r\n"))
-                    line = f.readline()
-                f.close()
-                try:
-                    total = scores[nick]
+                row = self.scoreDb.get(channel, nick)
+                if row:
                     irc.reply(
-                        "Total score for {0} in {1}: {2}".format(nick, channel, total),
+                        "Total score for {0} in {1}: {2}".format(
+                            nick, channel, row["score"]
+                        ),
                         prefixNick=False,
                     )
-                except KeyError:
+                else:
                     irc.reply(
                         "No scores found for {0} in {1}".format(nick, channel),
                         prefixNick=False,
                     )
             else:
-                f = open(scoreFile, "r")
-                line = f.readline()
-                while line:
-                    (name, score) = line.split(" ")
-                    scores[name] = int(score.strip("\r\n"))
-                    line = f.readline()
-                f.close()
-                sorted_x = []
-                sorted_x = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+                sorted_x = [
+                    (row["nick"], row["score"])
+                    for row in self.scoreDb.select(
+                        order="score DESC", limit=top, channel=channel
+                    )
+                ]
                 if len(sorted_x) < top:
                     top = len(sorted_x)
                 if top > 0:
@@ -1098,7 +1121,7 @@ class Jeopardy(callbacks.Plugin):
             return
         if channel in self.games:
             if self.games[channel].active:
-                r = requests.post(
+                r = httpclient.post(
                     "{0}/api/invalid".format(self.jserviceUrl),
                     data={"id": self.games[channel].id},
                 )
@@ -0,0 +1,67 @@
+###
+# Copyright (c) 2010, quantumlemur
+# Copyright (c) 2011, Valentin Lorentz
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+import os
+
+from supybot.test import *
+
+
+class JeopardyTestCase(ChannelPluginTestCase):
+    plugins = ("Jeopardy",)
+    cleanDataDir = False
+
+    def setUp(self):
+        # Start from the score and history files of an older version
+        data = conf.supybot.directories.data()
+        shutil.rmtree(data)
+        os.makedirs(os.path.join(data, "jeopardy"))
+        for filename, text in (
+            ("scores_#test.txt", "alice 300\nbob 200\n"),
+            ("history_#test.txt", "12\n34\n"),
+        ):
+            with open(os.path.join(data, "jeopardy", filename), "w") as f:
+                f.write(text)
+        ChannelPluginTestCase.setUp(self)
+
+    def testFilesAreMigrated(self):
+        cb = self.irc.getCallback("Jeopardy")
+        self.assertEqual(cb.scoreDb.get("#test", "alice")["score"], 300)
+        self.assertEqual(
+            sorted((row["nick"], row["score"]) for row in cb.scoreDb.select()),
+            [("alice", 300), ("bob", 200)],
+        )
+        self.assertEqual(
+            sorted(row["id"] for row in cb.historyDb.select(channel="#test")),
+            [12, 34],
+        )
+
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab textwidth=79:
@@ -56,6 +56,9 @@ __contributors__ = {}
 __url__ = "https://github.com/oddluck/limnoria-plugins/"
 
 from . import config
+from . import httpclient
+from . import responsecache
+from . import storage
 from . import plugin
 
 if sys.version_info >= (3, 4):
@@ -64,6 +67,9 @@ else:
     from imp import reload
 # In case we're being reloaded.
 reload(config)
+reload(httpclient)
+reload(responsecache)
+reload(storage)
 reload(plugin)
 # Add more reloads here if you add third-party modules and want them to be
 # reloaded when this plugin is reloaded.  Don't forget to import them as well!
@@ -54,6 +54,17 @@ Soccer = conf.registerPlugin("Soccer")
 # This is where your configuration variables (if any) should go.  For example:
 # conf.registerGlobalValue(Soccer, 'someConfigVariableName',
 #     registry.Boolean(False, _("""Help for someConfigVariableName.""")))
+conf.registerGlobalValue(
+    Soccer,
+    "cacheLifetime",
+    registry.NonNegativeInteger(
+        60,
+        _(
+            """Time in seconds scores fetched from the ESPN API are cached. 0
+            disables the cache."""
+        ),
+    ),
+)
 
 
 # vim:set shiftwidth=4 tabstop=4 expandtab textwidth=79:
@@ -41,7 +41,9 @@ except ImportError:
     _ = lambda x: x
 
 # Non-supybot imports
-import requests
+from . import httpclient
+from . import responsecache
+from . import storage
 import pendulum
 import pickle
 import json
@@ -56,7 +58,18 @@ class Soccer(callbacks.Plugin):
         self.__parent = super(Soccer, self)
         self.__parent.__init__(irc)
 
+        self.cache = responsecache.ResponseCache()
+        self._get_json = self.cache.wrap(
+            self._get_json, lambda: self.registryValue("cacheLifetime")
+        )
+
         self.PICKLEFILE = conf.supybot.directories.data.dirize("soccer-leagues.db")
+        self.storage = storage.Storage(
+            conf.supybot.directories.data.dirize("Soccer.sqlite"), "Soccer"
+        )
+        self.leagues = self.storage.table(
+            "leagues", (("name", "TEXT"), ("league", "TEXT")), ("name",)
+        )
 
         self.BASE_API_URL = (
             "http://site.api.espn.com/apis/site/v2/sports/"
@@ -83,9 +96,9 @@ class Soccer(callbacks.Plugin):
 
         try:
             with open(self.PICKLEFILE, "rb") as handle:
-                self.LEAGUE_MAP = pickle.load(handle)
+                leagues = pickle.load(handle)
         except:
-            self.LEAGUE_MAP = {
+            leagues = {
                 "epl": "eng.1",
                 "mls": "usa.1",
                 "ecl": "eng.2",
@@ -105,6 +118,14 @@ class Soccer(callbacks.Plugin):
                 "africa": "caf.nations_qual",
                 "cl": "eng.2",
             }
+        # Imports the pickled leagues database, or the default leagues
+        self.storage.migrate(
+            "soccer-leagues.db",
+            lambda: self.leagues.upsert_many(
+                {"name": name, "league": league} for (name, league) in leagues.items()
+            ),
+        )
+        self.LEAGUE_MAP = {row["name"]: row["league"] for row in self.leagues.select()}
 
         # TO-DO / think about:
         """
@@ -123,10 +144,23 @@ class Soccer(callbacks.Plugin):
             schedule.addPeriodicEvent(periodicCheckGames, 20, now=False, name='fetchCFBscores')
         """
 
-    def _dumpDB(self, db):
-        with open(self.PICKLEFILE, "wb") as handle:
-            pickle.dump(db, handle, protocol=pickle.HIGHEST_PROTOCOL)
-        return
+    def die(self):
+        self.storage.close()
+        self.cache.close()
+        httpclient.close()
+        self.__parent.die()
+
+    def _get_json(self, url):
+        """Fetches and decodes an ESPN API response, cached for cacheLifetime"""
+        return json.loads(httpclient.get(url).content)
+
+    @wrap(["owner"])
+    def cachestats(self, irc, msg, args):
+        """takes no arguments
+
+        Shows the size and hit rate of the scores cache.
+        """
+        irc.reply(self.cache.format_stats())
 
     @wrap(["admin", "text"])
     def addleague(self, irc, msg, args, league):
@@ -142,7 +176,7 @@ class Soccer(callbacks.Plugin):
             irc.reply("Already in database")
             return
         self.LEAGUE_MAP[league[0]] = league[1]
-        self._dumpDB(self.LEAGUE_MAP)
+        self.leagues.upsert({"name": league[0], "league": league[1]})
         irc.replySuccess()
         return
 
@@ -160,7 +194,7 @@ class Soccer(callbacks.Plugin):
             irc.reply("Not found in database")
             return
         self.LEAGUE_MAP.pop(league, None)
-        self._dumpDB(self.LEAGUE_MAP)
+        self.leagues.delete(name=league)
         irc.replySuccess()
         return
 
@@ -231,13 +265,11 @@ class Soccer(callbacks.Plugin):
         url = self.BASE_API_URL.format(date=date, league=mapped_league)
 
         try:
-            data = requests.get(url)
+            data = self._get_json(url)
         except:
-            irc.reply("Something went wrong fetching data from {}".format(data.url))
+            irc.reply("Something went wrong fetching data from {}".format(url))
             return
 
-        data = json.loads(data.content)
-
         if "leagues" not in data:
             irc.reply(
                 "ERROR: {} not found in valid leagues: {}".format(
@@ -0,0 +1,62 @@
+###
+# Copyright (c) 2018, cottongin
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+import os
+import pickle
+
+from supybot.test import *
+
+
+class SoccerTestCase(PluginTestCase):
+    plugins = ("Soccer",)
+    cleanDataDir = False
+
+    def setUp(self):
+        # Start from the pickled leagues of an older version
+        data = conf.supybot.directories.data()
+        shutil.rmtree(data)
+        os.makedirs(data)
+        with open(os.path.join(data, "soccer-leagues.db"), "wb") as f:
+            pickle.dump({"epl": "eng.1", "local": "eng.5"}, f)
+        PluginTestCase.setUp(self)
+
+    def testLeaguesAreMigrated(self):
+        cb = self.irc.getCallback("Soccer")
+        self.assertEqual(cb.LEAGUE_MAP, {"epl": "eng.1", "local": "eng.5"})
+        self.assertResponse("addleague local eng.6", "Already in database")
+        self.assertNotError("remleague local")
+        self.assertResponse("remleague local", "Not found in database")
+        self.assertEqual(
+            [row["name"] for row in cb.leagues.select()],
+            ["epl"],
+        )
+
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab textwidth=79:
@@ -55,10 +55,37 @@ __contributors__ = {}
 __url__ = "https://github.com/oddluck/limnoria-plugins/"
 
 from . import config
+from . import cache
+from . import configsnapshot
+from . import domains
+from . import store
+from . import extract
+from . import media
+from . import metrics
+from . import breaker
+from . import pool
+from . import redirects
+from . import templatecache
+from . import twitch
+from . import youtube
 from . import plugin
 from imp import reload
 
 # In case we're being reloaded.
+# Helper modules first, so the reloaded plugin picks up their new code.
+reload(cache)
+reload(configsnapshot)
+reload(domains)
+reload(store)
+reload(extract)
+reload(media)
+reload(metrics)
+reload(breaker)
+reload(pool)
+reload(redirects)
+reload(templatecache)
+reload(twitch)
+reload(youtube)
 reload(plugin)
 reload(config)
 # Add more reloads here if you add third-party modules and want them to be
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of domain dispatch: the old handlers dict with a base domain
+fallback and regex black/whitelists, against one walk of the domain index.
+
+Usage: python3 bench/bench_domains.py [iterations]
+"""
+
+import importlib.util
+import os
+import re
+import sys
+import timeit
+from urllib.parse import urlparse
+
+# Load domains.py on its own, so the benchmark runs without Limnoria installed
+path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "domains.py")
+spec = importlib.util.spec_from_file_location("domains", path)
+domains = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(domains)
+
+HANDLERS = {
+    domain: name
+    for (name, domain_list) in {
+        "youtube": ["youtube.com", "youtu.be"],
+        "imdb": ["imdb.com"],
+        "imgur_image": ["i.imgur.com"],
+        "imgur": ["imgur.com"],
+        "coub": ["coub.com"],
+        "vimeo": ["vimeo.com"],
+        "dailymotion": ["www.dailymotion.com", "dailymotion.com", "dai.ly"],
+        "wikipedia": ["wikipedia.org"],
+        "reddit": ["reddit.com", "www.reddit.com"],
+        "twitch": ["twitch.tv", "www.twitch.tv", "go.twitch.tv", "clips.twitch.tv"],
+        "twitter": ["twitter.com", "www.twitter.com"],
+    }.items()
+    for domain in domain_list
+}
+IGNORED = ["buzzfeed.com", "*.tk", "example.net"]
+IGNORED_PATTERN = re.compile(r"(buzzfeed\.com|\.tk$|example\.net)")
+WHITELISTED = ["youtube.com", "youtu.be", "imgur.com", "reddit.com", "bbc.co.uk"]
+WHITELIST_PATTERN = re.compile(r"(youtube\.com|youtu\.be|imgur\.com|reddit\.com)")
+URLS = [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://m.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://youtu.be/dQw4w9WgXcQ",
+    "https://i.imgur.com/abc.png",
+    "https://old.reddit.com/r/python/",
+    "https://en.m.wikipedia.org/wiki/Trie",
+    "https://www.bbc.co.uk/news",
+    "https://www.buzzfeed.com/list",
+    "http://free.tk/",
+    "https://github.com/limnoria/limnoria",
+]
+
+
+def get_base_domain(url):
+    return ".".join(urlparse(url).netloc.rsplit(".", 2)[-2:])
+
+
+def dispatch_regex(url):
+    domain = urlparse(url).netloc
+    if IGNORED_PATTERN.search(domain):
+        return None
+    if not WHITELIST_PATTERN.search(domain):
+        return None
+    handler = HANDLERS.get(domain)
+    if handler is None:
+        handler = HANDLERS.get(get_base_domain("http://" + domain))
+    return handler
+
+
+INDEX = domains.build_domain_index(HANDLERS, IGNORED, WHITELISTED)
+
+
+def dispatch_trie(url):
+    info = INDEX.lookup(urlparse(url).netloc)
+    if info.get(domains.IGNORED) or not info.get(domains.WHITELISTED):
+        return None
+    return info.get(domains.HANDLER)
+
+
+def get_ignored(size):
+    """
+    Returns size ignored domains, as a list and as the equivalent regex
+    """
+    ignored = ["spam%d.example.com" % (i) for i in range(size - len(IGNORED))]
+    patterns = [IGNORED_PATTERN.pattern]
+    patterns += [re.escape(domain) + "$" for domain in ignored]
+    return (IGNORED + ignored, re.compile("|".join(patterns)))
+
+
+def main():
+    global INDEX, IGNORED_PATTERN
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for size in (len(IGNORED), 100, 1000):
+        ignored, IGNORED_PATTERN = get_ignored(size)
+        INDEX = domains.build_domain_index(HANDLERS, ignored, WHITELISTED)
+        for name, function in (("regex", dispatch_regex), ("trie", dispatch_trie)):
+            seconds = timeit.timeit(
+                lambda: [function(url) for url in URLS], number=iterations
+            )
+            print(
+                "%4d ignored domains: %-5s %8.3f us/lookup"
+                % (size, name, seconds / (iterations * len(URLS)) * 1000000)
+            )
+        seconds = timeit.timeit(
+            lambda: domains.build_domain_index(HANDLERS, ignored, WHITELISTED),
+            number=10,
+        )
+        print("%4d ignored domains: build %8.3f us" % (size, seconds / 10 * 1000000))
+    for url in URLS:
+        print("%-45s %-12s %s" % (url, dispatch_regex(url), dispatch_trie(url)))
+
+
+if __name__ == "__main__":
+    main()
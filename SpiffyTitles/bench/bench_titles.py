@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of SpiffyTitles title lookups.
+
+Record the HTTP exchanges of real handler runs into a fixture file, using the
+API keys from a bot configuration file:
+
+    python3 bench/bench_titles.py record urls.txt fixture.json --config bot.conf
+
+Replay them through a local stand-in HTTP server and report titles/sec,
+latency percentiles, bytes read and peak memory per handler, followed by a run
+of synthetic channel traffic through doPrivmsg:
+
+    python3 bench/bench_titles.py replay bench/fixtures/sample.json
+
+API keys and secrets in query strings, and access tokens in response bodies,
+are redacted before they are written to a fixture. Response bodies are stored
+up to 1 MiB.
+"""
+
+import argparse
+import base64
+import http.server
+import importlib
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.dirname(BENCH_DIR)
+MAX_BODY = 1048576
+SECRET_PARAMS = {"key", "apikey", "client_id", "client_secret", "access_token"}
+SECRET_FIELDS = {"access_token", "refresh_token"}
+API_KEYS = (
+    "youtube.developerKey",
+    "imdb.omdbAPI",
+    "imgur.clientID",
+    "twitch.clientID",
+    "twitch.clientSecret",
+)
+STORED_HEADERS = ("content-type", "location")
+
+
+def get_key(method, url):
+    """
+    Returns the fixture key of a request: method, host, path and query without
+    scheme, with secrets redacted
+    """
+    parts = urlsplit(url)
+    query = [
+        (name, "REDACTED" if name.lower() in SECRET_PARAMS else value)
+        for (name, value) in parse_qsl(parts.query, keep_blank_values=True)
+    ]
+    key = "{0} {1}{2}".format(method, parts.netloc.lower(), parts.path or "/")
+    if query:
+        key += "?" + urlencode(query)
+    return key
+
+
+def redact_body(body, content_type):
+    if "json" not in (content_type or ""):
+        return body
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if isinstance(data, dict) and SECRET_FIELDS & set(data):
+        for field in SECRET_FIELDS & set(data):
+            data[field] = "REDACTED"
+        return json.dumps(data).encode()
+    return body
+
+
+def load_plugin(config=None):
+    """
+    Loads Limnoria and the plugin from a throwaway working directory, so the
+    bot databases and logs do not end up in the source tree. Paths given to it
+    must already be absolute. Returns the plugin package and the Limnoria conf
+    module.
+    """
+    os.chdir(tempfile.mkdtemp(prefix="spiffytitles-bench-"))
+    os.mkdir("conf")
+    for name in ("users", "channels", "networks", "ignores"):
+        open(os.path.join("conf", name + ".conf"), "w").close()
+    sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+    import supybot.registry as registry
+
+    if config:
+        registry.open_registry(config)
+    import supybot.conf as conf
+    import supybot.log  # noqa: F401
+
+    logging.disable(logging.INFO)
+
+    package = importlib.import_module(os.path.basename(PLUGIN_DIR))
+    return (package, conf)
+
+
+class BenchIrc:
+    """
+    The parts of an Irc object doPrivmsg uses
+    """
+
+    nick = "bench"
+    network = "bench"
+
+    def __init__(self):
+        self.replies = []
+
+    def isChannel(self, channel):
+        return channel.startswith("#")
+
+    def reply(self, text, prefixNick=False, **kwargs):
+        self.replies.append(text)
+
+
+def set_http_pool(cb, pool):
+    """
+    Points the plugin and its API clients at another SessionPool
+    """
+    pool.on_response = cb.http.on_response
+    cb.http.close()
+    cb.http = pool
+    cb.twitch.http = pool
+    cb.redirects.http = pool
+
+
+def clear_caches(cb):
+    cb.link_cache.clear()
+    cb.failed_links.clear()
+    cb.youtube.videos.clear()
+    cb.youtube.statistics.clear()
+    cb.twitch.users.clear()
+    cb.twitch.games.clear()
+    cb.twitch.invalidate_token()
+    cb.redirects.cache.clear()
+
+
+def get_handler_name(cb, url):
+    return cb.get_handler_name(cb.get_handler(urlsplit(url).netloc))
+
+
+def record(args):
+    with open(args.urls) as urls_file:
+        urls = [line.strip() for line in urls_file if line.strip()]
+    (package, conf) = load_plugin(args.config)
+    cb = package.Class(BenchIrc())
+    exchanges = {}
+    request = cb.http.request
+
+    def recording_request(method, url, **kwargs):
+        response = request(method, url, **kwargs)
+        for hop in response.history:
+            store(hop.request.method, hop.url, hop, b"")
+        body = b""
+        if method != "HEAD":
+            for chunk in response.iter_content(8192):
+                body += chunk
+                if len(body) >= MAX_BODY:
+                    break
+            response.close()
+            # Hand the plugin a response it can still read from
+            response._content = body[:MAX_BODY]
+            response._content_consumed = True
+        store(response.request.method, response.url, response, body[:MAX_BODY])
+        return response
+
+    def store(method, url, response, body):
+        headers = {
+            name: response.headers[name]
+            for name in STORED_HEADERS
+            if name in response.headers
+        }
+        body = redact_body(body, headers.get("content-type"))
+        exchanges[get_key(method, url)] = {
+            "status": response.status_code,
+            "headers": headers,
+            "body": base64.b64encode(body).decode("ascii"),
+        }
+
+    cb.http.request = recording_request
+    for url in urls:
+        title = cb.get_title_by_url(url, "#bench")
+        print("{0} [{1}] {2}".format(url, get_handler_name(cb, url), title))
+    cb.die()
+    with open(args.fixture, "w") as fixture:
+        json.dump({"urls": urls, "exchanges": exchanges}, fixture, indent=1)
+    print("Recorded {0} exchanges to {1}".format(len(exchanges), args.fixture))
+
+
+class ReplayHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers proxied requests with the recorded responses
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.replay()
+
+    def do_HEAD(self):
+        self.replay()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length") or 0))
+        self.replay()
+
+    def replay(self):
+        exchanges = self.server.exchanges
+        exchange = exchanges.get(get_key(self.command, self.path))
+        if exchange is None and self.command == "HEAD":
+            exchange = exchanges.get(get_key("GET", self.path))
+        if exchange is None:
+            self.server.misses.append(get_key(self.command, self.path))
+            exchange = {"status": 404, "headers": {}, "body": ""}
+        body = base64.b64decode(exchange["body"])
+        self.send_response(exchange["status"])
+        for (name, value) in exchange["headers"].items():
+            if name == "location" and value.startswith("https://"):
+                # Keep following redirects through the stand-in server
+                value = "http://" + value[len("https://") :]
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The plugin stops reading once it has what it needs
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Connections dropped by the plugin mid-response are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_replay_server(exchanges):
+    server = ReplayServer(("127.0.0.1", 0), ReplayHandler)
+    server.exchanges = exchanges
+    server.misses = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def get_percentile(values, percentile):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percentile * (len(values) - 1))))]
+
+
+def replay(args):
+    with open(args.fixture) as fixture:
+        data = json.load(fixture)
+    (package, conf) = load_plugin()
+    import supybot.ircmsgs as ircmsgs
+
+    plugin_conf = conf.supybot.plugins.get(os.path.basename(PLUGIN_DIR))
+    for name in API_KEYS:
+        (group, _, name) = name.partition(".")
+        value = plugin_conf.get(group).get(name)
+        if not value():
+            value.setValue("replay")
+    plugin_conf.circuitBreaker.threshold.setValue(0)
+    server = start_replay_server(data["exchanges"])
+    proxy = "http://127.0.0.1:{0}".format(server.server_address[1])
+    cb = package.Class(BenchIrc())
+    pool = package.pool.SessionPool({"http": proxy, "https": proxy})
+    bytes_read = []
+    request = pool.request
+
+    def replay_request(method, url, **kwargs):
+        # Plain HTTP, so the stand-in server sees every request
+        if url.startswith("https://"):
+            url = "http://" + url[len("https://") :]
+        response = request(method, url, **kwargs)
+        bytes_read.append(response.raw)
+        return response
+
+    pool.request = replay_request
+    set_http_pool(cb, pool)
+    groups = {}
+    for url in data["urls"]:
+        groups.setdefault(get_handler_name(cb, url), []).append(url)
+    print(
+        "{0:<12} {1:>5} {2:>9} {3:>9} {4:>9} {5:>11} {6:>10}".format(
+            "handler", "links", "titles/s", "p50 ms", "p99 ms", "bytes/link", "peak KiB"
+        )
+    )
+    for (name, urls) in sorted(groups.items()):
+        # Timing pass
+        latencies = []
+        del bytes_read[:]
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            for url in urls:
+                if not args.warm:
+                    clear_caches(cb)
+                before = time.perf_counter()
+                cb.get_title_by_url(url, "#bench")
+                latencies.append(time.perf_counter() - before)
+        elapsed = time.perf_counter() - started
+        total_bytes = sum(raw.tell() for raw in bytes_read)
+        # Memory pass, kept apart since tracing slows everything down
+        clear_caches(cb)
+        tracemalloc.start()
+        for url in urls:
+            cb.get_title_by_url(url, "#bench")
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(
+            "{0:<12} {1:>5} {2:>9.1f} {3:>9.2f} {4:>9.2f} {5:>11.0f} {6:>10.1f}".format(
+                name,
+                len(urls),
+                len(latencies) / elapsed,
+                get_percentile(latencies, 0.5) * 1000,
+                get_percentile(latencies, 0.99) * 1000,
+                total_bytes / len(latencies),
+                peak / 1024,
+            )
+        )
+    # Synthetic channel traffic: random nicks posting one to three links in a
+    # few channels, starting from cold caches
+    clear_caches(cb)
+    irc = BenchIrc()
+    generator = random.Random(args.seed)
+    messages = []
+    for i in range(args.messages):
+        links = generator.sample(data["urls"], min(len(data["urls"]), 1 + i % 3))
+        messages.append(
+            ircmsgs.privmsg(
+                "#bench{0}".format(generator.randrange(4)),
+                "look at {0}".format(" ".join(links)),
+                prefix="user{0}!user@bench".format(generator.randrange(20)),
+            )
+        )
+    started = time.perf_counter()
+    for msg in messages:
+        cb.doPrivmsg(irc, msg)
+    elapsed = time.perf_counter() - started
+    print(
+        "doPrivmsg: {0} messages, {1} replies in {2:.2f}s ({3:.1f} messages/s)".format(
+            len(messages), len(irc.replies), elapsed, len(messages) / elapsed
+        )
+    )
+    if server.misses:
+        print("Not in the fixture: {0}".format(", ".join(sorted(set(server.misses)))))
+    cb.die()
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    record_parser = commands.add_parser("record", help="record a fixture")
+    record_parser.add_argument(
+        "urls", type=os.path.abspath, help="file with one URL per line"
+    )
+    record_parser.add_argument(
+        "fixture", type=os.path.abspath, help="fixture file to write"
+    )
+    record_parser.add_argument(
+        "--config", type=os.path.abspath, help="bot configuration with API keys"
+    )
+    replay_parser = commands.add_parser("replay", help="replay a fixture")
+    replay_parser.add_argument(
+        "fixture", type=os.path.abspath, help="fixture file to replay"
+    )
+    replay_parser.add_argument("--iterations", type=int, default=20)
+    replay_parser.add_argument("--messages", type=int, default=200)
+    replay_parser.add_argument("--seed", type=int, default=0)
+    replay_parser.add_argument(
+        "--warm", action="store_true", help="keep the caches between lookups"
+    )
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args)
+    else:
+        replay(args)
+
+
+if __name__ == "__main__":
+    main()
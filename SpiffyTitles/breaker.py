@@ -0,0 +1,108 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+breaker: per-host circuit breaker for upstreams that keep failing.
+"""
+
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failures per host. After threshold failures in a row the
+    host's circuit opens and requests to it are refused outright. Once cooldown
+    seconds have passed the circuit is half-open: a single trial request is let
+    through, closing the circuit if it succeeds and reopening it if it fails.
+    Callers must report the outcome of every request they were allowed to make.
+    """
+
+    def __init__(self, threshold=5, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host, now=None):
+        """
+        Returns whether a request to host may be attempted
+        """
+        if not self.threshold:
+            return True
+        now = now or time.time()
+        with self._lock:
+            circuit = self._hosts.get(host)
+            if circuit is None or circuit["state"] == CLOSED:
+                return True
+            if now >= circuit["opened"] + self.cooldown:
+                # A trial that never reported back does not hold the circuit
+                # half-open forever: another one is let through a cooldown later
+                circuit["state"] = HALF_OPEN
+                circuit["opened"] = now
+                return True
+            return False
+
+    def success(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def failure(self, host, now=None):
+        if not self.threshold:
+            return
+        now = now or time.time()
+        with self._lock:
+            circuit = self._hosts.setdefault(
+                host, {"state": CLOSED, "failures": 0, "opened": 0}
+            )
+            circuit["failures"] += 1
+            if circuit["state"] == HALF_OPEN or circuit["failures"] >= self.threshold:
+                circuit["state"] = OPEN
+                circuit["opened"] = now
+
+    def state(self, host):
+        with self._lock:
+            circuit = self._hosts.get(host)
+            return circuit["state"] if circuit else CLOSED
+
+    def open_hosts(self):
+        """
+        Returns the hosts whose circuit is not closed
+        """
+        with self._lock:
+            return sorted(
+                host
+                for (host, circuit) in self._hosts.items()
+                if circuit["state"] != CLOSED
+            )
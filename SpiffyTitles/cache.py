@@ -0,0 +1,238 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+"""
+cache: bounded in-memory link cache with LRU eviction and an expiry index.
+"""
+
+import heapq
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import urlparse, urlunparse
+
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+# Rough per-entry bookkeeping cost (dict, key tuple, heap item) in bytes.
+ENTRY_OVERHEAD = 512
+
+
+def normalize_url(url):
+    """
+    Returns a canonical form of url for use as a cache key: lowercase scheme
+    and host, no default port and a non-empty path.
+    """
+    info = urlparse(url.strip())
+    scheme = info.scheme.lower()
+    netloc = info.netloc.lower()
+    default_port = DEFAULT_PORTS.get(scheme)
+    if default_port and netloc.endswith(default_port):
+        netloc = netloc[: -len(default_port)]
+    path = info.path or "/"
+    return urlunparse((scheme, netloc, path, info.params, info.query, info.fragment))
+
+
+def get_entry_size(key, entry):
+    """
+    Approximates the memory used by a cache entry
+    """
+    size = ENTRY_OVERHEAD
+    for value in key:
+        size += sys.getsizeof(value)
+    for value in entry.values():
+        if isinstance(value, str):
+            size += sys.getsizeof(value)
+    return size
+
+
+class LinkCache:
+    """
+    Thread-safe LRU cache of link entries bounded by entry count and by an
+    approximate memory budget. Every entry carries an absolute expiry time,
+    and a min-heap over those times lets expired entries be swept in bulk.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=1048576):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._expiry = []
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, now=None):
+        """
+        Returns the entry stored under key, or None if missing or expired
+        """
+        now = now or time.time()
+        with self._lock:
+            self.sweep(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry, lifetime, now=None):
+        """
+        Stores entry under key for lifetime seconds, evicting the least
+        recently used entries if a limit is exceeded.
+        """
+        now = now or time.time()
+        expires = now + lifetime
+        entry["expires"] = expires
+        size = get_entry_size(key, entry)
+        with self._lock:
+            self.sweep(now)
+            self._remove(key)
+            self._entries[key] = entry
+            self._sizes[key] = size
+            self._bytes += size
+            heapq.heappush(self._expiry, (expires, key))
+            self._evict()
+            self._compact()
+
+    def delete(self, key):
+        with self._lock:
+            return self._remove(key) is not None
+
+    def resize(self, max_entries, max_bytes):
+        """
+        Updates the limits, evicting entries if the cache no longer fits
+        """
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def sweep(self, now=None):
+        """
+        Drops every entry whose expiry time has passed
+        """
+        now = now or time.time()
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                (expires, key) = heapq.heappop(self._expiry)
+                entry = self._entries.get(key)
+                # Skip heap items left behind by replaced or evicted entries
+                if entry is not None and entry["expires"] == expires:
+                    self._remove(key)
+                    self.expirations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._expiry = []
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Returns a dict of cache counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= self._sizes.pop(key)
+        return entry
+
+    def _evict(self):
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def _compact(self):
+        # Evicted and replaced entries leave dead items in the heap; rebuild it
+        # once they outnumber the live ones.
+        if len(self._expiry) > 2 * len(self._entries) + 64:
+            self._expiry = [
+                (entry["expires"], key) for (key, entry) in self._entries.items()
+            ]
+            heapq.heapify(self._expiry)
+
+
+class SingleFlight:
+    """
+    De-duplicates concurrent calls: while a call for a key is running, other
+    callers asking for the same key wait for it and receive its result (or
+    exception) instead of making the call again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, function, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
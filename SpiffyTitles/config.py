@@ -65,6 +65,99 @@ conf.registerGlobalValue(
     registry.Integer(10, _("""Maximum time in seconds to try and retrieve a link""")),
 )
 
+conf.registerGlobalValue(
+    SpiffyTitles,
+    "retryBackoff",
+    registry.Float(
+        1.0,
+        _(
+            """
+            Delay in seconds before retrying a link after a timeout or connection
+            error. The delay doubles with every further retry.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles,
+    "negativeCacheLifetime",
+    registry.NonNegativeInteger(
+        120,
+        _(
+            """
+            Time in seconds during which a link that could not be retrieved is
+            not requested again. 0 disables the negative cache.
+            """
+        ),
+    ),
+)
+
+# Circuit breaker configs
+conf.registerGroup(SpiffyTitles, "circuitBreaker")
+
+conf.registerGlobalValue(
+    SpiffyTitles.circuitBreaker,
+    "threshold",
+    registry.NonNegativeInteger(
+        5,
+        _(
+            """
+            Number of consecutive failed requests to a host after which requests
+            to it are refused for a while. 0 disables the circuit breaker.
+            Requires reloading the plugin.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.circuitBreaker,
+    "cooldown",
+    registry.PositiveInteger(
+        60,
+        _(
+            """
+            Time in seconds during which requests to a failing host are refused
+            before a single trial request is let through. Requires reloading the
+            plugin.
+            """
+        ),
+    ),
+)
+
+# Connection pool configs
+conf.registerGroup(SpiffyTitles, "pool")
+
+conf.registerGlobalValue(
+    SpiffyTitles.pool,
+    "maxHosts",
+    registry.PositiveInteger(
+        32,
+        _(
+            """
+            Maximum number of hosts to keep a keep-alive session open for. The
+            least recently used session is closed first. Requires reloading the
+            plugin.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.pool,
+    "maxSize",
+    registry.PositiveInteger(
+        4,
+        _(
+            """
+            Maximum number of idle connections kept open to each host. Requires
+            reloading the plugin.
+            """
+        ),
+    ),
+)
+
 # URL regex
 conf.registerChannelValue(
     SpiffyTitles,
@@ -103,6 +196,34 @@ conf.registerChannelValue(
     registry.Regexp("", _("""Domains not matching this patterns will be ignored""")),
 )
 
+conf.registerChannelValue(
+    SpiffyTitles,
+    "ignoredDomains",
+    registry.SpaceSeparatedListOfStrings(
+        [],
+        _(
+            """
+            Domains to ignore. example.com also covers its subdomains, while
+            *.example.com covers only the subdomains.
+            """
+        ),
+    ),
+)
+
+conf.registerChannelValue(
+    SpiffyTitles,
+    "whitelistDomains",
+    registry.SpaceSeparatedListOfStrings(
+        [],
+        _(
+            """
+            If set, only these domains are looked up. example.com also covers its
+            subdomains, while *.example.com covers only the subdomains.
+            """
+        ),
+    ),
+)
+
 # Channel whitelist
 conf.registerGlobalValue(
     SpiffyTitles,
@@ -142,6 +263,214 @@ conf.registerGlobalValue(
     ),
 )
 
+conf.registerGlobalValue(
+    SpiffyTitles,
+    "cacheMaxEntries",
+    registry.NonNegativeInteger(
+        1000,
+        _(
+            """
+            Maximum number of links kept in the link cache. The least recently
+            used links are evicted first. 0 means no limit.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles,
+    "cacheMaxSize",
+    registry.NonNegativeInteger(
+        1048576,
+        _(
+            """
+            Approximate memory budget of the link cache in bytes. The least
+            recently used links are evicted first. 0 means no limit.
+            """
+        ),
+    ),
+)
+
+# Redirect resolution configs
+conf.registerGroup(SpiffyTitles, "redirects")
+
+conf.registerGlobalValue(
+    SpiffyTitles.redirects,
+    "enabled",
+    registry.Boolean(
+        True,
+        _(
+            """
+            Resolve links to URL shorteners with HEAD requests and look up the
+            title of their target with the handler for its domain.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.redirects,
+    "domains",
+    registry.SpaceSeparatedListOfStrings(
+        [
+            "t.co",
+            "bit.ly",
+            "redd.it",
+            "tinyurl.com",
+            "goo.gl",
+            "ow.ly",
+            "buff.ly",
+            "is.gd",
+            "amzn.to",
+            "tiny.cc",
+            "rb.gy",
+            "cutt.ly",
+        ],
+        _(
+            """
+            URL shortener domains whose links are resolved before their title is
+            looked up. Domains with a handler of their own, such as youtu.be, are
+            not resolved.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.redirects,
+    "maxHops",
+    registry.PositiveInteger(
+        5, _("""Maximum number of redirects followed when resolving a link.""")
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.redirects,
+    "lifetime",
+    registry.PositiveInteger(
+        604800,
+        _(
+            """
+            Time in seconds the target of a resolved link is remembered, so it is
+            not resolved again when the link is posted again.
+            """
+        ),
+    ),
+)
+
+# Stale-while-revalidate configs
+conf.registerGroup(SpiffyTitles, "staleWhileRevalidate")
+
+conf.registerGlobalValue(
+    SpiffyTitles.staleWhileRevalidate,
+    "enabled",
+    registry.Boolean(
+        False,
+        _(
+            """
+            Serve cached titles past their soft lifetime right away and refresh
+            them in the background. Replaces cacheLifetime with the soft and hard
+            lifetimes below.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.staleWhileRevalidate,
+    "softLifetimes",
+    registry.SpaceSeparatedListOfStrings(
+        ["default=600", "youtube=300", "twitch=60", "reddit=300"],
+        _(
+            """
+            Space-separated list of handler=seconds pairs setting how long titles
+            from each handler are served without being refreshed. Handlers not
+            listed use the default entry, or cacheLifetime if there is none.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.staleWhileRevalidate,
+    "hardLifetimes",
+    registry.SpaceSeparatedListOfStrings(
+        ["default=86400", "youtube=86400", "twitch=3600", "reddit=21600"],
+        _(
+            """
+            Space-separated list of handler=seconds pairs setting how long titles
+            from each handler are kept at most. A title older than its soft
+            lifetime is still served while it is refreshed, until this lifetime
+            ends and it has to be fetched again before replying.
+            """
+        ),
+    ),
+)
+
+# Persistent cache configs
+conf.registerGroup(SpiffyTitles, "persistentCache")
+
+conf.registerGlobalValue(
+    SpiffyTitles.persistentCache,
+    "enabled",
+    registry.Boolean(
+        False,
+        _(
+            """
+            Keep link titles in an SQLite database in the data directory, so they
+            survive restarts and reloads. Requires reloading the plugin.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.persistentCache,
+    "lifetimes",
+    registry.SpaceSeparatedListOfStrings(
+        ["default=86400", "youtube=3600", "twitch=300", "reddit=1800", "imdb=604800"],
+        _(
+            """
+            Space-separated list of handler=seconds pairs setting how long titles
+            from each handler are kept in the persistent cache. Handlers not listed
+            use the default entry, or cacheLifetime if there is none.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.persistentCache,
+    "vacuumInterval",
+    registry.PositiveInteger(
+        3600,
+        _(
+            """
+            Interval in seconds between removals of expired titles from the
+            persistent cache. Requires reloading the plugin.
+            """
+        ),
+    ),
+)
+
+# Handler metrics configs
+conf.registerGroup(SpiffyTitles, "metrics")
+
+conf.registerGlobalValue(
+    SpiffyTitles.metrics,
+    "interval",
+    registry.NonNegativeInteger(
+        60,
+        _(
+            """
+            Interval in seconds between writes of the handler metrics to
+            SpiffyTitles.prom in the data directory, in the Prometheus text
+            format. 0 disables writing them. Requires reloading the plugin.
+            """
+        ),
+    ),
+)
+
 conf.registerChannelValue(
     SpiffyTitles,
     "ignoredMessagePattern",
@@ -181,6 +510,52 @@ conf.registerChannelValue(
     ),
 )
 
+# Concurrent resolution configs
+conf.registerGroup(SpiffyTitles, "concurrency")
+
+conf.registerChannelValue(
+    SpiffyTitles.concurrency,
+    "enabled",
+    registry.Boolean(
+        False,
+        _(
+            """
+            Determines whether multiple URLs in a message are looked up at the
+            same time rather than one after another. Titles are still sent in the
+            order the URLs appeared in.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.concurrency,
+    "maxWorkers",
+    registry.PositiveInteger(
+        8,
+        _(
+            """
+            Maximum number of URLs looked up at the same time across all
+            channels. Requires reloading the plugin.
+            """
+        ),
+    ),
+)
+
+conf.registerChannelValue(
+    SpiffyTitles.concurrency,
+    "deadline",
+    registry.PositiveInteger(
+        15,
+        _(
+            """
+            Maximum time in seconds to wait for all titles of a message. URLs
+            still pending after that are skipped.
+            """
+        ),
+    ),
+)
+
 conf.registerChannelValue(
     SpiffyTitles,
     "requireCapability",
@@ -279,6 +654,20 @@ conf.registerChannelValue(
     ),
 )
 
+conf.registerChannelValue(
+    SpiffyTitles.default,
+    "maxBytes",
+    registry.NonNegativeInteger(
+        524288,
+        _(
+            """
+            Maximum number of bytes of a page read while looking for its title.
+            0 means no limit.
+            """
+        ),
+    ),
+)
+
 # default title template - show a warning if redirects to a different domain
 conf.registerChannelValue(
     SpiffyTitles.default,
@@ -293,11 +682,27 @@ conf.registerChannelValue(
     SpiffyTitles.default,
     "fileTemplate",
     registry.String(
-        "{% if type %}[{{type}}] {% endif %}{% if size %}({{size}}){% endif %}",
+        "{% if type %}[{{type}}] {% endif %}{% if width %}{{width}}x{{height}} "
+        "{% endif %}{% if duration %}{{duration}} {% endif %}{% if codec %}"
+        "{{codec}} {% endif %}{% if size %}({{size}}){% endif %}",
         _("""Template used for default title responses"""),
     ),
 )
 
+conf.registerChannelValue(
+    SpiffyTitles.default,
+    "probeBytes",
+    registry.NonNegativeInteger(
+        32768,
+        _(
+            """
+            Maximum number of bytes read from the start of image, video and audio
+            files to find their dimensions, duration and codec. 0 disables it.
+            """
+        ),
+    ),
+)
+
 # Wikipedia configs
 conf.registerGroup(SpiffyTitles, "wikipedia")
 
@@ -444,6 +849,47 @@ conf.registerGlobalValue(
         "", _("""Youtube developer key - required for Youtube handler."""), private=True
     ),
 )
+conf.registerGlobalValue(
+    SpiffyTitles.youtube,
+    "batchWindow",
+    registry.Float(
+        0.1,
+        _(
+            """
+            Time in seconds a YouTube lookup waits for lookups from other channels
+            or messages, so they can share a single API call.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.youtube,
+    "metadataLifetime",
+    registry.PositiveInteger(
+        3600,
+        _(
+            """
+            Time in seconds video titles, durations and uploaders are cached.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.youtube,
+    "statisticsLifetime",
+    registry.PositiveInteger(
+        300,
+        _(
+            """
+            Time in seconds view, like and comment counts are cached. Refreshing
+            them does not refetch the rest of the video metadata.
+            """
+        ),
+    ),
+)
+
 # YouTube Logo
 conf.registerChannelValue(
     SpiffyTitles.youtube,
@@ -554,12 +1000,43 @@ conf.registerGlobalValue(
     registry.String("", _("""Twitch API Client_ID"""), private=True),
 )
 
+conf.registerGlobalValue(
+    SpiffyTitles.twitch,
+    "clientSecret",
+    registry.String(
+        "",
+        _(
+            """
+            Twitch API Client Secret. When set, app access tokens are requested
+            and renewed automatically and accessToken is not needed.
+            """
+        ),
+        private=True,
+    ),
+)
+
 conf.registerGlobalValue(
     SpiffyTitles.twitch,
     "accessToken",
     registry.String("", _("""Twitch API Access Token"""), private=True),
 )
 
+conf.registerGlobalValue(
+    SpiffyTitles.twitch,
+    "userLifetime",
+    registry.PositiveInteger(
+        86400, _("""Time in seconds Twitch user records are cached.""")
+    ),
+)
+
+conf.registerGlobalValue(
+    SpiffyTitles.twitch,
+    "gameLifetime",
+    registry.PositiveInteger(
+        604800, _("""Time in seconds Twitch game names are cached.""")
+    ),
+)
+
 # Twitch Logo
 conf.registerChannelValue(
     SpiffyTitles.twitch,
@@ -0,0 +1,147 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+domains: reverse-label suffix trie for per-domain lookups.
+"""
+
+HANDLER = "handler"
+IGNORED = "ignored"
+WHITELISTED = "whitelisted"
+SHORTENER = "shortener"
+# Number of host lookups remembered per trie
+MAX_LOOKUPS = 4096
+
+
+def get_host(netloc):
+    """
+    Returns the lowercase host name of a URL's netloc, without credentials,
+    port or trailing dot
+    """
+    host = netloc.rpartition("@")[2].lower()
+    if host.startswith("["):
+        # IPv6 literal
+        return host[: host.find("]") + 1]
+    return host.partition(":")[0].rstrip(".")
+
+
+class DomainNode:
+    __slots__ = ("children", "exact", "subdomains")
+
+    def __init__(self):
+        self.children = {}
+        # Values for the domain this node spells out, and for its subdomains
+        self.exact = {}
+        self.subdomains = {}
+
+
+class DomainTrie:
+    """
+    Maps domain patterns to values of several kinds, keyed on the domain labels
+    in reverse order (com -> youtube -> m), so a single walk down the trie finds
+    the most specific value of every kind that applies to a host.
+
+    A pattern such as "youtube.com" applies to youtube.com and all of its
+    subdomains; "*.youtube.com" applies to the subdomains only. A more specific
+    pattern wins over a less specific one, so i.imgur.com can have a different
+    handler than imgur.com.
+
+    Results are remembered per netloc, since the same few hosts make up most
+    of the links posted.
+    """
+
+    def __init__(self):
+        self.root = DomainNode()
+        self.size = 0
+        self._lookups = {}
+
+    def add(self, pattern, kind, value=True):
+        pattern = pattern.strip().lower().rstrip(".")
+        subdomains_only = pattern.startswith("*.")
+        if subdomains_only:
+            pattern = pattern[2:]
+        if not pattern:
+            return
+        node = self.root
+        for label in reversed(pattern.split(".")):
+            child = node.children.get(label)
+            if child is None:
+                child = node.children[label] = DomainNode()
+            node = child
+        if not subdomains_only:
+            node.exact[kind] = value
+        node.subdomains[kind] = value
+        self.size += 1
+        self._lookups.clear()
+
+    def lookup(self, netloc):
+        """
+        Returns a dict of kind -> value of the most specific patterns matching
+        the host of netloc. The dict must not be modified.
+        """
+        result = self._lookups.get(netloc)
+        if result is None:
+            result = self._walk(netloc)
+            if len(self._lookups) >= MAX_LOOKUPS:
+                self._lookups.clear()
+            self._lookups[netloc] = result
+        return result
+
+    def _walk(self, netloc):
+        labels = get_host(netloc).split(".")
+        result = {}
+        node = self.root
+        for depth in range(len(labels) - 1, -1, -1):
+            node = node.children.get(labels[depth])
+            if node is None:
+                break
+            if depth:
+                if node.subdomains:
+                    result.update(node.subdomains)
+            elif node.exact:
+                result.update(node.exact)
+        return result
+
+
+def build_domain_index(handlers, ignored=(), whitelisted=(), shorteners=()):
+    """
+    Returns a DomainTrie of the handlers dict (domain -> handler) and the
+    ignored, whitelisted and URL shortener domain patterns
+    """
+    trie = DomainTrie()
+    for domain, handler in handlers.items():
+        trie.add(domain, HANDLER, handler)
+    for pattern in ignored:
+        trie.add(pattern, IGNORED)
+    for pattern in whitelisted:
+        trie.add(pattern, WHITELISTED)
+    for pattern in shorteners:
+        trie.add(pattern, SHORTENER)
+    return trie
@@ -0,0 +1,153 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+extract: incremental <title> extraction from a streamed HTML response.
+"""
+
+import codecs
+import re
+from html.parser import HTMLParser
+
+CHUNK_SIZE = 8192
+HEAD_SIZE = 1024
+META_CHARSET_RE = re.compile(
+    rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-z0-9_:.-]+)""", re.IGNORECASE
+)
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+class TitleParser(HTMLParser):
+    """
+    Collects the text of the first non-empty <title> element and sets done as
+    soon as it has been seen. The og:title meta tag is kept as a fallback for
+    documents whose <title> is missing or empty.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.og_title = None
+        self.done = False
+        self._in_title = False
+        self._parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title" and self.title is None:
+            self._in_title = True
+            self._parts = []
+        elif tag == "meta":
+            attrs = dict(attrs)
+            name = attrs.get("property") or attrs.get("name")
+            if name == "og:title" and attrs.get("content", "").strip():
+                self.og_title = self.og_title or attrs["content"].strip()
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self._in_title:
+            self._in_title = False
+            title = "".join(self._parts).strip()
+            if title:
+                self.title = title
+                self.done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self._parts.append(data)
+
+    def close(self):
+        super().close()
+        # A <title> still open at the end of the document runs to its end
+        if self._in_title:
+            self.handle_endtag("title")
+
+    def get_title(self):
+        return self.title or self.og_title
+
+
+def get_charset(content_type, head):
+    """
+    Returns the character encoding declared by the Content-Type header, a byte
+    order mark or a <meta> tag at the start of the document, or utf-8.
+    """
+    candidates = []
+    if content_type:
+        for param in content_type.split(";")[1:]:
+            (key, _, value) = param.partition("=")
+            if key.strip().lower() == "charset":
+                candidates.append(value.strip().strip("\"'"))
+    for (bom, charset) in BOMS:
+        if head.startswith(bom):
+            candidates.append(charset)
+    match = META_CHARSET_RE.search(head[:4096])
+    if match:
+        candidates.append(match.group(1).decode("ascii"))
+    for charset in candidates:
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+
+def extract_title(chunks, content_type=None, max_bytes=524288):
+    """
+    Feeds byte chunks to a TitleParser until a title is found or max_bytes have
+    been read, without consuming the rest. Returns (title, bytes_read).
+    """
+    parser = TitleParser()
+    decoder = None
+    head = b""
+    bytes_read = 0
+    for chunk in chunks:
+        bytes_read += len(chunk)
+        if decoder is None:
+            # Hold back the first KB so a <meta charset> can be found in it
+            head += chunk
+            if len(head) < HEAD_SIZE and not (max_bytes and bytes_read >= max_bytes):
+                continue
+            charset = get_charset(content_type, head)
+            decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+            chunk = head
+        parser.feed(decoder.decode(chunk))
+        if parser.done or (max_bytes and bytes_read >= max_bytes):
+            break
+    else:
+        if decoder is None and head:
+            charset = get_charset(content_type, head)
+            parser.feed(head.decode(charset, errors="replace"))
+        elif decoder is not None:
+            parser.feed(decoder.decode(b"", final=True))
+    if not parser.done:
+        parser.close()
+    return (parser.get_title(), bytes_read)
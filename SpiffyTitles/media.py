@@ -0,0 +1,369 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+media: image dimensions and audio/video durations from the first bytes of a
+file, so a file link can be described without downloading it.
+"""
+
+import struct
+
+PROBE_SIZE = 32768
+MEDIA_TYPES = ("image", "video", "audio")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+EBML_MAGIC_ID = int.from_bytes(EBML_MAGIC, "big")
+# ISO base media boxes holding the boxes we look for
+MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+# Matroska element IDs
+EBML_DOCTYPE = 0x4282
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_CODEC_ID = 0x86
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_CLUSTER = 0x1F43B675
+# MPEG audio layer III bitrates in kbit/s, by bitrate index
+MP3_BITRATES = {
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = (44100, 48000, 32000)
+
+
+def read_head(chunks, max_bytes=PROBE_SIZE):
+    """
+    Returns up to max_bytes from the start of a stream of byte chunks, without
+    consuming the rest
+    """
+    head = bytearray()
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= max_bytes:
+            break
+    return bytes(head[:max_bytes])
+
+
+def probe(head, content_length=None):
+    """
+    Returns a dict with the format and, where the header bytes tell, the width,
+    height, duration in seconds and codec of the file starting with head
+    """
+    for parser in (
+        parse_png,
+        parse_gif,
+        parse_jpeg,
+        parse_webp,
+        parse_mp4,
+        parse_matroska,
+        parse_mp3,
+    ):
+        try:
+            info = parser(head, content_length)
+        except (struct.error, IndexError, ValueError):
+            info = None
+        if info:
+            return info
+    return {}
+
+
+def parse_png(head, content_length=None):
+    if head[:8] != PNG_SIGNATURE or head[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", head[16:24])
+    return {"format": "PNG", "width": width, "height": height}
+
+
+def parse_gif(head, content_length=None):
+    if head[:6] not in (b"GIF87a", b"GIF89a"):
+        return None
+    width, height = struct.unpack("<HH", head[6:10])
+    return {"format": "GIF", "width": width, "height": height}
+
+
+def parse_jpeg(head, content_length=None):
+    if head[:2] != b"\xff\xd8":
+        return None
+    info = {"format": "JPEG"}
+    pos = 2
+    while pos + 4 <= len(head):
+        if head[pos] != 0xFF:
+            pos += 1
+            continue
+        marker = head[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+        elif marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length
+            pos += 2
+        elif marker in (0xD9, 0xDA):
+            # End of image or start of scan, no frame header before it
+            break
+        elif 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            # Start of frame: length, precision, height, width
+            height, width = struct.unpack(">HH", head[pos + 5 : pos + 9])
+            info.update(width=width, height=height)
+            break
+        else:
+            (length,) = struct.unpack(">H", head[pos + 2 : pos + 4])
+            pos += 2 + length
+    return info
+
+
+def parse_webp(head, content_length=None):
+    if head[:4] != b"RIFF" or head[8:12] != b"WEBP":
+        return None
+    info = {"format": "WebP"}
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        info.update(width=width & 0x3FFF, height=height & 0x3FFF)
+    elif chunk == b"VP8L" and head[20] == 0x2F:
+        (bits,) = struct.unpack("<I", head[21:25])
+        info.update(width=(bits & 0x3FFF) + 1, height=((bits >> 14) & 0x3FFF) + 1)
+    elif chunk == b"VP8X":
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        info.update(width=width, height=height)
+    return info
+
+
+def iter_mp4_boxes(data, start, end):
+    """
+    Yields (type, content_start, content_end) for the boxes between start and
+    end. The last box may extend beyond the available data.
+    """
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[pos : pos + 8])
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", data[pos + 8 : pos + 16])
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield (box_type, pos + header, min(pos + size, end))
+        pos += size
+
+
+def parse_mp4(head, content_length=None):
+    if head[4:8] != b"ftyp":
+        return None
+    info = {"format": "MP4"}
+    codecs = []
+
+    def walk(start, end):
+        for box_type, box_start, box_end in iter_mp4_boxes(head, start, end):
+            if box_type in MP4_CONTAINERS:
+                walk(box_start, box_end)
+            elif box_type == b"ftyp":
+                brand = head[box_start : box_start + 4]
+                if brand.startswith(b"qt"):
+                    info["format"] = "QuickTime"
+                elif brand.startswith(b"M4A"):
+                    info["format"] = "M4A"
+            elif box_type == b"mvhd":
+                if head[box_start] == 1:
+                    timescale, duration = struct.unpack(
+                        ">IQ", head[box_start + 20 : box_start + 32]
+                    )
+                else:
+                    timescale, duration = struct.unpack(
+                        ">II", head[box_start + 12 : box_start + 20]
+                    )
+                if timescale:
+                    info["duration"] = duration / timescale
+            elif box_type == b"tkhd":
+                offset = 88 if head[box_start] == 1 else 76
+                width, height = struct.unpack(
+                    ">II", head[box_start + offset : box_start + offset + 8]
+                )
+                # 16.16 fixed point; audio tracks have no size
+                if width and "width" not in info:
+                    info.update(width=width >> 16, height=height >> 16)
+            elif box_type == b"stsd":
+                codec = head[box_start + 12 : box_start + 16]
+                codecs.append(codec.decode("ascii", "replace").strip())
+            elif box_type == b"mdat":
+                # Media data comes first; the index is at the end of the file
+                return
+
+    walk(0, len(head))
+    if codecs:
+        info["codec"] = "/".join(codecs)
+    return info
+
+
+def read_ebml_vint(data, pos, is_id=False):
+    """
+    Reads an EBML variable-length integer and returns (value, next_pos). Sizes
+    with all value bits set are unknown and returned as None.
+    """
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("invalid EBML integer")
+    value = first if is_id else first & (mask - 1)
+    for byte in data[pos + 1 : pos + length]:
+        value = (value << 8) | byte
+    if not is_id and value == (1 << (7 * length)) - 1:
+        value = None
+    return (value, pos + length)
+
+
+def iter_ebml_elements(data, start, end):
+    """
+    Yields (id, content_start, content_end) for the elements between start and
+    end. Elements of unknown size extend to end.
+    """
+    pos = start
+    while pos < end:
+        element_id, pos = read_ebml_vint(data, pos, is_id=True)
+        size, pos = read_ebml_vint(data, pos)
+        content_end = end if size is None else min(pos + size, end)
+        yield (element_id, pos, content_end)
+        if size is None:
+            return
+        pos += size
+
+
+def read_ebml_uint(data, start, end):
+    return int.from_bytes(data[start:end], "big")
+
+
+def parse_matroska(head, content_length=None):
+    if head[:4] != EBML_MAGIC:
+        return None
+    info = {"format": "Matroska"}
+    codecs = []
+    track = {}
+    state = {"scale": 1000000, "duration": None}
+
+    def walk(start, end):
+        for element_id, element_start, element_end in iter_ebml_elements(
+            head, start, end
+        ):
+            if element_id == MKV_CLUSTER:
+                return False
+            if element_id == EBML_MAGIC_ID:
+                for child_id, child_start, child_end in iter_ebml_elements(
+                    head, element_start, element_end
+                ):
+                    if child_id == EBML_DOCTYPE:
+                        doctype = head[child_start:child_end].rstrip(b"\x00")
+                        if doctype == b"webm":
+                            info["format"] = "WebM"
+            elif element_id in (MKV_SEGMENT, MKV_INFO, MKV_TRACKS, MKV_VIDEO):
+                if walk(element_start, element_end) is False:
+                    return False
+            elif element_id == MKV_TRACK_ENTRY:
+                track.clear()
+                walk(element_start, element_end)
+            elif element_id == MKV_TIMECODE_SCALE:
+                state["scale"] = read_ebml_uint(head, element_start, element_end)
+            elif element_id == MKV_DURATION:
+                fmt = ">f" if element_end - element_start == 4 else ">d"
+                (state["duration"],) = struct.unpack(
+                    fmt, head[element_start:element_end]
+                )
+            elif element_id == MKV_CODEC_ID:
+                codec = head[element_start:element_end].decode("ascii", "replace")
+                # V_VP9 -> VP9, A_MPEG/L3 -> MPEG
+                codec = codec.split("/")[0].rstrip("\x00")
+                codecs.append(codec[2:] if codec[1:2] == "_" else codec)
+            elif element_id == MKV_PIXEL_WIDTH and "width" not in info:
+                info["width"] = read_ebml_uint(head, element_start, element_end)
+            elif element_id == MKV_PIXEL_HEIGHT and "height" not in info:
+                info["height"] = read_ebml_uint(head, element_start, element_end)
+
+    walk(0, len(head))
+    if state["duration"] is not None:
+        info["duration"] = state["duration"] * state["scale"] / 1000000000
+    if codecs:
+        info["codec"] = "/".join(codecs)
+    return info
+
+
+def parse_mp3(head, content_length=None):
+    pos = 0
+    if head[:3] == b"ID3":
+        # Syncsafe tag size, plus the header and an optional footer
+        size = 0
+        for byte in head[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        pos = size + (20 if head[5] & 0x10 else 10)
+        # Skip padding before the first frame
+        while pos < len(head) and head[pos] == 0:
+            pos += 1
+    elif head[:2] not in (b"\xff\xfb", b"\xff\xfa", b"\xff\xf3", b"\xff\xf2"):
+        return None
+    if pos + 4 > len(head):
+        # Cover art or other tags fill the probed bytes
+        return {"format": "MP3"} if pos else None
+    (header,) = struct.unpack(">I", head[pos : pos + 4])
+    version = (header >> 19) & 3
+    layer = (header >> 17) & 3
+    if header >> 21 != 0x7FF or version == 1 or layer != 1:
+        return None
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[1 if mpeg1 else 2][(header >> 12) & 15] * 1000
+    sample_rate = MP3_SAMPLE_RATES[(header >> 10) & 3]
+    sample_rate >>= {3: 0, 2: 1, 0: 2}[version]
+    mono = (header >> 6) & 3 == 3
+    samples_per_frame = 1152 if mpeg1 else 576
+    info = {"format": "MP3", "codec": "mp3"}
+    # A Xing/Info or VBRI header in the first frame gives the frame count
+    side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+    xing = pos + 4 + side_info
+    frames = None
+    if head[xing : xing + 4] in (b"Xing", b"Info"):
+        (flags,) = struct.unpack(">I", head[xing + 4 : xing + 8])
+        if flags & 1:
+            (frames,) = struct.unpack(">I", head[xing + 8 : xing + 12])
+    elif head[pos + 36 : pos + 40] == b"VBRI":
+        (frames,) = struct.unpack(">I", head[pos + 50 : pos + 54])
+    if frames:
+        info["duration"] = frames * samples_per_frame / sample_rate
+    elif bitrate and content_length:
+        # Constant bitrate
+        info["duration"] = (content_length - pos) * 8 / bitrate
+    return info
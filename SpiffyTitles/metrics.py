@@ -0,0 +1,179 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+metrics: per-handler call, cache hit, error, byte and latency counters.
+"""
+
+import os
+import threading
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+
+class HandlerStats:
+    """
+    Counters of a single handler
+    """
+
+    __slots__ = ("calls", "cache_hits", "errors", "bytes", "buckets", "seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.bytes = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.seconds = 0.0
+
+    def get_quantile(self, quantile):
+        """
+        Returns the upper bound of the latency bucket holding the given
+        quantile of calls, or None if there were no calls
+        """
+        if not self.calls:
+            return None
+        rank = quantile * self.calls
+        count = 0
+        for (bound, bucket) in zip(LATENCY_BUCKETS, self.buckets):
+            count += bucket
+            if count >= rank:
+                return bound
+        return LATENCY_BUCKETS[-1]
+
+
+class HandlerMetrics:
+    """
+    Thread-safe collection of HandlerStats keyed by handler name, which can be
+    written out in the Prometheus text exposition format
+    """
+
+    def __init__(self, prefix="spiffytitles"):
+        self.prefix = prefix
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def observe(self, handler, seconds, error=False, bytes_read=0):
+        """
+        Records a handler call that took seconds and read bytes_read bytes
+        """
+        with self._lock:
+            stats = self._get(handler)
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.bytes += bytes_read
+            if error:
+                stats.errors += 1
+            for (i, bound) in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+                    break
+
+    def cache_hit(self, handler):
+        with self._lock:
+            self._get(handler).cache_hits += 1
+
+    def snapshot(self):
+        """
+        Returns a dict of handler name -> copy of its HandlerStats
+        """
+        with self._lock:
+            snapshot = {}
+            for (name, stats) in self._handlers.items():
+                copy = HandlerStats()
+                for field in HandlerStats.__slots__:
+                    value = getattr(stats, field)
+                    setattr(copy, field, list(value) if field == "buckets" else value)
+                snapshot[name] = copy
+            return snapshot
+
+    def clear(self):
+        with self._lock:
+            self._handlers.clear()
+
+    def to_prometheus(self):
+        """
+        Returns the counters in the Prometheus text exposition format
+        """
+        snapshot = sorted(self.snapshot().items())
+        lines = []
+        counters = (
+            ("calls", "calls", "Handler calls."),
+            ("cache_hits", "cache_hits", "Links served from the cache."),
+            ("errors", "errors", "Handler calls that failed or found no title."),
+            ("bytes", "bytes_read", "Bytes downloaded by handler calls."),
+        )
+        for (field, name, help_text) in counters:
+            metric = "{0}_handler_{1}_total".format(self.prefix, name)
+            lines.append("# HELP {0} {1}".format(metric, help_text))
+            lines.append("# TYPE {0} counter".format(metric))
+            for (handler, stats) in snapshot:
+                lines.append(
+                    '{0}{{handler="{1}"}} {2}'.format(
+                        metric, handler, getattr(stats, field)
+                    )
+                )
+        metric = "{0}_handler_latency_seconds".format(self.prefix)
+        lines.append("# HELP {0} Handler call latency.".format(metric))
+        lines.append("# TYPE {0} histogram".format(metric))
+        for (handler, stats) in snapshot:
+            count = 0
+            for (bound, bucket) in zip(LATENCY_BUCKETS, stats.buckets):
+                count += bucket
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(
+                    '{0}_bucket{{handler="{1}",le="{2}"}} {3}'.format(
+                        metric, handler, le, count
+                    )
+                )
+            lines.append(
+                '{0}_sum{{handler="{1}"}} {2!r}'.format(metric, handler, stats.seconds)
+            )
+            lines.append(
+                '{0}_count{{handler="{1}"}} {2}'.format(metric, handler, count)
+            )
+        return "\n".join(lines) + "\n"
+
+    def write(self, filename):
+        """
+        Writes the counters to filename in the Prometheus text format. The file
+        is replaced in one step, so readers never see a partial file.
+        """
+        temp = "{0}.{1}.tmp".format(filename, os.getpid())
+        with open(temp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(temp, filename)
+
+    def _get(self, handler):
+        stats = self._handlers.get(handler)
+        if stats is None:
+            stats = self._handlers[handler] = HandlerStats()
+        return stats
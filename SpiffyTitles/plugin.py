@@ -35,11 +35,26 @@ import supybot.utils as utils
 import supybot.ircdb as ircdb
 import supybot.log as log
 import supybot.conf as conf
-import re, sys, random, time, json, unicodedata, datetime
+import supybot.schedule as schedule
+import re, sys, random, time, json, unicodedata, datetime, threading
+import concurrent.futures
 from urllib.parse import urlparse, parse_qsl
 from bs4 import BeautifulSoup
 from jinja2 import Template
 import requests
+from .domains import HANDLER, IGNORED, SHORTENER, WHITELISTED, build_domain_index
+from .cache import LinkCache, SingleFlight, normalize_url
+from .configsnapshot import ConfigSnapshots
+from .store import TitleStore
+from .extract import CHUNK_SIZE, extract_title
+from .media import MEDIA_TYPES, probe, read_head
+from .metrics import LATENCY_BUCKETS, HandlerMetrics
+from .pool import CircuitOpenError, SessionPool
+from .redirects import RedirectResolver
+from .templatecache import TemplateCache
+from .breaker import CircuitBreaker
+from .twitch import TwitchClient
+from .youtube import YouTubeBatcher
 
 try:
     from supybot.i18n import PluginInternationalization
@@ -50,6 +65,42 @@ except ImportError:
     # without the i18n module
     _ = lambda x: x
 
+# Settings read for every message, kept in per-channel snapshots
+SNAPSHOT_VALUES = (
+    "ignoreAddressed",
+    "requireCapability",
+    "ignoreActionLinks",
+    "ignoredMessagePattern",
+    "channelWhitelist",
+    "channelBlacklist",
+    "snarfMultipleUrls",
+    "urlRegexp",
+    "concurrency.enabled",
+    "prefixNick",
+    "ignoredTitlePattern",
+    "useBold",
+    "badLinkText",
+    "cacheGlobal",
+    "cacheLifetime",
+    "ignoredDomains",
+    "whitelistDomains",
+    "ignoredDomainPattern",
+    "whitelistDomainPattern",
+    "redirects.enabled",
+    "redirects.domains",
+    "default.enabled",
+    "coub.enabled",
+    "dailymotion.enabled",
+    "imdb.enabled",
+    "imgur.enabled",
+    "reddit.enabled",
+    "twitch.enabled",
+    "twitter.enabled",
+    "vimeo.enabled",
+    "wikipedia.enabled",
+    "youtube.enabled",
+)
+
 
 class SpiffyTitles(callbacks.Plugin):
     """Displays link titles when posted in a channel"""
@@ -60,9 +111,32 @@ class SpiffyTitles(callbacks.Plugin):
     def __init__(self, irc):
         self.__parent = super(SpiffyTitles, self)
         self.__parent.__init__(irc)
-        self.link_cache = {}
+        self.link_cache = LinkCache(
+            self.registryValue("cacheMaxEntries"), self.registryValue("cacheMaxSize")
+        )
+        self.title_store = None
+        self.single_flight = SingleFlight()
+        self.revalidating = set()
+        self.revalidations = 0
+        self._revalidating_lock = threading.Lock()
+        self.metrics = HandlerMetrics()
+        self.signature_values = self.get_signature_values()
+        names = list(SNAPSHOT_VALUES)
+        for group_names in self.signature_values.values():
+            names.extend(name for name in group_names if name not in names)
+        self.config = ConfigSnapshots(self, names, self.prepare_config)
+        self.templates = TemplateCache(Template)
+        self.youtube = YouTubeBatcher(
+            self.fetch_youtube_videos, self.registryValue("cacheMaxEntries")
+        )
         self.handlers = {}
+        self._domain_indexes = {}
+        self._context = threading.local()
         self.timeout = self.registryValue("timeout")
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.registryValue("concurrency.maxWorkers"),
+            thread_name_prefix="SpiffyTitles",
+        )
         self.add_handlers()
         self.proxies = {}
         self.proxies["http"] = None
@@ -74,6 +148,142 @@ class SpiffyTitles(callbacks.Plugin):
                 proxy = "http://{0}".format(proxy)
             self.proxies["http"] = proxy
             self.proxies["https"] = proxy
+        self.failed_links = LinkCache(self.registryValue("cacheMaxEntries"), 0)
+        self.http = SessionPool(
+            self.proxies,
+            self.registryValue("pool.maxHosts"),
+            self.registryValue("pool.maxSize"),
+            CircuitBreaker(
+                self.registryValue("circuitBreaker.threshold"),
+                self.registryValue("circuitBreaker.cooldown"),
+            ),
+            on_response=self.track_response,
+        )
+        self.redirects = RedirectResolver(
+            self.http, self.registryValue("cacheMaxEntries")
+        )
+        self.twitch = TwitchClient(
+            self.http,
+            self.get_twitch_credentials,
+            self.registryValue("cacheMaxEntries"),
+        )
+        if self.registryValue("persistentCache.enabled"):
+            self.open_title_store()
+        self.metrics_event = None
+        if self.registryValue("metrics.interval"):
+            self.metrics_event = schedule.addPeriodicEvent(
+                self.write_metrics,
+                self.registryValue("metrics.interval"),
+                name="SpiffyTitles.metrics",
+                now=False,
+            )
+
+    def die(self):
+        self.executor.shutdown(wait=False)
+        self.http.close()
+        self.config.close()
+        self.templates.close()
+        if self.metrics_event:
+            schedule.removeEvent(self.metrics_event)
+        if self.title_store:
+            schedule.removeEvent("SpiffyTitles.vacuum")
+            self.title_store.close()
+        self.__parent.die()
+
+    def get_signature_values(self):
+        """
+        Returns the names of the values in the config group of each handler,
+        which can change the titles it renders
+        """
+        plugin = conf.supybot.plugins.get(self.name())
+        signature_values = {}
+        # Handlers are named handler_<group>, after their config group
+        for attr in dir(self):
+            name = attr.split("_")
+            if len(name) > 1 and name[0] == "handler" and name[1] in plugin._children:
+                signature_values[name[1]] = tuple(
+                    "{0}.{1}".format(name[1], value_name)
+                    for (value_name, _) in plugin.get(name[1]).getValues(
+                        fullNames=False
+                    )
+                )
+        return signature_values
+
+    def prepare_config(self, values):
+        """
+        Builds the handler config signatures, compiles the URL pattern and
+        normalizes the lists of a config snapshot
+        """
+
+        def get_values(group):
+            return tuple(
+                str(values[name.replace(".", "_")])
+                for name in self.signature_values.get(group, ())
+            )
+
+        default = (values["badLinkText"],) + get_values("default")
+        values["signatures"] = {
+            group: default + get_values(group)
+            for group in self.signature_values
+            if group != "default"
+        }
+        values["signatures"]["default"] = default
+        url_re = values["urlRegexp"] or utils.web._httpUrlRe
+        try:
+            values["urlRegexp"] = re.compile(url_re)
+        except re.error:
+            log.error("SpiffyTitles: invalid urlRegexp: %s" % (url_re))
+            values["urlRegexp"] = re.compile(utils.web._httpUrlRe)
+        for name in ("channelWhitelist", "channelBlacklist"):
+            values[name] = frozenset(
+                channel.strip().lower() for channel in values[name] if channel.strip()
+            )
+        values["ignoredDomains"] = tuple(values["ignoredDomains"])
+        values["whitelistDomains"] = tuple(values["whitelistDomains"])
+        values["redirects_domains"] = tuple(values["redirects_domains"])
+        values["cacheLifetime"] = int(values["cacheLifetime"])
+
+    def open_title_store(self):
+        """
+        Opens the persistent title cache and schedules removal of expired titles
+        """
+        filename = conf.supybot.directories.data.dirize("SpiffyTitles.db")
+        try:
+            self.title_store = TitleStore(filename)
+        except Exception as e:
+            log.error("SpiffyTitles: unable to open %s: %s" % (filename, str(e)))
+            return
+        schedule.addPeriodicEvent(
+            self.vacuum_title_store,
+            self.registryValue("persistentCache.vacuumInterval"),
+            name="SpiffyTitles.vacuum",
+            now=False,
+        )
+
+    def vacuum_title_store(self):
+        """
+        Deletes expired titles from the persistent cache in a background thread
+        """
+
+        def vacuum():
+            try:
+                count = self.title_store.vacuum()
+                log.debug("SpiffyTitles: vacuumed %s expired titles" % (count))
+            except Exception as e:
+                log.error("SpiffyTitles: error vacuuming title cache: %s" % (str(e)))
+
+        threading.Thread(target=vacuum, name="SpiffyTitles.vacuum", daemon=True).start()
+
+    def write_metrics(self):
+        """
+        Writes the handler metrics to SpiffyTitles.prom in the data directory, in
+        the Prometheus text format
+        """
+        filename = conf.supybot.directories.data.dirize("SpiffyTitles.prom")
+        try:
+            self.metrics.write(filename)
+        except Exception as e:
+            log.error("SpiffyTitles: unable to write %s: %s" % (filename, str(e)))
 
     def add_handlers(self):
         """
@@ -152,25 +362,22 @@ class SpiffyTitles(callbacks.Plugin):
             return
         if msg.nick.lower() == irc.nick.lower():
             return
-        if callbacks.addressed(irc, msg) and self.registryValue(
-            "ignoreAddressed", channel=channel
-        ):
+        config = self.config.get(channel)
+        if callbacks.addressed(irc, msg) and config.ignoreAddressed:
             return
         if ircdb.checkIgnored(msg.prefix, channel):
             return
         """
         Check if we require a capability to acknowledge this link
         """
-        if self.registryValue("requireCapability", channel=channel):
+        if config.requireCapability:
             if not self.user_has_capability(msg):
                 return
         """
         Configuration option determines whether we should
         ignore links that appear within an action
         """
-        if self.registryValue("ignoreActionLinks", channel=channel) and (
-            ircmsgs.isCtcp(msg) or ircmsgs.isAction(msg)
-        ):
+        if config.ignoreActionLinks and (ircmsgs.isCtcp(msg) or ircmsgs.isAction(msg)):
             return
         if self.message_matches_ignore_pattern(message, channel):
             log.debug(
@@ -184,64 +391,120 @@ class SpiffyTitles(callbacks.Plugin):
                 % (channel)
             )
             return
-        if self.registryValue("snarfMultipleUrls", channel=channel):
+        if config.snarfMultipleUrls:
             urls = self.get_urls_from_message(message, channel)
         else:
             urls = self.get_urls_from_message(message, channel)[0:1]
         if not urls:
             return
+        urls = [self.remove_control_characters(url) for url in urls if url.strip()]
+        allowed_urls = []
         for url in urls:
-            if url.strip():
-                url = self.remove_control_characters(url)
-                # Check if channel is allowed based on white/black list restrictions
-                info = urlparse(url)
-                domain = info.netloc
-                is_ignored = self.is_ignored_domain(domain, channel)
-                if is_ignored:
-                    log.debug(
-                        "SpiffyTitles: URL ignored due to domain blacklist match: %s"
-                        % url
-                    )
+            # Stop at the first URL ruled out by the domain white/black lists
+            if not self.is_url_allowed(url, channel):
+                break
+            allowed_urls.append(url)
+        if len(allowed_urls) > 1:
+            self.prefetch_youtube_videos(allowed_urls, channel)
+        if len(allowed_urls) > 1 and config.concurrency_enabled:
+            titles = self.get_titles_by_urls(allowed_urls, channel, msg.nick)
+        else:
+            titles = (
+                (url, self.get_title_by_url(url, channel, msg.nick))
+                for url in allowed_urls
+            )
+        for (url, title) in titles:
+            if title:
+                prefixed = config.prefixNick
+                ignore_match = self.title_matches_ignore_pattern(title, channel)
+                if ignore_match:
                     return
-                is_whitelisted_domain = self.is_whitelisted_domain(domain, channel)
-                whitelist_pattern = self.registryValue(
-                    "whitelistDomainPattern", channel=channel
-                )
-                if whitelist_pattern and not is_whitelisted_domain:
+                else:
+                    irc.reply(title, prefixNick=prefixed)
+            else:
+                if config.default_enabled:
+                    log.debug("SpiffyTitles: could not get a title for %s" % (url))
+                else:
                     log.debug(
-                        "SpiffyTitles: URL ignored due to domain whitelist mismatch: %s"
-                        % url
+                        "SpiffyTitles: could not get a title for %s but default    "
+                        "                                handler is disabled"
+                        % (url)
                     )
-                    return
-                title = self.get_title_by_url(url, channel, msg.nick)
-                if title:
-                    prefixed = self.registryValue("prefixNick", channel=channel)
-                    ignore_match = self.title_matches_ignore_pattern(title, channel)
-                    if ignore_match:
-                        return
-                    elif not is_ignored:
-                        irc.reply(title, prefixNick=prefixed)
-                else:
-                    if self.registryValue("default.enabled", channel):
-                        log.debug("SpiffyTitles: could not get a title for %s" % (url))
-                    else:
-                        log.debug(
-                            "SpiffyTitles: could not get a title for %s but default    "
-                            "                                handler is disabled"
-                            % (url)
-                        )
+
+    def is_url_allowed(self, url, channel):
+        """
+        Checks the domain of a URL against the domain white/black lists
+        """
+        info = urlparse(url)
+        domain = info.netloc
+        domain_info = self.get_domain_info(domain, channel)
+        is_ignored = domain_info.get(IGNORED)
+        if not is_ignored:
+            is_ignored = self.match_domain_pattern(
+                "ignoredDomainPattern", domain, channel
+            )
+        if is_ignored:
+            log.debug(
+                "SpiffyTitles: URL ignored due to domain blacklist match: %s" % url
+            )
+            return False
+        whitelist = self.config.get(channel).whitelistDomains
+        whitelist_pattern = self.config.get(channel).whitelistDomainPattern
+        has_whitelist = whitelist or whitelist_pattern
+        is_whitelisted_domain = domain_info.get(WHITELISTED)
+        if has_whitelist and not is_whitelisted_domain:
+            is_whitelisted_domain = self.match_domain_pattern(
+                "whitelistDomainPattern", domain, channel
+            )
+        if has_whitelist and not is_whitelisted_domain:
+            log.debug(
+                "SpiffyTitles: URL ignored due to domain whitelist mismatch: %s" % url
+            )
+            return False
+        return True
+
+    def get_titles_by_urls(self, urls, channel, origin_nick=None):
+        """
+        Retrieves the titles of several URLs at once on the worker pool. Yields
+        (url, title) pairs in the original order as they become available, and
+        drops URLs that are still pending when the message deadline passes.
+        """
+        deadline = time.monotonic() + self.registryValue(
+            "concurrency.deadline", channel=channel
+        )
+        futures = [
+            (url, self.executor.submit(self.get_title_by_url, url, channel, origin_nick))
+            for url in urls
+        ]
+        try:
+            for (url, future) in futures:
+                remaining = max(deadline - time.monotonic(), 0)
+                try:
+                    title = future.result(timeout=remaining)
+                except concurrent.futures.TimeoutError:
+                    log.debug("SpiffyTitles: %s missed the message deadline" % (url))
+                    continue
+                except Exception as e:
+                    log.error("SpiffyTitles: error retrieving %s: %s" % (url, str(e)))
+                    continue
+                yield (url, title)
+        finally:
+            # Lookups already running finish in the background and fill the cache
+            for (url, future) in futures:
+                future.cancel()
 
     def handler_default(self, url, channel):
         """
         Default handler for websites
         """
-        if self.registryValue("default.enabled", channel):
+        if self.config.get(channel).default_enabled:
             log.debug("SpiffyTitles: calling default handler for %s" % (url))
-            default_template = Template(
-                self.registryValue("default.template", channel=channel)
-            )
+            default_template = self.get_template("default.template", channel)
             (title, is_redirect) = self.get_source_by_url(url, channel)
             if title:
+                self.set_handler_metadata(
+                    "default", {"title": title, "redirect": is_redirect}
+                )
                 title_template = default_template.render(
                     title=title, redirect=is_redirect
                 )
@@ -258,90 +521,389 @@ class SpiffyTitles(callbacks.Plugin):
         Retrieves the title of a website based on the URL provided
         """
         info = urlparse(url)
-        domain = info.netloc
         title = None
         """
         Check if we have this link cached according to the cache lifetime. If so, serve
         link from the cache instead of calling handlers.
         """
-        if self.registryValue("cacheGlobal"):
+        if self.config.get(channel).cacheGlobal:
             channel = "global"
         cached_link = self.get_link_from_cache(url, channel)
         if cached_link:
             title = cached_link["title"]
+            self.metrics.cache_hit(self.get_handler_name(self.get_handler(info.netloc)))
+            if self.is_link_stale(cached_link):
+                self.revalidate_link(url, channel, cached_link["from"])
         else:
-            if domain in self.handlers:
-                handler = self.handlers[domain]
-                title = handler(url, info, channel)
-            else:
-                base_domain = self.get_base_domain("http://" + domain)
-                if base_domain in self.handlers:
-                    handler = self.handlers[base_domain]
-                    title = handler(url, info, channel)
-                else:
-                    if self.registryValue("default.enabled", channel):
-                        title = self.handler_default(url, channel)
-        if title and not cached_link:
+            title = self.lookup_title(url, info, channel, origin_nick)
+        if title and cached_link:
+            log.debug("SpiffyTitles: serving link from cache: %s" % (url))
+        return title
+
+    def lookup_title(self, url, info, channel, origin_nick=None):
+        """
+        Fetches and caches the title of a URL. Links to URL shorteners are first
+        resolved to their target, whose title is then looked up with the handler
+        for its domain and cached under both URLs.
+        """
+        domain_info = self.get_domain_info(info.netloc, channel)
+        if domain_info.get(HANDLER) or not domain_info.get(SHORTENER):
+            return self.fetch_title(url, info, channel, origin_nick)
+        target = self.resolve_short_link(url, channel)
+        if target == url:
+            return self.fetch_title(url, info, channel, origin_nick)
+        if not self.is_url_allowed(target, channel):
+            return None
+        # A target served from the cache leaves no handler metadata behind
+        self.set_handler_metadata(None, None)
+        title = self.get_title_by_url(target, channel, origin_nick)
+        if not title:
+            return None
+        if self.get_base_domain(url) != self.get_base_domain(target):
+            # Shown the same way as a redirect followed by the default handler
+            template = self.get_template("default.template", channel)
+            title = template.render(
+                title=title.lstrip("\x02").lstrip("^").strip(), redirect=True
+            )
             title = self.get_formatted_title(title, channel)
-            # Update link cache
-            log.debug("SpiffyTitles: caching %s" % (url))
-            now = datetime.datetime.now()
-            if channel not in self.link_cache:
-                self.link_cache[channel] = []
-            self.link_cache[channel].append(
-                {
-                    "url": url,
-                    "timestamp": now,
-                    "title": title,
-                    "from": origin_nick,
-                    "channel": channel,
-                }
+        self.add_link_to_cache(url, channel, title, origin_nick)
+        return title
+
+    def resolve_short_link(self, url, channel):
+        """
+        Returns the URL a short link redirects to, from the redirect cache if it
+        has been resolved before, or the link itself if it cannot be resolved.
+        Redirects are followed only as long as they lead to other short links;
+        any further ones are left to the handler of the target.
+        """
+
+        def is_short_link(url):
+            return self.get_domain_info(urlparse(url).netloc, channel).get(SHORTENER)
+
+        try:
+            (target, hops) = self.redirects.resolve(
+                url,
+                self.registryValue("redirects.maxHops"),
+                self.registryValue("redirects.lifetime"),
+                is_short_link,
+                headers=self.get_headers(channel),
+                timeout=self.timeout,
             )
-        elif title and cached_link:
-            self.link_cache[channel].append(cached_link)
-            log.debug("SpiffyTitles: serving link from cache: %s" % (url))
+        except requests.exceptions.RequestException as e:
+            log.error("SpiffyTitles: error resolving %s: %s" % (url, str(e)))
+            return url
+        log.debug("SpiffyTitles: %s leads to %s in %s hops" % (url, target, hops))
+        return target
+
+    def fetch_title(self, url, info, channel, origin_nick=None):
+        """
+        Calls the handler for a URL and caches the formatted title
+        """
+        handler = self.get_handler(info.netloc)
+        """
+        Lookups of the same link running at the same time in other channels
+        share one fetch, as long as those channels render it the same way.
+        """
+        flight_key = (normalize_url(url), self.get_config_signature(handler, channel))
+        (title, handler_name, metadata) = self.single_flight.do(
+            flight_key, self.call_handler, handler, url, info, channel
+        )
+        self.set_handler_metadata(handler_name, metadata)
+        if title:
+            title = self.get_formatted_title(title, channel)
+            self.add_link_to_cache(url, channel, title, origin_nick)
         return title
 
+    def is_link_stale(self, cached_link):
+        """
+        Whether a cached link is past its soft lifetime and should be refreshed
+        """
+        stale = cached_link.get("stale")
+        return stale is not None and time.time() >= stale
+
+    def revalidate_link(self, url, channel, origin_nick=None):
+        """
+        Refreshes a stale cached link on the worker pool, unless a refresh of it
+        is already running. The stale title stays in the cache until the refresh
+        replaces it, or until its hard lifetime ends.
+        """
+        key = self.get_cache_key(url, channel)
+        with self._revalidating_lock:
+            if key in self.revalidating:
+                return
+            self.revalidating.add(key)
+        log.debug("SpiffyTitles: revalidating %s" % (url))
+        try:
+            self.executor.submit(self.refresh_link, key, url, channel, origin_nick)
+        except RuntimeError:
+            # The executor has been shut down
+            with self._revalidating_lock:
+                self.revalidating.discard(key)
+
+    def refresh_link(self, key, url, channel, origin_nick=None):
+        try:
+            self.lookup_title(url, urlparse(url), channel, origin_nick)
+            self.revalidations += 1
+        except Exception as e:
+            log.error("SpiffyTitles: error revalidating %s: %s" % (url, str(e)))
+        finally:
+            with self._revalidating_lock:
+                self.revalidating.discard(key)
+
+    def get_handler(self, domain):
+        """
+        Returns the handler registered for a domain or one of its parent
+        domains, or None
+        """
+        return self.get_domain_info(domain).get(HANDLER)
+
+    def get_domain_info(self, domain, channel=None):
+        """
+        Returns the handler, ignored, whitelisted and URL shortener entries that
+        apply to a domain, found with one walk of the channel's domain index. The
+        index is only rebuilt when the handlers or the domain lists change.
+        """
+        config = self.config.get(channel)
+        if channel is None:
+            ignored = whitelisted = ()
+        else:
+            ignored = config.ignoredDomains
+            whitelisted = config.whitelistDomains
+        shorteners = ()
+        if config.redirects_enabled:
+            shorteners = config.redirects_domains
+        signature = (tuple(self.handlers.items()), ignored, whitelisted, shorteners)
+        index = self._domain_indexes.get(channel)
+        if index is None or index[0] != signature:
+            log.debug("SpiffyTitles: building domain index for %s" % (channel))
+            index = (
+                signature,
+                build_domain_index(self.handlers, ignored, whitelisted, shorteners),
+            )
+            self._domain_indexes[channel] = index
+        return index[1].lookup(domain)
+
+    def call_handler(self, handler, url, info, channel):
+        """
+        Runs handler, or the default handler if it is None, and returns its title
+        along with the handler metadata it recorded
+        """
+        self.set_handler_metadata(None, None)
+        if not handler and not self.config.get(channel).default_enabled:
+            return (None, None, None)
+        # Handlers can look up other links, which are measured on their own
+        outer_responses = getattr(self._context, "responses", None)
+        self._context.responses = []
+        title = None
+        started = time.monotonic()
+        try:
+            if handler:
+                title = handler(url, info, channel)
+            else:
+                title = self.handler_default(url, channel)
+        finally:
+            bytes_read = sum(map(self.get_bytes_read, self._context.responses))
+            self._context.responses = outer_responses
+            self.metrics.observe(
+                self.get_handler_name(handler),
+                time.monotonic() - started,
+                not title,
+                bytes_read,
+            )
+        return (title, self._context.handler, self._context.metadata)
+
+    def get_handler_name(self, handler):
+        """
+        Returns the name handler is reported under in the handler metrics
+        """
+        name = getattr(handler, "__name__", "handler_default").split("_")
+        if len(name) > 1 and name[0] == "handler":
+            return name[1]
+        return "default"
+
+    def track_response(self, response):
+        """
+        Keeps the responses received during a handler call, so that the bytes
+        it downloaded can be counted once it returns
+        """
+        responses = getattr(self._context, "responses", None)
+        if responses is not None:
+            responses.append(response)
+
+    def get_bytes_read(self, response):
+        """
+        Returns the number of bytes read from the network for a response and the
+        redirects that led to it
+        """
+        total = 0
+        for item in response.history + [response]:
+            tell = getattr(item.raw, "tell", None)
+            if tell:
+                total += tell()
+        return total
+
+    def get_config_signature(self, handler, channel):
+        """
+        Returns the channel's values of every setting that can change the output
+        of handler
+        """
+        signatures = self.config.get(channel).signatures
+        name = getattr(handler, "__name__", "").split("_")
+        if len(name) > 1 and name[0] == "handler" and name[1] in signatures:
+            return signatures[name[1]]
+        return signatures["default"]
+
+    def get_cache_key(self, url, channel):
+        """
+        Returns the link cache key for a URL posted in channel
+        """
+        return (channel.lower(), normalize_url(url))
+
+    def add_link_to_cache(self, url, channel, title, origin_nick=None):
+        """
+        Stores a formatted title in the link cache, unless the cache is disabled
+        """
+        cache_lifetime_in_seconds = self.config.get(channel).cacheLifetime
+        if cache_lifetime_in_seconds == 0:
+            return
+        log.debug("SpiffyTitles: caching %s" % (url))
+        key = self.get_cache_key(url, channel)
+        self.link_cache.resize(
+            self.registryValue("cacheMaxEntries"), self.registryValue("cacheMaxSize")
+        )
+        handler = getattr(self._context, "handler", None) or "default"
+        cached_link = {
+            "url": url,
+            "timestamp": datetime.datetime.now(),
+            "title": title,
+            "from": origin_nick,
+            "channel": channel,
+        }
+        if self.registryValue("staleWhileRevalidate.enabled"):
+            # Served as is until the soft lifetime, then served while a refresh
+            # runs in the background, until the hard lifetime
+            (soft, hard) = self.get_revalidate_lifetimes(handler)
+            cached_link["stale"] = time.time() + soft
+            cache_lifetime_in_seconds = hard
+        self.link_cache.set(key, cached_link, cache_lifetime_in_seconds)
+        if self.title_store:
+            metadata = getattr(self._context, "metadata", None)
+            try:
+                self.title_store.set(
+                    key,
+                    title,
+                    handler,
+                    metadata,
+                    self.get_persistent_lifetime(handler),
+                    origin_nick,
+                )
+            except Exception as e:
+                log.error("SpiffyTitles: error storing title for %s: %s" % (url, e))
+
     def get_link_from_cache(self, url, channel):
         """
         Looks for a URL in the link cache and returns info about if it's not stale
         according to the configured cache lifetime, or None. If cacheLifetime is 0,
         then cache is disabled and we can immediately return
         """
-        cache_lifetime_in_seconds = int(self.registryValue("cacheLifetime"))
+        cache_lifetime_in_seconds = self.config.get(channel).cacheLifetime
         if cache_lifetime_in_seconds == 0:
             return
-        # No cache yet
-        if len(self.link_cache) == 0:
-            return
-        cached_link = None
-        now = datetime.datetime.now()
-        stale = False
-        seconds = 0
-        if channel in self.link_cache:
-            for i in range(len(self.link_cache[channel])):
-                if self.link_cache[channel][i]["url"] == url:
-                    cached_link = self.link_cache[channel].pop(i)
-                    break
-        # Found link, check timestamp
-        if cached_link:
-            seconds = (now - cached_link["timestamp"]).total_seconds()
-            if seconds >= cache_lifetime_in_seconds:
-                stale = True
-        if stale:
-            log.debug("SpiffyTitles: %s was sent %s seconds ago" % (url, seconds))
-        else:
+        key = self.get_cache_key(url, channel)
+        cached_link = self.link_cache.get(key)
+        if not cached_link:
+            return self.get_link_from_title_store(key, cache_lifetime_in_seconds)
+        if "stale" in cached_link:
+            # Expires at its hard lifetime
             return cached_link
+        # Entries expire on their own, but the lifetime may have been lowered since
+        seconds = (datetime.datetime.now() - cached_link["timestamp"]).total_seconds()
+        if seconds >= cache_lifetime_in_seconds:
+            log.debug("SpiffyTitles: %s was sent %s seconds ago" % (url, seconds))
+            self.link_cache.delete(key)
+            return
+        return cached_link
+
+    def get_link_from_title_store(self, key, cache_lifetime_in_seconds):
+        """
+        Looks for a link in the persistent cache. Titles found there are copied
+        into the link cache so later lookups stay in memory.
+        """
+        if not self.title_store:
+            return
+        try:
+            row = self.title_store.get(key)
+        except Exception as e:
+            log.error("SpiffyTitles: error reading title cache: %s" % (str(e)))
+            return
+        if not row:
+            return
+        log.debug("SpiffyTitles: loaded %s from persistent cache" % (row["url"]))
+        cached_link = {
+            "url": row["url"],
+            "timestamp": datetime.datetime.now(),
+            "title": row["title"],
+            "from": row["origin"],
+            "channel": key[0],
+        }
+        lifetime = min(cache_lifetime_in_seconds, row["expires"] - time.time())
+        if self.registryValue("staleWhileRevalidate.enabled"):
+            (soft, hard) = self.get_revalidate_lifetimes(row["handler"])
+            cached_link["stale"] = row["created"] + soft
+            lifetime = row["expires"] - time.time()
+        self.link_cache.set(key, cached_link, lifetime)
+        return cached_link
+
+    def get_persistent_lifetime(self, handler):
+        """
+        Returns the persistent cache lifetime in seconds for titles from handler
+        """
+        return self.get_handler_lifetime("persistentCache.lifetimes", handler)
+
+    def get_revalidate_lifetimes(self, handler):
+        """
+        Returns the (soft, hard) stale-while-revalidate lifetimes in seconds for
+        titles from handler
+        """
+        soft = self.get_handler_lifetime("staleWhileRevalidate.softLifetimes", handler)
+        hard = self.get_handler_lifetime("staleWhileRevalidate.hardLifetimes", handler)
+        return (soft, max(soft, hard))
+
+    def get_handler_lifetime(self, name, handler):
+        """
+        Returns the lifetime in seconds for handler from the list of handler=seconds
+        pairs in config value name. Handlers not listed use the default entry, or
+        cacheLifetime if there is none.
+        """
+        lifetimes = {}
+        for item in self.registryValue(name):
+            (handler_name, _, seconds) = item.partition("=")
+            try:
+                lifetimes[handler_name.strip().lower()] = int(seconds)
+            except ValueError:
+                log.error("SpiffyTitles: invalid lifetime %s in %s" % (item, name))
+        if handler in lifetimes:
+            return lifetimes[handler]
+        return lifetimes.get("default", int(self.registryValue("cacheLifetime")))
+
+    def set_handler_metadata(self, handler, metadata):
+        """
+        Records which handler produced the title being looked up in this thread,
+        along with the raw data it was rendered from.
+        """
+        self._context.handler = handler
+        self._context.metadata = metadata
 
     def is_channel_allowed(self, channel):
         """
         Checks channel whitelist and blacklist to determine if the current
         channel is allowed to display titles.
         """
+        config = self.config.get(channel)
         channel = channel.lower()
         is_allowed = False
-        white_list = self.filter_empty(self.registryValue("channelWhitelist"))
-        black_list = self.filter_empty(self.registryValue("channelBlacklist"))
+        white_list = config.channelWhitelist
+        black_list = config.channelBlacklist
         white_list_empty = len(white_list) == 0
         black_list_empty = len(black_list) == 0
         # Most basic case: both white and blacklist are empty. Any channel is allowed.
@@ -355,32 +917,11 @@ class SpiffyTitles(callbacks.Plugin):
             is_allowed = channel not in black_list
         return is_allowed
 
-    def filter_empty(self, input):
-        """
-        Remove all empty strings from a list
-        """
-        return set([channel for channel in input if len(channel.strip())])
-
-    def is_ignored_domain(self, domain, channel):
+    def match_domain_pattern(self, name, domain, channel):
         """
-        Checks domain against a regular expression
+        Checks domain against the regular expression in config value name
         """
-        pattern = self.registryValue("ignoredDomainPattern", channel=channel)
-        if pattern:
-            log.debug("SpiffyTitles: matching %s against %s" % (domain, str(pattern)))
-            try:
-                pattern_search_result = re.search(pattern, domain)
-                if pattern_search_result:
-                    match = pattern_search_result.group()
-                    return match
-            except re.error:
-                log.error("SpiffyTitles: invalid regular expression: %s" % (pattern))
-
-    def is_whitelisted_domain(self, domain, channel):
-        """
-        Checks domain against a regular expression
-        """
-        pattern = self.registryValue("whitelistDomainPattern", channel=channel)
+        pattern = getattr(self.config.get(channel), name)
         if pattern:
             log.debug("SpiffyTitles: matching %s against %s" % (domain, str(pattern)))
             try:
@@ -395,46 +936,99 @@ class SpiffyTitles(callbacks.Plugin):
         """
         Remove cruft from title and apply bold if applicable
         """
-        use_bold = self.registryValue("useBold", channel=channel)
+        use_bold = self.config.get(channel).useBold
         # Replace anywhere in string
         title = re.sub(r"\s+", " ", title)
         if use_bold:
             title = ircutils.bold(title).strip()
         return title
 
-    def get_title_from_html(self, html, channel):
+    def get_title_from_response(self, request, channel):
         """
-        Retrieves value of <title> tag from HTML
+        Retrieves value of <title> tag from a streamed HTML response, reading no
+        further than the end of the tag or default.maxBytes
         """
-        title = None
-        soup = BeautifulSoup(html)
-        if soup:
-            try:
-                title = soup.title.string.strip()
-            except:
-                title = self.registryValue("badLinkText", channel=channel)
+        (title, size) = extract_title(
+            request.iter_content(CHUNK_SIZE),
+            request.headers.get("content-type"),
+            self.registryValue("default.maxBytes", channel=channel),
+        )
+        log.debug("SpiffyTitles: read %s bytes from %s" % (size, request.url))
+        if not size:
+            return None
+        if not title:
+            title = self.config.get(channel).badLinkText
         return title
 
-    def get_source_by_url(self, url, channel, retries=1):
+    def get_media_info(self, request, content_type, channel):
         """
-        Get the HTML of a website based on a URL
+        Reads no more than default.probeBytes from the start of a streamed image,
+        video or audio response and returns the format, dimensions, duration and
+        codec found in its headers. The rest of the file is never downloaded.
         """
-        max_retries = self.registryValue("maxRetries")
-        if retries >= max_retries:
-            log.debug("SpiffyTitles: hit maximum retries for %s" % url)
+        max_bytes = self.registryValue("default.probeBytes", channel=channel)
+        if not max_bytes or content_type.split("/")[0] not in MEDIA_TYPES:
+            return {}
+        try:
+            content_length = int(request.headers.get("content-length"))
+        except (TypeError, ValueError):
+            content_length = None
+        head = read_head(request.iter_content(CHUNK_SIZE), max_bytes)
+        info = probe(head, content_length)
+        log.debug(
+            "SpiffyTitles: read %s bytes from %s: %s" % (len(head), request.url, info)
+        )
+        if info.get("duration"):
+            info["duration"] = self.get_duration_from_seconds(round(info["duration"]))
+        return info
+
+    def get_source_by_url(self, url, channel):
+        """
+        Get the HTML of a website based on a URL, retrying with an increasing delay
+        on timeouts and connection errors. URLs that still fail are remembered for
+        negativeCacheLifetime seconds and not requested again in the meantime.
+        """
+        key = normalize_url(url)
+        if self.failed_links.get(key):
+            log.debug("SpiffyTitles: %s failed recently, skipping" % (url))
             return (None, False)
-        log.debug("SpiffyTitles: attempt #%s for %s" % (retries, url))
+        max_retries = max(self.registryValue("maxRetries"), 1)
+        backoff = self.registryValue("retryBackoff")
+        for attempt in range(1, max_retries + 1):
+            log.debug("SpiffyTitles: attempt #%s for %s" % (attempt, url))
+            try:
+                return self.fetch_source_by_url(url, channel)
+            except CircuitOpenError as e:
+                log.debug("SpiffyTitles: %s" % (str(e)))
+                break
+            except requests.exceptions.Timeout as e:
+                log.error("SpiffyTitles Timeout: %s" % (str(e)))
+            except requests.exceptions.ConnectionError as e:
+                log.error("SpiffyTitles ConnectionError: %s" % (str(e)))
+            if attempt < max_retries and backoff > 0:
+                time.sleep(backoff * 2 ** (attempt - 1))
+        else:
+            log.debug("SpiffyTitles: hit maximum retries for %s" % url)
+        negative_lifetime = self.registryValue("negativeCacheLifetime")
+        if negative_lifetime > 0:
+            self.failed_links.set(key, {"url": url}, negative_lifetime)
+        return (None, False)
+
+    def fetch_source_by_url(self, url, channel):
+        """
+        Makes a single attempt at getting the title of a website. Timeouts and
+        connection errors are left to the caller.
+        """
         is_redirect = False
         try:
             headers = self.get_headers(channel)
             log.debug("SpiffyTitles: requesting %s" % (url))
-            with requests.get(
+            with self.http.get(
                 url,
                 headers=headers,
                 timeout=self.timeout,
                 allow_redirects=True,
                 stream=True,
-                proxies=self.proxies,
             ) as request:
                 request.raise_for_status()
                 if request.history:
@@ -449,40 +1043,20 @@ class SpiffyTitles(callbacks.Plugin):
                                 % (redir.status_code, redir.url)
                             )
                         log.debug("SpiffyTitles: Final url %s" % (request.url))
-                        info = urlparse(request.url)
-                        domain = info.netloc
-                        is_ignored = self.is_ignored_domain(domain, channel)
-                        if is_ignored:
-                            log.debug(
-                                "SpiffyTitles: URL ignored due to domain blacklist"
-                                " match: %s"
-                                % url
-                            )
-                            return
-                        whitelist_pattern = self.registryValue(
-                            "whitelistDomainPattern", channel=channel
-                        )
-                        is_whitelisted_domain = self.is_whitelisted_domain(
-                            domain, channel
-                        )
-                        if whitelist_pattern and not is_whitelisted_domain:
-                            log.debug(
-                                "SpiffyTitles: URL ignored due to domain whitelist"
-                                " mismatch: %s"
-                                % url
-                            )
-                            return
+                        if not self.is_url_allowed(request.url, channel):
+                            return (None, False)
                         text = self.get_title_by_url(request.url, channel)
-                        text = text.lstrip("\x02").lstrip("^").strip()
+                        if text:
+                            text = text.lstrip("\x02").lstrip("^").strip()
                         return (text, is_redirect)
                 # Check the content type
                 content_type = request.headers.get("content-type").split(";")[0].strip()
                 acceptable_types = self.registryValue("default.mimeTypes")
                 log.debug("SpiffyTitles: content type %s" % (content_type))
                 if content_type in acceptable_types:
-                    text = request.content
+                    text = self.get_title_from_response(request, channel)
                     if text:
-                        return (self.get_title_from_html(text, channel), is_redirect)
+                        return (text, is_redirect)
                     else:
                         log.debug("SpiffyTitles: empty content from %s" % (url))
                 else:
@@ -491,36 +1065,28 @@ class SpiffyTitles(callbacks.Plugin):
                         % (content_type, url)
                     )
                     size = request.headers.get("content-length")
+                    template_vars = self.get_media_info(request, content_type, channel)
+                    template_vars["type"] = content_type
+                    template_vars["size"] = None
                     if size:
-                        size = self.get_readable_file_size(int(size))
-                    file_template = self.registryValue(
-                        "default.fileTemplate", channel=channel
-                    )
-                    text = Template(file_template).render(
-                        {"type": content_type, "size": size}
-                    )
+                        template_vars["size"] = self.get_readable_file_size(int(size))
+                    file_template = self.get_template("default.fileTemplate", channel)
+                    text = file_template.render(template_vars)
                     return (text, is_redirect)
         except requests.exceptions.MissingSchema as e:
             url_wschema = "http://%s" % (url)
             log.error("SpiffyTitles missing schema. Retrying with %s" % (url_wschema))
-            info = urlparse(url_wschema)
-            if self.is_ignored_domain(info.netloc, channel):
-                return
+            if not self.is_url_allowed(url_wschema, channel):
+                return (None, False)
             else:
                 return self.get_source_by_url(url_wschema, channel)
-        except requests.exceptions.Timeout as e:
-            log.error("SpiffyTitles Timeout: %s" % (str(e)))
-            self.get_source_by_url(url, channel, retries + 1)
-        except requests.exceptions.ConnectionError as e:
-            log.error("SpiffyTitles ConnectionError: %s" % (str(e)))
-            self.get_source_by_url(url, channel, retries + 1)
         except requests.exceptions.HTTPError as e:
             log.error("SpiffyTitles HTTPError: %s" % (str(e)))
-            text = self.registryValue("badLinkText", channel=channel)
+            text = self.config.get(channel).badLinkText
             return (text, is_redirect)
         except requests.exceptions.InvalidURL as e:
             log.error("SpiffyTitles InvalidURL: %s" % (str(e)))
-            text = self.registryValue("badLinkText", channel=channel)
+            text = self.config.get(channel).badLinkText
             return (text, is_redirect)
         return (None, False)
 
@@ -552,7 +1118,7 @@ class SpiffyTitles(callbacks.Plugin):
         whether the message should be ignored.
         """
         match = False
-        pattern = self.registryValue("ignoredMessagePattern")
+        pattern = self.config.get(channel).ignoredMessagePattern
         if pattern:
             match = re.search(pattern, input)
         return match
@@ -563,7 +1129,7 @@ class SpiffyTitles(callbacks.Plugin):
         whether the title should be ignored.
         """
         match = False
-        pattern = self.registryValue("ignoredTitlePattern", channel=channel)
+        pattern = self.config.get(channel).ignoredTitlePattern
         if pattern:
             match = re.search(pattern, input)
             if match:
@@ -577,11 +1143,7 @@ class SpiffyTitles(callbacks.Plugin):
         """
         Find the first string that looks like a URL from the message
         """
-        url_re = self.registryValue("urlRegexp", channel)
-        if not url_re:
-            url_re = utils.web._httpUrlRe
-        matches = re.findall(url_re, input)
-        return matches
+        return self.config.get(channel).urlRegexp.findall(input)
 
     def remove_control_characters(self, s):
         return "".join(ch for ch in s if unicodedata.category(ch)[0] != "C")
@@ -589,7 +1151,7 @@ class SpiffyTitles(callbacks.Plugin):
     def user_has_capability(self, msg):
         channel = msg.args[0]
         mask = msg.prefix
-        required_capability = self.registryValue("requireCapability", channel=channel)
+        required_capability = self.config.get(channel).requireCapability
         cap = ircdb.makeChannelCapability(channel, required_capability)
         has_cap = ircdb.checkCapability(mask, cap, ignoreDefaultAllow=True)
         if has_cap:
@@ -616,18 +1178,16 @@ class SpiffyTitles(callbacks.Plugin):
 
     def get_template(self, handler_template, channel):
         """
-        Returns the requested template object.
+        Returns the requested template object, compiled once per distinct
+        template text.
         """
-        template = Template(self.registryValue(handler_template, channel=channel))
-        return template
+        return self.templates.get_registry(self, handler_template, channel)
 
     def handler_dailymotion(self, url, info, channel):
         """
         Handles dailymotion links
         """
-        dailymotion_handler_enabled = self.registryValue(
-            "dailymotion.enabled", channel=channel
-        )
+        dailymotion_handler_enabled = self.config.get(channel).dailymotion_enabled
         if not dailymotion_handler_enabled:
             return self.handler_default(url, channel)
         log.debug("SpiffyTitles: calling dailymotion handler for %s" % url)
@@ -647,7 +1207,7 @@ class SpiffyTitles(callbacks.Plugin):
         api_url = "https://api.dailymotion.com/video/%s?fields=%s" % (video_id, fields,)
         log.debug("SpiffyTitles: looking up dailymotion info: %s", api_url)
         try:
-            request = requests.get(api_url, timeout=self.timeout, proxies=self.proxies)
+            request = self.http.get(api_url, timeout=self.timeout)
             request.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -658,9 +1218,8 @@ class SpiffyTitles(callbacks.Plugin):
         response = json.loads(request.content.decode())
         if response and "title" in response:
             video = response
-            dailymotion_template = Template(
-                self.registryValue("dailymotion.template", channel=channel)
-            )
+            self.set_handler_metadata("dailymotion", video)
+            dailymotion_template = self.get_template("dailymotion.template", channel)
             video["views_total"] = "{:,}".format(int(video["views_total"]))
             video["duration"] = self.get_duration_from_seconds(video["duration"])
             video["ownerscreenname"] = video["owner.screenname"]
@@ -679,7 +1238,7 @@ class SpiffyTitles(callbacks.Plugin):
         """
         Handles Vimeo links
         """
-        vimeo_handler_enabled = self.registryValue("vimeo.enabled", channel=channel)
+        vimeo_handler_enabled = self.config.get(channel).vimeo_enabled
         if not vimeo_handler_enabled:
             return self.handler_default(url, channel)
         log.debug("SpiffyTitles: calling vimeo handler for %s" % url)
@@ -695,7 +1254,7 @@ class SpiffyTitles(callbacks.Plugin):
         api_url = "https://vimeo.com/api/v2/video/%s.json" % video_id
         log.debug("SpiffyTitles: looking up vimeo info: %s", api_url)
         try:
-            request = requests.get(api_url, timeout=self.timeout, proxies=self.proxies)
+            request = self.http.get(api_url, timeout=self.timeout)
             request.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -706,9 +1265,8 @@ class SpiffyTitles(callbacks.Plugin):
         response = json.loads(request.content.decode())
         if response and "title" in response[0]:
             video = response[0]
-            vimeo_template = Template(
-                self.registryValue("vimeo.template", channel=channel)
-            )
+            self.set_handler_metadata("vimeo", video)
+            vimeo_template = self.get_template("vimeo.template", channel)
             """
             Some videos do not have this information available
             """
@@ -738,7 +1296,7 @@ class SpiffyTitles(callbacks.Plugin):
         """
         Handles coub.com links
         """
-        coub_handler_enabled = self.registryValue("coub.enabled", channel=channel)
+        coub_handler_enabled = self.config.get(channel).coub_enabled
         if not coub_handler_enabled:
             return self.handler_default(url, channel)
         log.debug("SpiffyTitles: calling coub handler for %s" % url)
@@ -755,7 +1313,7 @@ class SpiffyTitles(callbacks.Plugin):
             return self.handler_default(url, channel)
         api_url = "http://coub.com/api/v2/coubs/%s" % video_id
         try:
-            request = requests.get(api_url, timeout=self.timeout, proxies=self.proxies)
+            request = self.http.get(api_url, timeout=self.timeout)
             request.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -766,7 +1324,8 @@ class SpiffyTitles(callbacks.Plugin):
         response = json.loads(request.content.decode())
         if response:
             video = response
-            coub_template = Template(self.registryValue("coub.template"))
+            self.set_handler_metadata("coub", video)
+            coub_template = self.get_template("coub.template", None)
             video["likes_count"] = "{:,}".format(int(video["likes_count"]))
             video["recoubs_count"] = "{:,}".format(int(video["recoubs_count"]))
             video["views_count"] = "{:,}".format(int(video["views_count"]))
@@ -806,7 +1365,7 @@ class SpiffyTitles(callbacks.Plugin):
         Uses the Youtube API to provide additional meta data about
         Youtube Video links posted.
         """
-        youtube_handler_enabled = self.registryValue("youtube.enabled", channel)
+        youtube_handler_enabled = self.config.get(channel).youtube_enabled
         if not youtube_handler_enabled:
             return self.handler_default(url, channel)
         developer_key = self.registryValue("youtube.developerKey")
@@ -823,34 +1382,14 @@ class SpiffyTitles(callbacks.Plugin):
                 "SpiffyTitles: Failed to get YouTube video ID for URL: {0}".format(url)
             )
             return self.handler_default(url, channel)
-        yt_template = Template(self.registryValue("youtube.template", channel))
+        yt_template = self.get_template("youtube.template", channel)
         title = ""
-        options = {
-            "part": "snippet,statistics,contentDetails",
-            "maxResults": 1,
-            "key": developer_key,
-            "id": video_id,
-        }
-        api_url = "https://www.googleapis.com/youtube/v3/videos"
-        log.debug("SpiffyTitles: requesting %s" % (api_url))
-        try:
-            request = requests.get(
-                api_url, params=options, timeout=self.timeout, proxies=self.proxies
-            )
-            request.raise_for_status()
-        except (
-            requests.exceptions.RequestException,
-            requests.exceptions.HTTPError,
-        ) as e:
-            log.error("SpiffyTitiles: YouTube Error: {0}".format(e))
-            return self.handler_default(url, channel)
-        response = json.loads(request.content.decode())
-        if not response or not response.get("items"):
-            log.error("SpiffyTitles: Failed to parse YouTube JSON response")
+        video = self.get_youtube_videos([video_id], wait=True).get(video_id)
+        if not video:
+            log.error("SpiffyTitles: Failed to get YouTube video %s" % (video_id))
             return self.handler_default(url, channel)
         try:
-            items = response["items"]
-            video = items[0]
+            self.set_handler_metadata("youtube", video)
             snippet = video["snippet"]
             title = snippet["title"]
             statistics = video["statistics"]
@@ -913,6 +1452,67 @@ class SpiffyTitles(callbacks.Plugin):
             log.debug("SpiffyTitles: falling back to default handler")
             return self.handler_default(url, channel)
 
+    def get_youtube_videos(self, video_ids, wait=False):
+        """
+        Returns a dict of video ID -> videos.list item. Lookups are served from
+        the YouTube metadata cache where possible and otherwise batched into
+        as few API calls as possible. If wait is set, the lookup waits for
+        youtube.batchWindow seconds so concurrent lookups can join it.
+        """
+        window = self.registryValue("youtube.batchWindow") if wait else 0
+        lifetimes = (
+            self.registryValue("youtube.metadataLifetime"),
+            self.registryValue("youtube.statisticsLifetime"),
+        )
+        return self.youtube.get_videos(video_ids, window, lifetimes, self.timeout * 2)
+
+    def fetch_youtube_videos(self, video_ids, parts):
+        """
+        Requests up to 50 videos in a single videos.list call
+        """
+        options = {
+            "part": ",".join(parts),
+            "maxResults": len(video_ids),
+            "key": self.registryValue("youtube.developerKey"),
+            "id": ",".join(video_ids),
+        }
+        api_url = "https://www.googleapis.com/youtube/v3/videos"
+        log.debug(
+            "SpiffyTitles: requesting %s for %s" % (api_url, ", ".join(video_ids))
+        )
+        try:
+            request = self.http.get(api_url, params=options, timeout=self.timeout)
+            request.raise_for_status()
+        except (
+            requests.exceptions.RequestException,
+            requests.exceptions.HTTPError,
+        ) as e:
+            log.error("SpiffyTitiles: YouTube Error: {0}".format(e))
+            raise
+        response = json.loads(request.content.decode())
+        if not response or "items" not in response:
+            log.error("SpiffyTitles: Failed to parse YouTube JSON response")
+            return {}
+        return {item["id"]: item for item in response["items"]}
+
+    def prefetch_youtube_videos(self, urls, channel):
+        """
+        Looks up the videos of all YouTube links in a message with one API call
+        """
+        if not self.config.get(channel).youtube_enabled:
+            return
+        if not self.registryValue("youtube.developerKey"):
+            return
+        video_ids = []
+        for url in urls:
+            info = urlparse(url)
+            if self.get_handler(info.netloc) == self.handler_youtube:
+                video_id = self.get_video_id_from_url(url, info)
+                if video_id:
+                    video_ids.append(video_id)
+        if len(video_ids) > 1:
+            self.get_youtube_videos(video_ids)
+
     def get_duration_from_seconds(self, duration_seconds):
         m, s = divmod(duration_seconds, 60)
         h, m = divmod(m, 60)
@@ -923,7 +1523,7 @@ class SpiffyTitles(callbacks.Plugin):
         return duration
 
     def get_youtube_logo(self, channel):
-        use_bold = self.registryValue("useBold", channel)
+        use_bold = self.config.get(channel).useBold
         if use_bold:
             yt_logo = "{0}\x0F\x02".format(self.registryValue("youtube.logo", channel))
         else:
@@ -980,16 +1580,17 @@ class SpiffyTitles(callbacks.Plugin):
         Queries twitch API for additional information about twitch links.
         This handler is for (www.)twitch.tv
         """
-        twitch_handler_enabled = self.registryValue("twitch.enabled", channel=channel)
+        twitch_handler_enabled = self.config.get(channel).twitch_enabled
         if not twitch_handler_enabled:
             return self.handler_default(url, channel)
         twitch_client_id = self.registryValue("twitch.clientID")
         if not twitch_client_id:
             log.error("SpiffyTitles: Please set your Twitch client ID")
             return self.handler_default(url, channel)
-        access_token = self.registryValue("twitch.accessToken")
-        if not access_token:
-            log.error("SpiffyTitles: Please set your Twitch Access Token")
+        if not self.registryValue("twitch.clientSecret") and not self.registryValue(
+            "twitch.accessToken"
+        ):
+            log.error("SpiffyTitles: Please set your Twitch Client Secret")
             return self.handler_default(url, channel)
         url = url.split("?")[0]
         self.log.debug("SpiffyTitles: calling twitch handler for %s" % (url))
@@ -997,17 +1598,20 @@ class SpiffyTitles(callbacks.Plugin):
             "video": {
                 "pattern": r"^http(s)?:\/\/(www\.|go\.|player\.)?twitch\.tv\/"
                 r"(videos/|\?video=v)(?P<video_id>[0-9]+)",
-                "url": "https://api.twitch.tv/helix/videos?id={video_id}",
+                "endpoint": "videos",
+                "param": ("id", "video_id"),
             },
             "clip": {
                 "pattern": r"(http(s)?:\/\/clips\.twitch\.tv\/|http(s)?:\/\/"
                 r"www\.twitch\.tv\/([^\/]+)\/clip\/)(?P<clip>.+)$",
-                "url": "https://api.twitch.tv/helix/clips?id={clip}",
+                "endpoint": "clips",
+                "param": ("id", "clip"),
             },
             "channel": {
                 "pattern": r"^http(s)?:\/\/(www\.|go\.)?twitch\.tv\/"
                 r"(?P<channel_name>[^\/]+)",
-                "url": "https://api.twitch.tv/helix/streams?user_login={channel_name}",
+                "endpoint": "streams",
+                "param": ("user_login", "channel_name"),
             },
         }
         for name in patterns:
@@ -1015,79 +1619,57 @@ class SpiffyTitles(callbacks.Plugin):
             if match:
                 link_type = name
                 link_info = match.groupdict()
-                data_url = patterns[name]["url"].format(**link_info)
+                endpoint = patterns[name]["endpoint"]
+                (param, group) = patterns[name]["param"]
                 break
         if not match:
             self.log.debug("SpiffyTitles: twitch - no title found.")
             return self.handler_default(url, channel)
-        bearer = "Bearer {}".format(access_token.strip())
-        headers = {"Client-ID": twitch_client_id, "Authorization": bearer}
-        self.log.debug("SpiffyTitles: twitch - requesting %s" % (data_url))
-        try:
-            request = requests.get(
-                data_url, timeout=self.timeout, headers=headers, proxies=self.proxies
-            )
-            request.raise_for_status()
-        except (
-            requests.exceptions.RequestException,
-            requests.exceptions.HTTPError,
-        ) as e:
-            log.error("SpiffytTitles: Twitch Error: {0}".format(e))
-            return self.handler_default(url, channel)
-        data = {}
+        user_lifetime = self.registryValue("twitch.userLifetime")
+        game_lifetime = self.registryValue("twitch.gameLifetime")
+        self.log.debug("SpiffyTitles: twitch - requesting %s" % (endpoint))
         try:
-            response = json.loads(request.content.decode())
-        except:
-            response = None
-        if not response:
-            log.error("SpiffyTitles: Error parsing Twitch.TV JSON response")
-            return self.handler_default(url, channel)
-        self.log.debug("SpiffyTitles: twitch - got response:\n%s" % (response))
-        if "error" in response:
-            log.error("SpiffyTitles: Twitch Error: {0}".format(response["error"]))
-            return self.handler_default(url, channel)
-        if link_type == "channel":
-            self.log.debug("SpiffyTitles: Twitch: link_type is channel")
-            if "data" in response and response["data"]:
-                self.log.debug("SpiffyTitles: Twitch: Got data[0]")
-                data = response["data"][0]
-                link_type = "stream"
-            else:
-                self.log.debug("SpiffyTitles: Twitch: No data[0]")
-            data_url = "https://api.twitch.tv/helix/users?login={channel_name}".format(
-                **link_info
+            response = self.twitch.helix(
+                endpoint, [(param, link_info[group])], self.timeout
             )
-            try:
-                request = requests.get(
-                    data_url,
-                    timeout=self.timeout,
-                    headers=headers,
-                    proxies=self.proxies,
+            data = response[0] if response else {}
+            user = {}
+            game_name = None
+            # Streams, videos and clips carry the user ID, and streams the game
+            # name too, so usually only the first request misses the caches.
+            if link_type == "channel":
+                login = link_info["channel_name"].lower()
+                if data:
+                    link_type = "stream"
+                    self.twitch.add_game(
+                        data["game_id"], data.get("game_name"), game_lifetime
+                    )
+                    users = self.twitch.get_users(
+                        ids=[data["user_id"]],
+                        lifetime=user_lifetime,
+                        timeout=self.timeout,
+                    )
+                    user = users.get(("id", data["user_id"]), {})
+                else:
+                    users = self.twitch.get_users(
+                        logins=[login], lifetime=user_lifetime, timeout=self.timeout
+                    )
+                    user = users.get(("login", login), {})
+            elif data:
+                user_id = data.get("user_id") or data.get("broadcaster_id")
+                users = self.twitch.get_users(
+                    ids=[user_id], lifetime=user_lifetime, timeout=self.timeout
                 )
-                request.raise_for_status()
-            except (
-                requests.exceptions.RequestException,
-                requests.exceptions.HTTPError,
-            ) as e:
-                log.error("SpiffyTitles: Twitch Error: {0}".format(e))
-                return self.handler_default(url, channel)
-            user_data = {}
-            try:
-                response = json.loads(request.content.decode())
-                user_data = response["data"][0]
-                display_name = user_data["display_name"]
-                description = user_data["description"]
-                view_count = user_data["view_count"]
-            except Exception as e:
-                log.error(
-                    "SpiffyTitles: KeyError parsing Twitch.TV JSON response: %s"
-                    % (str(e))
+                user = users.get(("id", user_id), {})
+            if data.get("game_id"):
+                games = self.twitch.get_games(
+                    [data["game_id"]], lifetime=game_lifetime, timeout=self.timeout
                 )
-        elif link_type == "video":
-            data = response
-        elif link_type == "clip":
-            data = response
-        if not data and not user_data:
+                game_name = games.get(data["game_id"], data["game_id"])
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            log.error("SpiffyTitles: Twitch Error: {0}".format(e))
+            return self.handler_default(url, channel)
+        if not data and not user:
             log.error("SpiffyTitles: Twitch: Failed to get data from Twitch API")
             return self.handler_default(url, channel)
         log.debug("SpiffyTitles: twitch - Got data '%s'" % (data))
@@ -1099,138 +1681,61 @@ class SpiffyTitles(callbacks.Plugin):
             self.log.debug("SpiffyTitles - twitch: bad template for %s" % (link_type))
             log.error("SpiffyTitles: Twitch: Got data, but template was bad")
             return self.handler_default(url, channel)
-        if link_type == "stream":
-            display_name = data["user_name"]
-            game_id = data["game_id"]
-            game_name = game_id
-            title = data["title"]
-            view_count = data["viewer_count"]
-            created_at = self._time_created_at(data["started_at"])
-            if game_id:
-                get_game = requests.get(
-                    "https://api.twitch.tv/helix/games?id={}".format(game_id),
-                    timeout=self.timeout,
-                    headers=headers,
-                    proxies=self.proxies,
-                )
-                game_data = json.loads(get_game.content.decode())
-                game_name = game_data["data"][0]["name"]
-            template_vars = {
-                "display_name": display_name,
-                "game_name": game_name,
-                "title": title,
-                "view_count": view_count,
-                "description": description,
-                "created_at": created_at,
-                "twitch_logo": twitch_logo,
-            }
-            reply = twitch_template.render(template_vars)
-        elif link_type == "clip":
-            data = response["data"][0]
-            display_name = data["broadcaster_name"]
-            data_url = "https://api.twitch.tv/helix/users?login={}".format(display_name)
-            try:
-                request = requests.get(
-                    data_url,
-                    timeout=self.timeout,
-                    headers=headers,
-                    proxies=self.proxies,
-                )
-                request.raise_for_status()
-            except (
-                requests.exceptions.RequestException,
-                requests.exceptions.HTTPError,
-            ) as e:
-                log.error("SpiffyTitles: Twitch Error: {0}".format(e))
-                return self.handler_default(url, channel)
-            user_data = {}
-            try:
-                response = json.loads(request.content.decode())
-                user_data = response["data"][0]
-                description = user_data["description"]
-                game_id = data["game_id"]
-                game_name = game_id
-                title = data["title"]
-                view_count = data["view_count"]
-                created_at = self._time_created_at(data["created_at"])
-                if game_id:
-                    get_game = requests.get(
-                        "https://api.twitch.tv/helix/games?id={}".format(game_id),
-                        timeout=self.timeout,
-                        headers=headers,
-                        proxies=self.proxies,
-                    )
-                    game_data = json.loads(get_game.content.decode())
-                    game_name = game_data["data"][0]["name"]
+        description = user.get("description")
+        try:
+            if link_type == "stream":
                 template_vars = {
-                    "display_name": display_name,
+                    "display_name": data["user_name"],
                     "game_name": game_name,
-                    "title": title,
-                    "view_count": view_count,
+                    "title": data["title"],
+                    "view_count": data["viewer_count"],
                     "description": description,
-                    "created_at": created_at,
+                    "created_at": self._time_created_at(data["started_at"]),
                     "twitch_logo": twitch_logo,
                 }
-                reply = twitch_template.render(template_vars)
-            except Exception as e:
-                self.log.error(
-                    "SpiffyTitles: Error parsing Twitch.TV JSON response: %s" % (str(e))
-                )
-        elif link_type == "video":
-            data = response["data"][0]
-            display_name = data["user_name"]
-            data_url = "https://api.twitch.tv/helix/users?login={}".format(display_name)
-            try:
-                request = requests.get(
-                    data_url,
-                    timeout=self.timeout,
-                    headers=headers,
-                    proxies=self.proxies,
-                )
-            except (
-                requests.exceptions.RequestException,
-                requests.exceptions.HTTPError,
-            ) as e:
-                log.error("SpiffyTitles: Twitch Error: {0}".format(e))
-                return self.handler_default(url, channel)
-            user_data = {}
-            try:
-                response = json.loads(request.content.decode())
-                user_data = response["data"][0]
-                description = user_data["description"]
-                title = data["title"]
-                view_count = data["view_count"]
-                created_at = self._time_created_at(data["created_at"])
-                duration = data["duration"]
+            elif link_type == "clip":
                 template_vars = {
-                    "display_name": display_name,
-                    "title": title,
-                    "view_count": view_count,
-                    "created_at": created_at,
+                    "display_name": data["broadcaster_name"],
+                    "game_name": game_name,
+                    "title": data["title"],
+                    "view_count": data["view_count"],
                     "description": description,
-                    "duration": duration,
+                    "created_at": self._time_created_at(data["created_at"]),
                     "twitch_logo": twitch_logo,
                 }
-                reply = twitch_template.render(template_vars)
-            except Exception as e:
-                self.log.error(
-                    "SpiffyTitles: Error parsing Twitch.TV JSON response: %s" % (str(e))
-                )
-        else:
-            try:
+            elif link_type == "video":
                 template_vars = {
-                    "display_name": display_name,
+                    "display_name": data["user_name"],
+                    "title": data["title"],
+                    "view_count": data["view_count"],
+                    "created_at": self._time_created_at(data["created_at"]),
                     "description": description,
-                    "view_count": view_count,
+                    "duration": data["duration"],
                     "twitch_logo": twitch_logo,
                 }
-                reply = twitch_template.render(template_vars)
-            except Exception as e:
-                self.log.error(
-                    "SpiffyTitles: Error parsing Twitch.TV JSON response: %s" % (str(e))
-                )
+            else:
+                template_vars = {
+                    "display_name": user["display_name"],
+                    "description": description,
+                    "view_count": user.get("view_count"),
+                    "twitch_logo": twitch_logo,
+                }
+            reply = twitch_template.render(template_vars)
+        except KeyError as e:
+            self.log.error(
+                "SpiffyTitles: Error parsing Twitch.TV JSON response: %s" % (str(e))
+            )
+            return self.handler_default(url, channel)
+        self.set_handler_metadata("twitch", {"type": link_type, "data": data})
         return reply
 
+    def get_twitch_credentials(self):
+        return (
+            self.registryValue("twitch.clientID"),
+            self.registryValue("twitch.clientSecret"),
+            self.registryValue("twitch.accessToken"),
+        )
+
     def _time_created_at(self, s):
         """
         Return relative time delta between now and s (dt string).
@@ -1257,7 +1762,7 @@ class SpiffyTitles(callbacks.Plugin):
         return rel_time
 
     def get_twitch_logo(self, channel):
-        use_bold = self.registryValue("useBold", channel)
+        use_bold = self.config.get(channel).useBold
         if use_bold:
             twitch_logo = "{0}\x0F\x02".format(
                 self.registryValue("twitch.logo", channel)
@@ -1271,7 +1776,7 @@ class SpiffyTitles(callbacks.Plugin):
         Handles imdb.com links, querying the OMDB API for additional info
         Typical IMDB URL: http://www.imdb.com/title/tt2467372/
         """
-        if not self.registryValue("imdb.enabled", channel=channel):
+        if not self.config.get(channel).imdb_enabled:
             log.debug(
                 "SpiffyTitles: IMDB handler disabled. Falling back to default handler."
             )
@@ -1293,9 +1798,7 @@ class SpiffyTitles(callbacks.Plugin):
         omdb_url = "http://www.omdbapi.com/"
         options = {"apikey": apikey, "i": imdb_id, "r": "json", "plot": "short"}
         try:
-            request = requests.get(
-                omdb_url, params=options, timeout=self.timeout, proxies=self.proxies
-            )
+            request = self.http.get(omdb_url, params=options, timeout=self.timeout)
             request.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -1304,7 +1807,7 @@ class SpiffyTitles(callbacks.Plugin):
             log.error("SpiffyTitles OMDB Error: %s" % (str(e)))
         try:
             response = json.loads(request.content.decode())
-            imdb_template = Template(self.registryValue("imdb.template"))
+            imdb_template = self.get_template("imdb.template", None)
             if "Error" in response or response["Response"] != "True":
                 response = None
         except:
@@ -1314,7 +1817,8 @@ class SpiffyTitles(callbacks.Plugin):
             )
             response = None
         if response:
-            imdb_template = Template(self.registryValue("imdb.template"))
+            self.set_handler_metadata("imdb", response)
+            imdb_template = self.get_template("imdb.template", None)
             meta = None
             tomato = None
             for rating in response["Ratings"]:
@@ -1355,7 +1859,7 @@ class SpiffyTitles(callbacks.Plugin):
             return self.handler_default(url, channel)
 
     def get_imdb_logo(self, channel):
-        use_bold = self.registryValue("useBold", channel)
+        use_bold = self.config.get(channel).useBold
         if use_bold:
             imdb_logo = "{0}\x0F\x02".format(self.registryValue("imdb.logo", channel))
         else:
@@ -1366,9 +1870,7 @@ class SpiffyTitles(callbacks.Plugin):
         """
         Queries wikipedia API for article extracts.
         """
-        wikipedia_handler_enabled = self.registryValue(
-            "wikipedia.enabled", channel=channel
-        )
+        wikipedia_handler_enabled = self.config.get(channel).wikipedia_enabled
         if not wikipedia_handler_enabled:
             return self.handler_default(url, channel)
         self.log.debug("SpiffyTitles: calling Wikipedia handler for %s" % (url))
@@ -1407,9 +1909,7 @@ class SpiffyTitles(callbacks.Plugin):
         extract = ""
         self.log.debug("SpiffyTitles: requesting %s" % (api_url))
         try:
-            request = requests.get(
-                api_url, params=api_params, timeout=self.timeout, proxies=self.proxies
-            )
+            request = self.http.get(api_url, params=api_params, timeout=self.timeout)
             request.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -1435,10 +1935,8 @@ class SpiffyTitles(callbacks.Plugin):
                 extract = (
                     extract[: max_chars - 3].rsplit(" ", 1)[0].rstrip(",.") + "..."
                 )
-            extract_template = self.registryValue(
-                "wikipedia.extractTemplate", channel=channel
-            )
-            wikipedia_template = Template(extract_template)
+            self.set_handler_metadata("wikipedia", response)
+            wikipedia_template = self.get_template("wikipedia.extractTemplate", channel)
             return wikipedia_template.render({"extract": extract})
         else:
             self.log.debug("SpiffyTitles: falling back to default handler")
@@ -1448,7 +1946,7 @@ class SpiffyTitles(callbacks.Plugin):
         """
         Queries wikipedia API for article extracts.
         """
-        reddit_handler_enabled = self.registryValue("reddit.enabled", channel=channel)
+        reddit_handler_enabled = self.config.get(channel).reddit_enabled
         if not reddit_handler_enabled:
             return self.handler_default(url, channel)
         self.log.debug("SpiffyTitles: calling reddit handler for %s" % (url))
@@ -1485,9 +1983,7 @@ class SpiffyTitles(callbacks.Plugin):
         self.log.debug("SpiffyTitles: requesting %s" % (data_url))
         headers = {"User-Agent": self.get_user_agent()}
         try:
-            request = requests.get(
-                data_url, headers=headers, timeout=self.timeout, proxies=self.proxies
-            )
+            request = self.http.get(data_url, headers=headers, timeout=self.timeout)
             request.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -1534,10 +2030,9 @@ class SpiffyTitles(callbacks.Plugin):
                     extract = data.get("selftext", "")
             if link_type == "comment":
                 extract = data.get("body", "")
-            link_type_template = self.registryValue(
-                "reddit." + link_type + "Template", channel=channel
+            reddit_template = self.get_template(
+                "reddit." + link_type + "Template", channel
             )
-            reddit_template = Template(link_type_template)
             template_vars = {
                 "id": data.get("id", ""),
                 "user": data.get("name", ""),
@@ -1567,6 +2062,7 @@ class SpiffyTitles(callbacks.Plugin):
                         + "..."
                     )
             template_vars["extract"] = extract
+            self.set_handler_metadata("reddit", data)
             reply = reddit_template.render(template_vars)
             return reply
         else:
@@ -1603,7 +2099,7 @@ class SpiffyTitles(callbacks.Plugin):
         imgur provides the following information about albums:
         https://api.imgur.com/models/album
         """
-        if not self.registryValue("imgur.enabled", channel=channel):
+        if not self.config.get(channel).imgur_enabled:
             return self.handler_default(url, channel)
         client_id = self.registryValue("imgur.clientID")
         if not client_id:
@@ -1623,9 +2119,7 @@ class SpiffyTitles(callbacks.Plugin):
         headers = {"Authorization": "Client-ID {0}".format(client_id)}
         api_url = "https://api.imgur.com/3/album/{0}".format(album_id)
         try:
-            request = requests.get(
-                api_url, headers=headers, timeout=self.timeout, proxies=self.proxies
-            )
+            request = self.http.get(api_url, headers=headers, timeout=self.timeout)
             request.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -1637,8 +2131,8 @@ class SpiffyTitles(callbacks.Plugin):
         album = json.loads(request.content.decode())
         album = album.get("data")
         if album:
-            album_template = self.registryValue("imgur.albumTemplate", channel=channel)
-            imgur_album_template = Template(album_template)
+            self.set_handler_metadata("imgur", album)
+            imgur_album_template = self.get_template("imgur.albumTemplate", channel)
             compiled_template = imgur_album_template.render(
                 {
                     "title": album.get("title"),
@@ -1660,7 +2154,7 @@ class SpiffyTitles(callbacks.Plugin):
         Used for both direct images and imgur.com/some_image_id_here type links, as
         they're both single images.
         """
-        if not self.registryValue("imgur.enabled", channel=channel):
+        if not self.config.get(channel).imgur_enabled:
             return self.handler_default(url, channel)
         client_id = self.registryValue("imgur.clientID")
         if not client_id:
@@ -1683,9 +2177,7 @@ class SpiffyTitles(callbacks.Plugin):
         headers = {"Authorization": "Client-ID {0}".format(client_id)}
         api_url = "https://api.imgur.com/3/image/{0}".format(image_id)
         try:
-            request = requests.get(
-                api_url, headers=headers, timeout=self.timeout, proxies=self.proxies
-            )
+            request = self.http.get(api_url, headers=headers, timeout=self.timeout)
             request.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -1701,10 +2193,8 @@ class SpiffyTitles(callbacks.Plugin):
             log.error("SpiffyTitles: Error reading imgur JSON response")
             image = None
         if image:
-            channel_template = self.registryValue(
-                "imgur.imageTemplate", channel=channel
-            )
-            imgur_template = Template(channel_template)
+            self.set_handler_metadata("imgur", image)
+            imgur_template = self.get_template("imgur.imageTemplate", channel)
             readable_file_size = self.get_readable_file_size(image["size"])
             compiled_template = imgur_template.render(
                 {
@@ -1727,13 +2217,13 @@ class SpiffyTitles(callbacks.Plugin):
             return self.handler_default(url, channel)
 
     def handler_twitter(self, url, info, channel):
-        if not self.registryValue("twitter.enabled", channel):
+        if not self.config.get(channel).twitter_enabled:
             return self.handler_default(url, channel)
         api_url = "https://publish.twitter.com/oembed?url={0}&omit_script=True".format(
             url
         )
         try:
-            request = requests.get(api_url, timeout=self.timeout, proxies=self.proxies)
+            request = self.http.get(api_url, timeout=self.timeout)
             request.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -1747,10 +2237,11 @@ class SpiffyTitles(callbacks.Plugin):
         except:
             log.error("SpiffyTitles: Error reading Twitter JSON response")
             return self.handler_default(url, channel)
+        self.set_handler_metadata("twitter", response)
         results = {}
         soup = BeautifulSoup(response["html"])
         results["text"] = soup.text.replace("—", " - ").strip()
-        template = Template(self.registryValue("twitter.template", channel))
+        template = self.get_template("twitter.template", channel)
         title = template.render(results).strip()
         if title:
             return title
@@ -1774,5 +2265,98 @@ class SpiffyTitles(callbacks.Plugin):
 
     t = wrap(t, ["text"])
 
+    def cachestats(self, irc, msg, args):
+        """takes no arguments
+
+        Shows link cache size, hit rate, eviction and revalidation counters.
+        """
+        stats = self.link_cache.stats()
+        irc.reply(
+            "Link cache: {0} entries ({1} of {2}) :: {3} hits, {4} misses ({5:.1%}"
+            " hit rate) :: {6} evictions, {7} expirations :: {8} shared lookups ::"
+            " {9} revalidations".format(
+                stats["entries"],
+                self.get_readable_file_size(stats["bytes"]),
+                self.get_readable_file_size(stats["max_bytes"]),
+                stats["hits"],
+                stats["misses"],
+                stats["hit_rate"],
+                stats["evictions"],
+                stats["expirations"],
+                self.single_flight.shared,
+                self.revalidations,
+            )
+        )
+
+    cachestats = wrap(cachestats, ["owner"])
+
+    def poolstats(self, irc, msg, args):
+        """takes no arguments
+
+        Shows requests made and connections opened for each host with an open
+        keep-alive session, and the hosts currently refused by the circuit breaker.
+        """
+        stats = self.http.stats()
+        open_hosts = self.http.breaker.open_hosts()
+        if not stats and not open_hosts:
+            irc.reply("No open sessions.")
+            return
+        hosts = []
+        for (host, (requests_made, connections)) in sorted(
+            stats.items(), key=lambda item: -item[1][0]
+        ):
+            hosts.append(
+                "{0}: {1} requests, {2} connections".format(
+                    host, requests_made, connections
+                )
+            )
+        if open_hosts:
+            hosts.append("Circuit open: {0}".format(", ".join(open_hosts)))
+        irc.replies(hosts, joiner=" :: ")
+
+    poolstats = wrap(poolstats, ["owner"])
+
+    def stats(self, irc, msg, args):
+        """takes no arguments
+
+        Shows calls, cache hits, errors, bytes downloaded and median and 99th
+        percentile latency for each handler. Calls that found no title count
+        as errors.
+        """
+
+        def format_bound(seconds):
+            # Latencies are only known to the histogram bucket they fell in
+            if seconds == float("inf"):
+                return "> {0}s".format(LATENCY_BUCKETS[-2])
+            return "<= {0}s".format(seconds)
+
+        snapshot = self.metrics.snapshot()
+        if not snapshot:
+            irc.reply("No links looked up yet.")
+            return
+        handlers = []
+        for (name, stats) in sorted(
+            snapshot.items(), key=lambda item: -item[1].calls
+        ):
+            latency = ""
+            if stats.calls:
+                latency = ", p50 {0}, p99 {1}".format(
+                    format_bound(stats.get_quantile(0.5)),
+                    format_bound(stats.get_quantile(0.99)),
+                )
+            handlers.append(
+                "{0}: {1} calls, {2} cache hits, {3} errors, {4}{5}".format(
+                    name,
+                    stats.calls,
+                    stats.cache_hits,
+                    stats.errors,
+                    self.get_readable_file_size(stats.bytes),
+                    latency,
+                )
+            )
+        irc.replies(handlers, joiner=" :: ")
+
+    stats = wrap(stats, ["owner"])
+
 
 Class = SpiffyTitles
@@ -0,0 +1,155 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+pool: keep-alive HTTP sessions shared by all handlers, one per host.
+"""
+
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of making a request to a host whose circuit is open
+    """
+
+
+class SessionPool:
+    """
+    Hands out one requests.Session per scheme and host so that repeated calls
+    to the same API reuse open connections instead of redoing the TCP and TLS
+    handshakes. The least recently used sessions are closed once more than
+    max_hosts are open. If a CircuitBreaker is given, requests to hosts that
+    keep failing are refused with CircuitOpenError. If on_response is given, it
+    is called with every response before it is returned.
+    """
+
+    def __init__(
+        self, proxies=None, max_hosts=32, max_size=4, breaker=None, on_response=None
+    ):
+        self.proxies = {k: v for (k, v) in (proxies or {}).items() if v}
+        self.max_hosts = max_hosts
+        self.max_size = max_size
+        self.breaker = breaker
+        self.on_response = on_response
+        self._sessions = OrderedDict()
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    def get_host(self, url):
+        info = urlparse(url)
+        return "{0}://{1}".format(info.scheme.lower(), info.netloc.lower())
+
+    def get_session(self, url):
+        """
+        Returns the session for the host of url, creating it if needed
+        """
+        host = self.get_host(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._create_session()
+                self._sessions[host] = session
+                while len(self._sessions) > self.max_hosts:
+                    (old_host, old_session) = self._sessions.popitem(last=False)
+                    old_session.close()
+            self._sessions.move_to_end(host)
+            self._requests[host] = self._requests.get(host, 0) + 1
+        return session
+
+    def request(self, method, url, **kwargs):
+        response = self._request(method, url, **kwargs)
+        if self.on_response:
+            self.on_response(response)
+        return response
+
+    def _request(self, method, url, **kwargs):
+        if not self.breaker:
+            return self.get_session(url).request(method, url, **kwargs)
+        host = self.get_host(url)
+        if not self.breaker.allow(host):
+            raise CircuitOpenError("Circuit open for {0}".format(host))
+        try:
+            response = self.get_session(url).request(method, url, **kwargs)
+        except Exception:
+            # Count every error, so a failed half-open trial reopens the circuit
+            # instead of leaving the host half-open for good
+            self.breaker.failure(host)
+            raise
+        if response.status_code >= 500:
+            self.breaker.failure(host)
+        else:
+            self.breaker.success(host)
+        return response
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("allow_redirects", True)
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault("allow_redirects", False)
+        return self.request("HEAD", url, **kwargs)
+
+    def stats(self):
+        """
+        Returns a dict of host -> (requests, connections opened) for the open
+        sessions. Every request beyond the connection count reused a connection.
+        """
+        stats = {}
+        with self._lock:
+            for (host, session) in self._sessions.items():
+                connections = 0
+                for adapter in session.adapters.values():
+                    pools = adapter.poolmanager.pools
+                    for key in pools.keys():
+                        pool = pools.get(key)
+                        if pool is not None:
+                            connections += pool.num_connections
+                stats[host] = (self._requests.get(host, 0), connections)
+        return stats
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def _create_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.proxies.update(self.proxies)
+        return session
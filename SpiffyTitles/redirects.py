@@ -0,0 +1,94 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+redirects: resolves short links to their target URL and caches the result.
+"""
+
+from urllib.parse import urljoin
+
+from .cache import LinkCache, normalize_url
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+
+class RedirectResolver:
+    """
+    Follows the redirect chain of a link one hop at a time with HEAD requests,
+    falling back to a GET that is closed before its body is read for servers
+    that reject HEAD. Resolved chains are cached, so a short link that is
+    posted again costs no requests at all.
+    """
+
+    def __init__(self, http, max_entries=1000):
+        self.http = http
+        self.cache = LinkCache(max_entries, 0)
+        self.requests = 0
+
+    def resolve(self, url, max_hops=5, lifetime=604800, follow=None, **kwargs):
+        """
+        Returns (target, hops): the URL the redirects of url lead to, or the
+        last URL reached after max_hops, and the number of redirects followed.
+        If given, follow(url) decides whether the redirects of a URL reached
+        along the way are followed too. Keyword arguments are passed on to the
+        requests.
+        """
+        key = normalize_url(url)
+        entry = self.cache.get(key)
+        if entry:
+            return (entry["target"], entry["hops"])
+        target = url
+        hops = 0
+        while hops < max_hops and not (hops and follow and not follow(target)):
+            location = self.get_location(target, **kwargs)
+            if not location:
+                break
+            target = urljoin(target, location)
+            hops += 1
+        self.cache.set(key, {"target": target, "hops": hops}, lifetime)
+        return (target, hops)
+
+    def get_location(self, url, **kwargs):
+        """
+        Returns the Location of a redirect response to url, or None
+        """
+        response = self.http.head(url, allow_redirects=False, **kwargs)
+        self.requests += 1
+        if response.status_code in (400, 403, 405, 501):
+            # HEAD not supported; only the status line and headers are read
+            with self.http.get(url, allow_redirects=False, stream=True, **kwargs) as r:
+                response = r
+            self.requests += 1
+        if response.status_code in REDIRECT_CODES:
+            return response.headers.get("location")
+        return None
+
+    def stats(self):
+        return self.cache.stats()
@@ -0,0 +1,125 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+store: persistent SQLite title cache that survives restarts and reloads.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    channel TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    handler TEXT NOT NULL,
+    metadata TEXT,
+    origin TEXT,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (channel, url)
+);
+CREATE INDEX IF NOT EXISTS titles_expires ON titles (expires);
+"""
+
+
+class TitleStore:
+    """
+    Stores rendered titles and the raw handler metadata behind them, keyed like
+    the in-memory link cache. Rows carry an absolute expiry time so the
+    lifetime can differ per handler.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filename, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def get(self, key, now=None):
+        """
+        Returns the stored row for key as a dict, or None if missing or expired
+        """
+        now = now or time.time()
+        (channel, url) = key
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM titles WHERE channel = ? AND url = ? AND expires > ?",
+                (channel, url, now),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        if entry["metadata"]:
+            try:
+                entry["metadata"] = json.loads(entry["metadata"])
+            except ValueError:
+                entry["metadata"] = None
+        return entry
+
+    def set(self, key, title, handler, metadata, lifetime, origin=None, now=None):
+        """
+        Stores a title for lifetime seconds, replacing any previous row
+        """
+        now = now or time.time()
+        (channel, url) = key
+        if metadata is not None:
+            metadata = json.dumps(metadata, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO titles (channel, url, title, handler,"
+                " metadata, origin, created, expires) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (channel, url, title, handler, metadata, origin, now, now + lifetime),
+            )
+            self._conn.commit()
+
+    def vacuum(self, now=None):
+        """
+        Deletes expired rows and returns how many were removed
+        """
+        now = now or time.time()
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM titles WHERE expires <= ?", (now,))
+            self._conn.commit()
+            # Let the WAL file shrink back once the deletions are checkpointed
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
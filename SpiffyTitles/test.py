@@ -0,0 +1,544 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+import io
+import struct
+import threading
+import time
+
+import requests
+
+from supybot.test import *
+
+from .breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from .cache import LinkCache, SingleFlight, normalize_url
+from .domains import HANDLER, IGNORED, build_domain_index, get_host
+from .extract import extract_title, get_charset
+from .media import probe, read_head
+from .redirects import RedirectResolver
+from .store import TitleStore
+
+
+def chunked(data, size=16):
+    """
+    Yields data in chunks, recording how many were taken
+    """
+    chunked.taken = 0
+    for i in range(0, len(data), size):
+        chunked.taken += 1
+        yield data[i : i + size]
+
+
+class LinkCacheTestCase(SupyTestCase):
+    def testNormalizeUrl(self):
+        self.assertEqual(normalize_url("HTTP://Example.COM:80"), "http://example.com/")
+        self.assertEqual(
+            normalize_url("https://example.com:443/A?b=C"), "https://example.com/A?b=C"
+        )
+        self.assertEqual(
+            normalize_url("https://example.com:8443/"), "https://example.com:8443/"
+        )
+
+    def testLru(self):
+        cache = LinkCache(max_entries=2, max_bytes=0)
+        cache.set("a", {"title": "A"}, 60)
+        cache.set("b", {"title": "B"}, 60)
+        # Reading a makes b the least recently used entry
+        self.assertEqual(cache.get("a")["title"], "A")
+        cache.set("c", {"title": "C"}, 60)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a")["title"], "A")
+        self.assertEqual(cache.get("c")["title"], "C")
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        cache.resize(1, 0)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNone(cache.get("a"))
+
+    def testMaxBytes(self):
+        cache = LinkCache(max_entries=0, max_bytes=4096)
+        for i in range(100):
+            cache.set(("#test", str(i)), {"title": "x" * 100}, 60)
+        self.assertLessEqual(cache.stats()["bytes"], 4096)
+        self.assertGreater(len(cache), 0)
+        self.assertIsNotNone(cache.get(("#test", "99")))
+        self.assertIsNone(cache.get(("#test", "0")))
+
+    def testTtl(self):
+        cache = LinkCache()
+        now = 1000.0
+        cache.set("a", {"title": "A"}, 10, now=now)
+        cache.set("b", {"title": "B"}, 20, now=now)
+        self.assertIsNotNone(cache.get("a", now=now + 9))
+        self.assertIsNone(cache.get("a", now=now + 10))
+        self.assertIsNotNone(cache.get("b", now=now + 10))
+        # Replacing an entry gives it a new lifetime
+        cache.set("b", {"title": "B2"}, 20, now=now + 10)
+        self.assertEqual(cache.get("b", now=now + 25)["title"], "B2")
+        cache.sweep(now=now + 30)
+        self.assertEqual(len(cache), 0)
+        stats = cache.stats()
+        self.assertEqual(stats["expirations"], 2)
+        self.assertEqual(stats["bytes"], 0)
+
+    def testSingleFlight(self):
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return "title"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", fetch)))
+        leader.start()
+        started.wait()
+        results.append(flight.do("k", fetch))
+        leader.join()
+        self.assertEqual(results, ["title", "title"])
+        self.assertEqual(calls, [1])
+        self.assertEqual(flight.shared, 1)
+
+
+class CircuitBreakerTestCase(SupyTestCase):
+    def testTransitions(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        now = 1000.0
+        self.assertTrue(breaker.allow("h", now=now))
+        breaker.failure("h", now=now)
+        self.assertEqual(breaker.state("h"), CLOSED)
+        breaker.failure("h", now=now)
+        self.assertEqual(breaker.state("h"), OPEN)
+        self.assertEqual(breaker.open_hosts(), ["h"])
+        self.assertFalse(breaker.allow("h", now=now + 59))
+        self.assertTrue(breaker.allow("other", now=now + 59))
+        # A single trial is let through once the cooldown has passed
+        self.assertTrue(breaker.allow("h", now=now + 60))
+        self.assertEqual(breaker.state("h"), HALF_OPEN)
+        self.assertFalse(breaker.allow("h", now=now + 61))
+        # and a failed trial reopens the circuit at once
+        breaker.failure("h", now=now + 61)
+        self.assertEqual(breaker.state("h"), OPEN)
+        self.assertFalse(breaker.allow("h", now=now + 120))
+        self.assertTrue(breaker.allow("h", now=now + 121))
+        breaker.success("h")
+        self.assertEqual(breaker.state("h"), CLOSED)
+        self.assertEqual(breaker.open_hosts(), [])
+
+    def testUnansweredTrial(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=10)
+        breaker.failure("h", now=1000.0)
+        self.assertTrue(breaker.allow("h", now=1010.0))
+        self.assertFalse(breaker.allow("h", now=1015.0))
+        self.assertTrue(breaker.allow("h", now=1020.0))
+
+    def testDisabled(self):
+        breaker = CircuitBreaker(threshold=0)
+        for _ in range(10):
+            breaker.failure("h")
+        self.assertTrue(breaker.allow("h"))
+        self.assertEqual(breaker.state("h"), CLOSED)
+
+
+class DomainsTestCase(SupyTestCase):
+    def testGetHost(self):
+        self.assertEqual(get_host("user:pw@Example.com.:8080"), "example.com")
+        self.assertEqual(get_host("[::1]:8080"), "[::1]")
+
+    def testWildcards(self):
+        trie = build_domain_index(
+            {"youtube.com": "yt", "imgur.com": "album", "i.imgur.com": "image"},
+            ignored=["*.evil.com"],
+        )
+        self.assertEqual(trie.lookup("youtube.com"), {HANDLER: "yt"})
+        self.assertEqual(trie.lookup("m.youtube.com:443"), {HANDLER: "yt"})
+        self.assertEqual(trie.lookup("notyoutube.com"), {})
+        # The most specific pattern wins
+        self.assertEqual(trie.lookup("i.imgur.com")[HANDLER], "image")
+        self.assertEqual(trie.lookup("a.i.imgur.com")[HANDLER], "image")
+        self.assertEqual(trie.lookup("imgur.com")[HANDLER], "album")
+        # *. patterns only apply to subdomains
+        self.assertEqual(trie.lookup("evil.com"), {})
+        self.assertEqual(trie.lookup("a.b.evil.com"), {IGNORED: True})
+        trie.add("evil.com", IGNORED)
+        self.assertEqual(trie.lookup("evil.com"), {IGNORED: True})
+
+
+class ExtractTestCase(SupyTestCase):
+    def testStopsAtTitle(self):
+        page = b"<html><head><title>Hello &amp;\n  world</title>" + b"x" * 100000
+        title, size = extract_title(chunked(page, 1024), "text/html")
+        self.assertEqual(title, "Hello &\n  world")
+        self.assertEqual(size, 1024)
+        self.assertEqual(chunked.taken, 1)
+
+    def testMaxBytes(self):
+        page = b"<html><head>" + b" " * 10000 + b"<title>Late</title>"
+        title, size = extract_title(chunked(page, 1024), "text/html", 4096)
+        self.assertIsNone(title)
+        self.assertEqual(size, 4096)
+        title, size = extract_title(chunked(page, 1024), "text/html", 0)
+        self.assertEqual(title, "Late")
+
+    def testCharsets(self):
+        page = "<title>Café</title>".encode("latin-1")
+        self.assertEqual(
+            extract_title([page], "text/html; charset=ISO-8859-1")[0], "Café"
+        )
+        meta = b'<meta charset="iso-8859-1">' + page
+        self.assertEqual(extract_title([meta], "text/html")[0], "Café")
+        self.assertEqual(get_charset("text/html; charset=bogus", b""), "utf-8")
+        self.assertEqual(get_charset(None, "<title>".encode("utf-16")), "utf-16-le")
+
+    def testFallbacks(self):
+        page = (
+            b'<meta property="og:title" content="From og">' b"<title>  </title><body>"
+        )
+        self.assertEqual(extract_title([page])[0], "From og")
+        self.assertEqual(
+            extract_title(
+                [b'<title>Real</title><meta property="og:title" content="x">']
+            )[0],
+            "Real",
+        )
+        # A <title> left open runs to the end of the document
+        self.assertEqual(extract_title([b"<title>Unclosed"])[0], "Unclosed")
+        self.assertEqual(extract_title([]), (None, 0))
+
+
+class MediaTestCase(SupyTestCase):
+    def testPng(self):
+        head = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + struct.pack(">II", 640, 480)
+        self.assertEqual(
+            probe(head + b"\x08\x06\x00\x00\x00"),
+            {"format": "PNG", "width": 640, "height": 480},
+        )
+
+    def testGif(self):
+        head = b"GIF89a" + struct.pack("<HH", 320, 200) + b"\xf7\x00\x00"
+        self.assertEqual(probe(head), {"format": "GIF", "width": 320, "height": 200})
+
+    def testJpeg(self):
+        app0 = b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+        sof0 = b"\xff\xc0\x00\x11\x08" + struct.pack(">HH", 768, 1024) + b"\x03"
+        self.assertEqual(
+            probe(b"\xff\xd8" + app0 + sof0 + b"\x00" * 9),
+            {"format": "JPEG", "width": 1024, "height": 768},
+        )
+        # A frame header past the bytes read leaves the dimensions unknown
+        self.assertEqual(probe(b"\xff\xd8" + app0), {"format": "JPEG"})
+
+    def testUnknown(self):
+        self.assertEqual(probe(b"<html>"), {})
+        self.assertEqual(probe(b"\x89PNG\r\n\x1a\n\x00"), {})
+
+    def testReadHead(self):
+        data = b"x" * 100000
+        self.assertEqual(len(read_head(chunked(data, 1024), 4096)), 4096)
+        self.assertEqual(chunked.taken, 4)
+
+
+class FakeResponse:
+    def __init__(self, status_code, location=None):
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict()
+        if location:
+            self.headers["Location"] = location
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeHttp:
+    """
+    Answers HEAD and GET requests from a dict of (method, url) -> response
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url)
+
+    def request(self, method, url):
+        self.requests.append((method, url))
+        return self.responses.get((method, url), FakeResponse(200))
+
+
+class RedirectResolverTestCase(SupyTestCase):
+    def testResolve(self):
+        http = FakeHttp(
+            {
+                ("HEAD", "http://s.co/a"): FakeResponse(301, "http://t.co/b"),
+                ("HEAD", "http://t.co/b"): FakeResponse(302, "/c"),
+                ("HEAD", "http://t.co/c"): FakeResponse(405),
+                ("GET", "http://t.co/c"): FakeResponse(303, "http://example.com/"),
+            }
+        )
+        resolver = RedirectResolver(http)
+        self.assertEqual(resolver.resolve("http://s.co/a"), ("http://example.com/", 3))
+        self.assertEqual(
+            http.requests,
+            [
+                ("HEAD", "http://s.co/a"),
+                ("HEAD", "http://t.co/b"),
+                ("HEAD", "http://t.co/c"),
+                ("GET", "http://t.co/c"),
+                ("HEAD", "http://example.com/"),
+            ],
+        )
+        # Resolved links are cached
+        self.assertEqual(resolver.resolve("HTTP://S.CO/a"), ("http://example.com/", 3))
+        self.assertEqual(resolver.requests, 5)
+
+    def testLimits(self):
+        http = FakeHttp(
+            {
+                ("HEAD", "http://s.co/a"): FakeResponse(301, "http://t.co/b"),
+                ("HEAD", "http://t.co/b"): FakeResponse(301, "http://t.co/c"),
+            }
+        )
+        resolver = RedirectResolver(http)
+        self.assertEqual(
+            resolver.resolve("http://s.co/a", max_hops=1), ("http://t.co/b", 1)
+        )
+        resolver.cache.clear()
+        follow = lambda url: url.startswith("http://s.co/")
+        self.assertEqual(
+            resolver.resolve("http://s.co/a", follow=follow), ("http://t.co/b", 1)
+        )
+
+
+class TitleStoreTestCase(SupyTestCase):
+    def setUp(self):
+        SupyTestCase.setUp(self)
+        self.filename = conf.supybot.directories.data.dirize("SpiffyTitlesTest.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.filename + suffix):
+                os.remove(self.filename + suffix)
+        self.store = TitleStore(self.filename)
+
+    def tearDown(self):
+        self.store.close()
+        SupyTestCase.tearDown(self)
+
+    def testStore(self):
+        key = ("#test", "https://youtu.be/x")
+        now = 1000.0
+        self.store.set(key, "Title", "youtube", {"id": "x"}, 60, "nick", now=now)
+        self.store.set(("#test", "http://a/"), "A", "default", None, 10, now=now)
+        self.store.close()
+        self.store = TitleStore(self.filename)
+        row = self.store.get(key, now=now + 59)
+        self.assertEqual(row["title"], "Title")
+        self.assertEqual(row["handler"], "youtube")
+        self.assertEqual(row["metadata"], {"id": "x"})
+        self.assertEqual(row["origin"], "nick")
+        self.assertIsNone(self.store.get(key, now=now + 60))
+        self.assertIsNone(self.store.get(("#other", key[1]), now=now))
+        self.assertEqual(self.store.vacuum(now=now + 30), 1)
+        self.assertIsNone(self.store.get(("#test", "http://a/"), now=now))
+        self.assertIsNotNone(self.store.get(key, now=now))
+
+
+class FakeSession:
+    """
+    Session whose requests fail with a connection error, or return a
+    response with the given status code
+    """
+
+    def __init__(self):
+        self.status_code = None
+        self.urls = []
+
+    def request(self, method, url, **kwargs):
+        self.urls.append(url)
+        if self.status_code is None:
+            raise requests.exceptions.ConnectionError("Connection refused")
+        response = requests.models.Response()
+        response.status_code = self.status_code
+        response.url = url
+        response.headers["Content-Type"] = "text/html"
+        response.raw = requests.packages.urllib3.response.HTTPResponse(
+            body=io.BytesIO(b"<title>Back</title>"), preload_content=False
+        )
+        return response
+
+
+class SpiffyTitlesTestCase(ChannelPluginTestCase):
+    plugins = ("SpiffyTitles",)
+
+    def setUp(self):
+        ChannelPluginTestCase.setUp(self)
+        self.cb = self.irc.getCallback("SpiffyTitles")
+
+    def getReplies(self, count, timeout=3):
+        replies = []
+        deadline = time.time() + timeout
+        while len(replies) < count and time.time() < deadline:
+            msg = self.irc.takeMsg()
+            if msg:
+                replies.append(msg.args[1])
+            else:
+                time.sleep(0.01)
+        return replies
+
+    def testCache(self):
+        calls = []
+
+        def handler_fake(url, info, channel):
+            calls.append(url)
+            return "Title of %s" % url
+
+        self.cb.handlers["example.com"] = handler_fake
+        title = self.cb.get_title_by_url("http://example.com/a", "#test")
+        self.assertEqual(title, "Title of http://example.com/a")
+        self.assertEqual(
+            self.cb.get_title_by_url("HTTP://EXAMPLE.COM:80/a", "#test"), title
+        )
+        self.assertEqual(len(calls), 1)
+        self.cb.get_title_by_url("http://example.com/a", "#other")
+        self.assertEqual(len(calls), 2)
+        self.assertRegexp("cachestats", "2 entries")
+
+    def testConcurrentDeadline(self):
+        def handler_slow(url, info, channel):
+            delay = float(info.path.strip("/"))
+            time.sleep(delay)
+            return "Slept %s" % delay
+
+        self.cb.handlers["slow.example"] = handler_slow
+        message = " ".join(
+            "http://slow.example/%s" % delay for delay in ("0.3", "0.1", "5", "0.2")
+        )
+        with conf.supybot.plugins.SpiffyTitles.concurrency.enabled.context(True):
+            with conf.supybot.plugins.SpiffyTitles.concurrency.deadline.context(1):
+                started = time.time()
+                self.irc.feedMsg(
+                    ircmsgs.privmsg(self.channel, message, prefix="foo!bar@baz")
+                )
+                replies = self.getReplies(3)
+                # The titles come in the order of the links, in less time than
+                # the links take one after another, and the slow one is skipped
+                self.assertEqual(replies, ["Slept 0.3", "Slept 0.1", "Slept 0.2"])
+                self.assertLess(time.time() - started, 1.5)
+                self.assertIsNone(self.irc.takeMsg())
+
+    def testNegativeCacheAndBreaker(self):
+        session = FakeSession()
+        self.cb.http.get_session = lambda url: session
+        self.cb.http.breaker = CircuitBreaker(threshold=3, cooldown=60)
+        host = "http://down.example"
+        with conf.supybot.plugins.SpiffyTitles.retryBackoff.context(0):
+            with conf.supybot.plugins.SpiffyTitles.maxRetries.context(2):
+                self.assertEqual(
+                    self.cb.get_source_by_url(host + "/a", "#test"), (None, False)
+                )
+                self.assertEqual(len(session.urls), 2)
+                # The failed link is not requested again for a while
+                self.cb.get_source_by_url(host + "/a", "#test")
+                self.assertEqual(len(session.urls), 2)
+                # One more failure opens the circuit for the whole host
+                self.cb.get_source_by_url(host + "/b", "#test")
+                self.assertEqual(len(session.urls), 3)
+                self.assertEqual(self.cb.http.breaker.state(host), OPEN)
+                self.cb.get_source_by_url(host + "/c", "#test")
+                self.assertEqual(len(session.urls), 3)
+                self.assertRegexp("poolstats", "down.example")
+                # A successful trial after the cooldown closes it
+                self.cb.http.breaker.cooldown = 0
+                session.status_code = 200
+                self.assertEqual(
+                    self.cb.get_source_by_url(host + "/d", "#test"), ("Back", False)
+                )
+                self.assertEqual(self.cb.http.breaker.state(host), CLOSED)
+                self.assertIsNone(self.cb.get_source_by_url(host + "/a", "#test")[0])
+
+    def testStaleWhileRevalidate(self):
+        calls = []
+
+        def handler_live(url, info, channel):
+            calls.append(url)
+            return "Version %s" % len(calls)
+
+        self.cb.handlers["live.example"] = handler_live
+        url = "http://live.example/"
+        with conf.supybot.plugins.SpiffyTitles.staleWhileRevalidate.enabled.context(
+            True
+        ):
+            self.assertEqual(self.cb.get_title_by_url(url, "#test"), "Version 1")
+            cached_link = self.cb.link_cache.get(self.cb.get_cache_key(url, "#test"))
+            self.assertGreater(cached_link["stale"], time.time())
+            self.assertEqual(self.cb.get_title_by_url(url, "#test"), "Version 1")
+            self.assertEqual(len(calls), 1)
+            # Past its soft lifetime the title is served while it is refreshed
+            cached_link["stale"] = time.time() - 1
+            self.assertEqual(self.cb.get_title_by_url(url, "#test"), "Version 1")
+            deadline = time.time() + 3
+            while self.cb.revalidations < 1 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(self.cb.revalidations, 1)
+            self.assertEqual(self.cb.get_title_by_url(url, "#test"), "Version 2")
+            self.assertEqual(len(calls), 2)
+
+    def testConfigSignature(self):
+        handler = self.cb.handler_youtube
+        signature = self.cb.get_config_signature(handler, "#test")
+        # Read from the channel's config snapshot, not from the registry
+        builds = self.cb.config.builds
+        self.assertEqual(self.cb.get_config_signature(handler, "#test"), signature)
+        self.assertEqual(self.cb.config.builds, builds)
+        self.assertEqual(self.cb.get_config_signature(handler, "#other"), signature)
+        template = conf.supybot.plugins.SpiffyTitles.youtube.template
+        template.get("#other").setValue("{{title}}")
+        try:
+            self.assertNotEqual(
+                self.cb.get_config_signature(handler, "#other"), signature
+            )
+            self.assertEqual(self.cb.get_config_signature(handler, "#test"), signature)
+            # Other handlers' settings are left out
+            self.assertEqual(
+                self.cb.get_config_signature(self.cb.handler_imdb, "#other"),
+                self.cb.get_config_signature(self.cb.handler_imdb, "#test"),
+            )
+        finally:
+            template.get("#other").setValue(template())
+
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab textwidth=79:
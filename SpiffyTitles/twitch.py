@@ -0,0 +1,176 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+twitch: helix API client with app access tokens and user/game caches.
+"""
+
+import threading
+import time
+
+from .cache import LinkCache
+
+API_URL = "https://api.twitch.tv/helix/"
+TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+# Refresh app access tokens this many seconds before they expire.
+TOKEN_MARGIN = 300
+MAX_IDS = 100
+
+
+class TwitchClient:
+    """
+    Makes helix requests for the Twitch handler. With a client secret
+    configured, an app access token is requested through the client
+    credentials flow and renewed shortly before it expires or when helix
+    rejects it; otherwise the configured access token is used as is.
+
+    Users and games rarely change, so they are cached: users under both
+    ("login", login) and ("id", id), games under their ID. Missing users are
+    looked up with a single users request no matter how many logins and IDs
+    are asked for, and likewise for games.
+
+    get_credentials is called as get_credentials() and must return a tuple of
+    (client_id, client_secret, access_token).
+    """
+
+    def __init__(self, http, get_credentials, max_entries=1000):
+        self.http = http
+        self.get_credentials = get_credentials
+        self.users = LinkCache(max_entries, 0)
+        self.games = LinkCache(max_entries, 0)
+        self.requests = 0
+        self._token = None
+        self._token_expires = 0
+        self._lock = threading.Lock()
+
+    def get_token(self, timeout=None):
+        """
+        Returns the access token to send with helix requests
+        """
+        client_id, client_secret, access_token = self.get_credentials()
+        if not client_secret:
+            return access_token.strip()
+        with self._lock:
+            if self._token and time.time() < self._token_expires - TOKEN_MARGIN:
+                return self._token
+            options = {
+                "client_id": client_id,
+                "client_secret": client_secret,
+                "grant_type": "client_credentials",
+            }
+            request = self.http.request(
+                "POST", TOKEN_URL, params=options, timeout=timeout
+            )
+            self.requests += 1
+            request.raise_for_status()
+            response = request.json()
+            self._token = response["access_token"]
+            self._token_expires = time.time() + response.get("expires_in", 3600)
+            return self._token
+
+    def invalidate_token(self):
+        with self._lock:
+            self._token = None
+            self._token_expires = 0
+
+    def helix(self, endpoint, params, timeout=None):
+        """
+        Requests a helix endpoint and returns the "data" list of the response.
+        params is a list of (name, value) tuples, so names may repeat.
+        """
+        client_id, client_secret, _ = self.get_credentials()
+        for attempt in range(2):
+            headers = {
+                "Client-ID": client_id,
+                "Authorization": "Bearer {0}".format(self.get_token(timeout)),
+            }
+            request = self.http.get(
+                API_URL + endpoint, params=params, headers=headers, timeout=timeout
+            )
+            self.requests += 1
+            # An app access token can be revoked before it expires; get a new
+            # one and try again once.
+            if request.status_code == 401 and client_secret and not attempt:
+                self.invalidate_token()
+                continue
+            break
+        request.raise_for_status()
+        return request.json().get("data") or []
+
+    def get_users(self, logins=(), ids=(), lifetime=86400, timeout=None):
+        """
+        Returns a dict of ("login", login) and ("id", id) -> user record for
+        the given logins and user IDs, fetching the uncached ones in one
+        request.
+        """
+        keys = [("login", login.lower()) for login in logins]
+        keys += [("id", str(user_id)) for user_id in ids]
+        users = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            user = self.users.get(key)
+            if user:
+                users[key] = user
+            else:
+                missing.append(key)
+        for offset in range(0, len(missing), MAX_IDS):
+            params = missing[offset : offset + MAX_IDS]
+            for user in self.helix("users", params, timeout):
+                for key in (("login", user["login"]), ("id", user["id"])):
+                    self.users.set(key, dict(user), lifetime)
+                    users[key] = user
+        return users
+
+    def get_games(self, ids, lifetime=604800, timeout=None):
+        """
+        Returns a dict of game ID -> game name, fetching the uncached ones in
+        one request.
+        """
+        games = {}
+        missing = []
+        for game_id in dict.fromkeys(str(game_id) for game_id in ids if game_id):
+            game = self.games.get(game_id)
+            if game:
+                games[game_id] = game["name"]
+            else:
+                missing.append(game_id)
+        for offset in range(0, len(missing), MAX_IDS):
+            params = [("id", game_id) for game_id in missing[offset : offset + MAX_IDS]]
+            for game in self.helix("games", params, timeout):
+                self.add_game(game["id"], game["name"], lifetime)
+                games[game["id"]] = game["name"]
+        return games
+
+    def add_game(self, game_id, name, lifetime=604800):
+        """
+        Caches a game name seen in another response, such as a stream
+        """
+        if game_id and name:
+            self.games.set(str(game_id), {"name": name}, lifetime)
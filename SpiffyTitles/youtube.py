@@ -0,0 +1,155 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+youtube: batched videos.list lookups with a per-video metadata cache.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+from .cache import LinkCache
+
+MAX_IDS = 50
+VIDEO_PARTS = ("snippet", "contentDetails")
+STATISTICS_PARTS = ("statistics",)
+
+
+class YouTubeBatcher:
+    """
+    Collects the video IDs requested by all threads during a short window and
+    looks them up with as few videos.list calls as possible, up to MAX_IDS IDs
+    per call. Snippet and contentDetails are cached separately from statistics,
+    so view and like counts can be refreshed often with a statistics-only call
+    while the rest of the video metadata stays cached.
+
+    fetch is called as fetch(video_ids, parts) and must return a dict of video
+    ID -> videos.list item.
+    """
+
+    def __init__(self, fetch, max_entries=1000):
+        self.fetch = fetch
+        self.videos = LinkCache(max_entries, 0)
+        self.statistics = LinkCache(max_entries, 0)
+        self.requests = 0
+        self._open_batch = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get_videos(self, video_ids, window=0, lifetimes=(3600, 300), timeout=None):
+        """
+        Returns a dict of video ID -> item with snippet, contentDetails and
+        statistics for the given IDs. IDs that could not be retrieved are left
+        out. If window is set, the lookup waits that many seconds for other
+        threads to add their IDs to the same call.
+        """
+        results = {}
+        futures = {}
+        leading = []
+        with self._lock:
+            for video_id in dict.fromkeys(video_ids):
+                video = self.get_cached_video(video_id)
+                if video:
+                    results[video_id] = video
+                    continue
+                future = self._inflight.get(video_id)
+                if future is None:
+                    if self.videos.get(video_id):
+                        parts = STATISTICS_PARTS
+                    else:
+                        parts = VIDEO_PARTS + STATISTICS_PARTS
+                    batch = self._open_batch
+                    if batch is None or len(batch["futures"]) >= MAX_IDS:
+                        batch = {"futures": {}, "parts": set(), "lifetimes": lifetimes}
+                        self._open_batch = batch
+                        leading.append(batch)
+                    future = Future()
+                    batch["futures"][video_id] = future
+                    batch["parts"].update(parts)
+                    self._inflight[video_id] = future
+                futures[video_id] = future
+        if leading:
+            if window > 0:
+                time.sleep(window)
+            for batch in leading:
+                self._send(batch)
+        for video_id, future in futures.items():
+            try:
+                video = future.result(timeout)
+            except Exception:
+                video = None
+            if video:
+                results[video_id] = video
+        return results
+
+    def get_cached_video(self, video_id):
+        video = self.videos.get(video_id)
+        statistics = self.statistics.get(video_id)
+        if video and statistics:
+            item = {"id": video_id, "statistics": statistics["statistics"]}
+            for part in VIDEO_PARTS:
+                item[part] = video[part]
+            return item
+
+    def _send(self, batch):
+        with self._lock:
+            if self._open_batch is batch:
+                self._open_batch = None
+        futures = batch["futures"]
+        video_lifetime, statistics_lifetime = batch["lifetimes"]
+        try:
+            self.requests += 1
+            items = self.fetch(list(futures), sorted(batch["parts"]))
+        except Exception as e:
+            items = None
+            error = e
+        resolved = {}
+        with self._lock:
+            for video_id in futures:
+                self._inflight.pop(video_id, None)
+            for video_id, item in (items or {}).items():
+                if "snippet" in item:
+                    video = {part: item.get(part, {}) for part in VIDEO_PARTS}
+                    self.videos.set(video_id, video, video_lifetime)
+                else:
+                    video = self.videos.get(video_id)
+                if "statistics" in item:
+                    statistics = {"statistics": item["statistics"]}
+                    self.statistics.set(video_id, statistics, statistics_lifetime)
+                if video and "statistics" in item:
+                    resolved[video_id] = dict(
+                        video, id=video_id, statistics=item["statistics"]
+                    )
+        for video_id, future in futures.items():
+            if items is None:
+                future.set_exception(error)
+            else:
+                future.set_result(resolved.get(video_id))
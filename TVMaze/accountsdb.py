@@ -32,9 +32,12 @@
 accountsdb: Provides storage for user-specific data via Supybot accounts, ident@host, or nicks.
 """
 
+import os
 import pickle
 
-from supybot import ircdb, log, conf, registry
+from supybot import ircdb, conf, registry
+
+from . import storage
 
 MODES = ["accounts", "identhost", "nicks"]
 DEFAULT_MODE = MODES[2]
@@ -66,32 +69,39 @@ class AccountsDB:
 
     def __init__(self, plugin_name, filename, addressing_mode=DEFAULT_MODE):
         """
-        Loads the existing database, creating a new one in memory if none
-        exists.
+        Opens the SQLite database of the plugin, importing the pickled
+        database filename the first time.
         """
-        self.db = {}
         self._plugin_name = plugin_name
         self.filename = conf.supybot.directories.data.dirize(filename)
 
         self.addressing_mode = addressing_mode
 
-        try:
-            with open(self.filename, "rb") as f:
-                self.db = pickle.load(f)
-        except Exception as e:
-            log.debug(
-                "%s: Unable to load database, creating a new one: %s",
-                self._plugin_name,
-                e,
-            )
+        self.storage = storage.Storage(
+            conf.supybot.directories.data.dirize(plugin_name + ".sqlite"), plugin_name
+        )
+        self.db = self.storage.table(
+            "accounts", (("user", "TEXT"), ("value", "JSON")), ("user",)
+        )
+        self.storage.migrate(filename, self._migrate)
+
+    def _migrate(self):
+        """Imports the pickled database, if there is one."""
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, "rb") as f:
+            db = pickle.load(f)
+        self.db.upsert_many(
+            {"user": user, "value": value} for (user, value) in db.items()
+        )
 
     def flush(self):
-        """Exports the database to a file."""
-        try:
-            with open(self.filename, "wb") as f:
-                pickle.dump(self.db, f, 2)
-        except Exception as e:
-            log.warning("%s: Unable to write database: %s", self._plugin_name, e)
+        """Commits pending changes to the database."""
+        self.storage.flush()
+
+    def close(self):
+        """Commits pending changes and closes the database."""
+        self.storage.close()
 
     def _get_key(self, prefix):
         nick, identhost = prefix.split("!", 1)
@@ -112,11 +122,12 @@ class AccountsDB:
     def set(self, prefix, newId):
         """Sets a user ID given the user's prefix."""
         user = self._get_key(prefix)
-        self.db[user] = newId
+        self.db.upsert({"user": user, "value": newId})
 
     def get(self, prefix):
         """Sets a user ID given the user's prefix."""
         user = self._get_key(prefix)
 
         # Automatically returns None if entry does not exist
-        return self.db.get(user)
+        row = self.db.get(user)
+        return row["value"] if row else None
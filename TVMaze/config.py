@@ -60,6 +60,17 @@ conf.registerGlobalValue(
     TVMaze, accountsdb.CONFIG_OPTION_NAME, accountsdb.CONFIG_OPTION
 )
 
+conf.registerGlobalValue(
+    TVMaze,
+    "cacheLifetime",
+    registry.NonNegativeInteger(
+        3600,
+        _(
+            """Time in seconds TVMaze API responses are cached. 0 disables the cache."""
+        ),
+    ),
+)
+
 conf.registerChannelValue(
     TVMaze,
     "showEpisodeTitle",
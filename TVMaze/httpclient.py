@@ -0,0 +1,253 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+"""
+httpclient: pooled HTTP client with default timeouts, retries, response size
+limits and per-host concurrency caps.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import supybot.conf as conf
+
+# Connect and read timeouts in seconds, used when a call does not set one
+DEFAULT_TIMEOUT = (5, 15)
+MAX_BYTES = 10485760
+CHUNK_SIZE = 16384
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """
+    Raised when a response body is larger than the client accepts
+    """
+
+
+class HostBusyError(requests.exceptions.Timeout):
+    """
+    Raised when no request slot for a host frees up within the timeout
+    """
+
+
+class HTTPClient:
+    """
+    Keeps one keep-alive requests.Session per scheme and host, closing the
+    least recently used ones once more than max_hosts are open. Every request
+    gets a timeout and is retried with exponential backoff after connection
+    errors, idempotent ones also after RETRY_STATUSES. Response bodies are read
+    only up to max_bytes. At most max_per_host requests to the same host run
+    at the same time. Requests go through supybot.protocols.http.proxy if set.
+    """
+
+    def __init__(
+        self,
+        timeout=DEFAULT_TIMEOUT,
+        retries=2,
+        backoff=0.5,
+        max_bytes=MAX_BYTES,
+        max_hosts=32,
+        max_per_host=4,
+    ):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_bytes = max_bytes
+        self.max_hosts = max_hosts
+        self.max_per_host = max_per_host
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_host(self, url):
+        info = urlparse(url)
+        return "{0}://{1}".format(info.scheme.lower(), info.netloc.lower())
+
+    def get_proxies(self):
+        proxy = str(conf.supybot.protocols.http.proxy)
+        if not proxy:
+            return {}
+        if not re.match(r"https?://", proxy, re.IGNORECASE):
+            proxy = "http://{0}".format(proxy)
+        return {"http": proxy, "https": proxy}
+
+    def get_session(self, url):
+        """
+        Returns the session for the host of url and the semaphore capping
+        concurrent requests to it, creating them if needed
+        """
+        host = self.get_host(url)
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None:
+                entry = (
+                    self._create_session(),
+                    threading.BoundedSemaphore(self.max_per_host),
+                )
+                self._hosts[host] = entry
+                while len(self._hosts) > self.max_hosts:
+                    (_, (old_session, _)) = self._hosts.popitem(last=False)
+                    old_session.close()
+            self._hosts.move_to_end(host)
+        return entry
+
+    def request(self, method, url, max_bytes=None, **kwargs):
+        """
+        Sends a request like requests.request. Unless stream is set, the body
+        is read before returning, and ResponseTooLarge is raised if it is
+        larger than max_bytes (the client's limit by default, 0 for none).
+        Streamed responses are not limited, and count against the host's
+        concurrency cap only until their headers arrive.
+        """
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        stream = kwargs.pop("stream", False)
+        if not kwargs.get("proxies"):
+            kwargs["proxies"] = self.get_proxies()
+        (session, semaphore) = self.get_session(url)
+        timeout = kwargs["timeout"]
+        if isinstance(timeout, tuple):
+            timeout = sum(timeout)
+        if not semaphore.acquire(timeout=timeout):
+            raise HostBusyError(
+                "Too many concurrent requests to {0}".format(self.get_host(url))
+            )
+        try:
+            response = session.request(method, url, stream=True, **kwargs)
+            if not stream:
+                self.read_body(response, max_bytes)
+        finally:
+            semaphore.release()
+        return response
+
+    def read_body(self, response, max_bytes):
+        """
+        Reads the body of a streamed response into response.content
+        """
+        length = response.headers.get("content-length", "")
+        if max_bytes and length.isdigit() and int(length) > max_bytes:
+            response.close()
+            raise ResponseTooLarge(
+                "{0} is larger than {1} bytes".format(response.url, max_bytes),
+                response=response,
+            )
+        chunks = []
+        size = 0
+        try:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise ResponseTooLarge(
+                        "{0} is larger than {1} bytes".format(response.url, max_bytes),
+                        response=response,
+                    )
+                chunks.append(chunk)
+        except BaseException:
+            response.close()
+            raise
+        response._content = b"".join(chunks)
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("allow_redirects", True)
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.request("POST", url, data=data, json=json, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for (session, _) in self._hosts.values():
+                session.close()
+            self._hosts.clear()
+
+    def _create_session(self):
+        session = requests.Session()
+        retry = Retry(
+            total=self.retries,
+            # A read that timed out has already held the thread for the whole
+            # read timeout, so it is not tried again
+            read=False,
+            backoff_factor=self.backoff,
+            status_forcelist=RETRY_STATUSES,
+            raise_on_status=False,
+            # A long Retry-After would hold the calling thread for that long
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.max_per_host, max_retries=retry
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the HTTPClient shared by every command of the plugin
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HTTPClient()
+        return _client
+
+
+def close():
+    """
+    Closes the sessions of the shared client. The next request opens new ones.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def request(method, url, **kwargs):
+    return get_client().request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
+
+
+def post(url, data=None, json=None, **kwargs):
+    return get_client().post(url, data=data, json=json, **kwargs)
@@ -28,13 +28,14 @@
 # POSSIBILITY OF SUCH DAMAGE.
 ###
 
-import requests
 import pendulum
 import urllib.parse
 import json
 from . import accountsdb
+from . import httpclient
+from . import responsecache
 
-from supybot import utils, plugins, ircutils, callbacks, world
+from supybot import utils, plugins, ircutils, callbacks
 from supybot.commands import *
 
 try:
@@ -57,11 +58,15 @@ class TVMaze(callbacks.Plugin):
         self.db = accountsdb.AccountsDB(
             "TVMaze", "TVMaze.db", self.registryValue(accountsdb.CONFIG_OPTION_NAME)
         )
-        world.flushers.append(self.db.flush)
+        self.cache = responsecache.ResponseCache()
+        self._get_json = self.cache.wrap(
+            self._get_json, lambda: self.registryValue("cacheLifetime")
+        )
 
     def die(self):
-        world.flushers.remove(self.db.flush)
-        self.db.flush()
+        self.db.close()
+        self.cache.close()
+        httpclient.close()
         super().die()
 
     # --------------------#
@@ -84,36 +89,30 @@ class TVMaze(callbacks.Plugin):
     def _get(self, mode, country="US", date=None, query=None, id_=None):
         """wrapper for requests tailored to TVMaze API"""
 
-        base_url = "http://api.tvmaze.com"
-
         if mode == "search":
             if not query:
                 return
-            query = urllib.parse.quote_plus(query)
-            base_url += "/search/shows?q={}".format(query)
             try:
-                data = requests.get(base_url)
-                data = json.loads(data.content)
+                data = self._get_json("/search/shows", (("q", query),))
             except:
                 data = None
         elif mode == "schedule":
             if not date:
                 date = pendulum.now().format("YYYY-MM-DD")
-            base_url += "/schedule?country={}&date={}".format(country, date)
             try:
-                data = requests.get(base_url)
-                data = json.loads(data.content)
+                data = self._get_json(
+                    "/schedule", (("country", country), ("date", date))
+                )
             except:
                 data = None
         elif mode == "shows":
             if not id_:
                 return
-            base_url += "/shows/{}?embed[]=previousepisode&embed[]=nextepisode".format(
-                id_
-            )
             try:
-                data = requests.get(base_url)
-                data = json.loads(data.content)
+                data = self._get_json(
+                    "/shows/{}".format(id_),
+                    (("embed[]", "previousepisode"), ("embed[]", "nextepisode")),
+                )
             except:
                 data = None
         else:
@@ -121,10 +120,23 @@ class TVMaze(callbacks.Plugin):
 
         return data
 
+    def _get_json(self, path, params):
+        """fetches and decodes a TVMaze API response, cached for cacheLifetime"""
+        url = "http://api.tvmaze.com{}?{}".format(path, urllib.parse.urlencode(params))
+        return json.loads(httpclient.get(url).content)
+
     # ------------------#
     # Public functions #
     # ------------------#
 
+    @wrap(["owner"])
+    def cachestats(self, irc, msg, args):
+        """takes no arguments
+
+        Shows the size and hit rate of the TVMaze API response cache.
+        """
+        irc.reply(self.cache.format_stats())
+
     @wrap(
         [
             getopts(
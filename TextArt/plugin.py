@@ -49,6 +49,8 @@ import random
 import pyimgur
 from bs4 import BeautifulSoup
 import json
+from . import configsnapshot
+from . import httpclient
 from .colors import (
     rgbColors,
     colors16,
@@ -84,6 +86,33 @@ class TextArt(callbacks.Plugin):
         self.source_colors = 0
         self.agents = self.registryValue("userAgents")
         self.matches = {}
+        self.config = configsnapshot.ConfigSnapshots(
+            self,
+            (
+                "colors",
+                "speed",
+                "delay",
+                "quantize",
+                "bg",
+                "fg",
+                "imgDefault",
+                "asciiWidth",
+                "blockWidth",
+                "resize",
+                "pasteEnable",
+                "showStats",
+            ),
+            self.prepareConfig,
+        )
+
+    def die(self):
+        self.config.close()
+        httpclient.close()
+        self.__parent.die()
+
+    def prepareConfig(self, values):
+        values["speed"] = values["speed"].lower()
+        values["imgDefault"] = values["imgDefault"].lower()
 
     def doPrivmsg(self, irc, msg):
         channel = msg.args[0]
@@ -99,7 +128,7 @@ class TextArt(callbacks.Plugin):
             apikey = self.registryValue("pasteAPI")
             payload = {"description": description, "sections": [{"contents": paste}]}
             headers = {"X-Auth-Token": apikey}
-            post_response = requests.post(
+            post_response = httpclient.post(
                 url="https://api.paste.ee/v1/pastes", json=payload, headers=headers
             )
             response = json.loads(post_response.content)
@@ -437,7 +466,7 @@ class TextArt(callbacks.Plugin):
         ua = random.choice(self.agents)
         header = {"User-Agent": ua}
         try:
-            r = requests.get(url, stream=True, headers=header, timeout=10)
+            r = httpclient.get(url, stream=True, headers=header, timeout=10)
             r.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -525,7 +554,7 @@ class TextArt(callbacks.Plugin):
                 for word in words:
                     if word.strip():
                         try:
-                            data = requests.get(
+                            data = httpclient.get(
                                 "https://artii.herokuapp.com/make?text={0}&font={1}"
                                 .format(word.strip(), font),
                                 timeout=10,
@@ -548,7 +577,7 @@ class TextArt(callbacks.Plugin):
                         asyncio.run(self.reply(irc, output, channel, delay))
             else:
                 try:
-                    data = requests.get(
+                    data = httpclient.get(
                         "https://artii.herokuapp.com/make?text={0}&font={1}".format(
                             text, font
                         ),
@@ -571,7 +600,7 @@ class TextArt(callbacks.Plugin):
                 for word in words:
                     if word.strip():
                         try:
-                            data = requests.get(
+                            data = httpclient.get(
                                 "https://artii.herokuapp.com/make?text={0}&font=univers"
                                 .format(word.strip()),
                                 timeout=10,
@@ -594,7 +623,7 @@ class TextArt(callbacks.Plugin):
                         asyncio.run(self.reply(irc, output, channel, delay))
             else:
                 try:
-                    data = requests.get(
+                    data = httpclient.get(
                         "https://artii.herokuapp.com/make?text={0}&font=univers".format(
                             text
                         ),
@@ -627,7 +656,7 @@ class TextArt(callbacks.Plugin):
         Get list of artii figlet fonts.
         """
         try:
-            fontlist = requests.get(
+            fontlist = httpclient.get(
                 "https://artii.herokuapp.com/fonts_list", timeout=10
             )
             fontlist.raise_for_status()
@@ -668,6 +697,7 @@ class TextArt(callbacks.Plugin):
         if not irc.isChannel(channel):
             channel = msg.nick
         optlist = dict(optlist)
+        config = self.config.get(msg.args[0])
         gscale = "\xa0"
         if "16" in optlist:
             self.colors = 16
@@ -676,31 +706,31 @@ class TextArt(callbacks.Plugin):
         elif "99" in optlist:
             self.colors = 99
         else:
-            self.colors = self.registryValue("colors", msg.args[0])
+            self.colors = config.colors
         if "fast" in optlist:
             speed = "fast"
         elif "slow" in optlist:
             speed = "slow"
         else:
-            speed = self.registryValue("speed", msg.args[0]).lower()
+            speed = config.speed
         if "delay" in optlist and ircdb.checkCapability(msg.prefix, "admin"):
             delay = optlist.get("delay")
         else:
-            delay = self.registryValue("delay", msg.args[0])
+            delay = config.delay
         if "quantize" in optlist:
             quantize = True
         elif "no-quantize" in optlist:
             quantize = False
         else:
-            quantize = self.registryValue("quantize", msg.args[0])
+            quantize = config.quantize
         if "bg" in optlist:
             bg = optlist.get("bg")
         else:
-            bg = self.registryValue("bg", msg.args[0])
+            bg = config.bg
         if "fg" in optlist:
             fg = optlist.get("fg")
         else:
-            fg = self.registryValue("fg", msg.args[0])
+            fg = config.fg
         if "chars" in optlist:
             type = "ascii"
             gscale = optlist.get("chars")
@@ -723,7 +753,7 @@ class TextArt(callbacks.Plugin):
             type = "ascii"
             gscale = "\xa0"
         else:
-            type = self.registryValue("imgDefault", msg.args[0]).lower()
+            type = config.imgDefault
         if "no-color" in optlist and "ramp" not in optlist and bg == 0 or bg == 98:
             type = "no-color"
             gscale = "@%#*+=-:. "
@@ -739,16 +769,16 @@ class TextArt(callbacks.Plugin):
         if "w" in optlist:
             cols = optlist.get("w")
         elif type == "ascii" or type == "no-color" or type == "block":
-            cols = self.registryValue("asciiWidth", msg.args[0])
+            cols = config.asciiWidth
         else:
-            cols = self.registryValue("blockWidth", msg.args[0])
+            cols = config.blockWidth
         if "s" in optlist:
             s = float(optlist.get("s"))
         ua = random.choice(self.agents)
         header = {"User-Agent": ua}
         image_formats = ("image/png", "image/jpeg", "image/jpg", "image/gif")
         try:
-            r = requests.get(url, stream=True, headers=header, timeout=10)
+            r = httpclient.get(url, stream=True, headers=header, timeout=10)
             r.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -794,7 +824,7 @@ class TextArt(callbacks.Plugin):
         if "resize" in optlist:
             resize = optlist.get("resize")
         else:
-            resize = self.registryValue("resize", msg.args[0])
+            resize = config.resize
         if type != "no-color":
             image2 = image.resize((cols, rows), resize)
             if "s" in optlist:
@@ -1038,13 +1068,13 @@ class TextArt(callbacks.Plugin):
         self.stopped[channel] = False
         end_time = time.time()
         asyncio.run(self.reply(irc, output, channel, delay))
-        if self.registryValue("pasteEnable", msg.args[0]):
+        if config.pasteEnable:
             paste = ""
             for line in output:
                 if not line.strip():
                     line = "\xa0"
                 paste += line + "\n"
-        if self.registryValue("showStats", msg.args[0]):
+        if config.showStats:
             longest = len(max(output, key=len).encode("utf-8"))
             render_time = "{0:.2f}".format(end_time - start_time)
             irc.reply(
@@ -1052,7 +1082,7 @@ class TextArt(callbacks.Plugin):
                 " bytes]".format(self.source_colors, render_time, longest),
                 prefixNick=False,
             )
-        if self.registryValue("pasteEnable", msg.args[0]):
+        if config.pasteEnable:
             irc.reply(self.doPaste(url, paste), private=False, notice=False, to=channel)
 
     img = wrap(
@@ -1112,7 +1142,7 @@ class TextArt(callbacks.Plugin):
         ua = random.choice(self.agents)
         header = {"User-Agent": ua}
         try:
-            r = requests.get(url, headers=header, stream=True, timeout=10)
+            r = httpclient.get(url, headers=header, stream=True, timeout=10)
             r.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -1172,7 +1202,7 @@ class TextArt(callbacks.Plugin):
         ua = random.choice(self.agents)
         header = {"User-Agent": ua}
         try:
-            r = requests.get(url, stream=True, headers=header, timeout=10)
+            r = httpclient.get(url, stream=True, headers=header, timeout=10)
             r.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -1291,7 +1321,7 @@ class TextArt(callbacks.Plugin):
         header = {"User-Agent": ua}
         image_formats = ("image/png", "image/jpeg", "image/jpg", "image/gif")
         try:
-            r = requests.get(url, stream=True, headers=header, timeout=10)
+            r = httpclient.get(url, stream=True, headers=header, timeout=10)
             r.raise_for_status()
         except (
             requests.exceptions.RequestException,
@@ -1599,7 +1629,7 @@ class TextArt(callbacks.Plugin):
             self.colors = 99
         else:
             self.colors = self.registryValue("colors", msg.args[0])
-        file = requests.get("http://wttr.in/{0}".format(location), timeout=10)
+        file = httpclient.get("http://wttr.in/{0}".format(location), timeout=10)
         output = file.content.decode()
         output = self.ansi2irc(output)
         output = re.sub("⚡", "☇ ", output)
@@ -1660,7 +1690,7 @@ class TextArt(callbacks.Plugin):
             sub = "usd"
         if not coin:
             coin = ""
-        file = requests.get("http://{0}.rate.sx/{1}".format(sub, coin), timeout=10)
+        file = httpclient.get("http://{0}.rate.sx/{1}".format(sub, coin), timeout=10)
         output = file.content.decode()
         output = self.ansi2irc(output)
         output = output.replace("\x1b(B", "")
@@ -1715,7 +1745,7 @@ class TextArt(callbacks.Plugin):
         else:
             delay = self.registryValue("delay", msg.args[0])
         self.stopped[channel] = False
-        data = requests.get("http://www.asciiartfarts.com/fortune.txt", timeout=10)
+        data = httpclient.get("http://www.asciiartfarts.com/fortune.txt", timeout=10)
         fortunes = data.content.decode().split("%\n")
         fortune = random.randrange(0, len(fortunes))
         output = fortunes[fortune].splitlines()
@@ -1742,7 +1772,7 @@ class TextArt(callbacks.Plugin):
         self.stopped[channel] = False
         ua = random.choice(self.agents)
         header = {"User-Agent": ua}
-        data = requests.get(
+        data = httpclient.get(
             "https://mircart.org/?s={0}".format(search), headers=header, timeout=10
         )
         if not data:
@@ -1753,7 +1783,7 @@ class TextArt(callbacks.Plugin):
         if not url:
             irc.reply("Error: No results found for {0}".format(search))
             return
-        data = requests.get(url.get("href"), headers=header, timeout=10)
+        data = httpclient.get(url.get("href"), headers=header, timeout=10)
         try:
             output = data.content.decode()
         except:
@@ -60,11 +60,13 @@ __contributors__ = {}
 __url__ = "https://github.com/oddluck/limnoria-plugins/"
 
 from . import config
+from . import configsnapshot
 from . import plugin
 from imp import reload
 
 # In case we're being reloaded.
 reload(config)
+reload(configsnapshot)
 reload(plugin)
 # Add more reloads here if you add third-party modules and want them to be
 # reloaded when this plugin is reloaded.  Don't forget to import them as well!
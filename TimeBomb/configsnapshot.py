@@ -0,0 +1,125 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+
+"""
+configsnapshot: cached read-only per-channel views of a plugin's settings.
+"""
+
+import threading
+import types
+
+
+class Snapshot(types.SimpleNamespace):
+    """
+    Read-only set of configuration values, read as plain attributes
+    """
+
+    def __setattr__(self, name, value):
+        raise AttributeError("configuration snapshots are read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("configuration snapshots are read-only")
+
+
+class ConfigSnapshots:
+    """
+    Builds one Snapshot of the given registry values per (channel, network)
+    and keeps it until any of those values changes. Value names become
+    attribute names with dots replaced by underscores, so "default.enabled" is
+    read as snapshot.default_enabled. If given, prepare(values) is called with
+    the dict of values before the snapshot is frozen, to pre-compile patterns
+    or normalize lists.
+    """
+
+    def __init__(self, plugin, names, prepare=None):
+        self.plugin = plugin
+        self.names = tuple(names)
+        self.prepare = prepare
+        self.builds = 0
+        self._snapshots = {}
+        self._generation = 0
+        self._hooked = {}
+        self._lock = threading.Lock()
+        # Registry callbacks are removed by identity, so keep one bound method
+        self._callback = self.invalidate
+
+    def get(self, channel=None, network=None):
+        """
+        Returns the Snapshot of the settings for channel on network
+        """
+        key = (channel, network)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            return snapshot
+        generation = self._generation
+        values = {}
+        for name in self.names:
+            value = self.plugin.registryValue(name, value=False)
+            specific = value.getSpecific(network, channel, check=False)
+            values[name.replace(".", "_")] = specific()
+            self._hook(value)
+        if self.prepare is not None:
+            self.prepare(values)
+        snapshot = Snapshot(**values)
+        with self._lock:
+            self.builds += 1
+            # Don't keep a snapshot if a value changed while it was built
+            if generation == self._generation:
+                self._snapshots[key] = snapshot
+        return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._snapshots.clear()
+
+    def close(self):
+        """
+        Removes the registry callbacks, call this when the plugin dies
+        """
+        with self._lock:
+            for value in self._hooked.values():
+                value.removeCallback(self._callback)
+            self._hooked.clear()
+            self._snapshots.clear()
+
+    def _hook(self, value):
+        # Channel and network specific values are children of the global value
+        # and don't run its callbacks, so every child gets the callback too.
+        # Children created later are hooked when a snapshot first reads them.
+        with self._lock:
+            stack = [value]
+            while stack:
+                value = stack.pop()
+                if id(value) not in self._hooked:
+                    value.addCallback(self._callback)
+                    self._hooked[id(value)] = value
+                stack.extend(value._children.values())
@@ -43,6 +43,7 @@ import supybot.schedule as schedule
 import supybot.callbacks as callbacks
 import supybot.registry as registry
 import supybot.conf as conf
+from . import configsnapshot
 
 
 class TimeBomb(callbacks.Plugin):
@@ -60,6 +61,26 @@ class TimeBomb(callbacks.Plugin):
         self.bombs = {}
         self.lastBomb = ""
         self.talktimes = {}
+        self.config = configsnapshot.ConfigSnapshots(
+            self,
+            (
+                "exclusions",
+                "randomExclusions",
+                "rateLimitTime",
+                "rateLimitSender",
+                "rateLimitVictim",
+                "rateLimitTotal",
+            ),
+            self._prepareConfig,
+        )
+
+    def die(self):
+        self.config.close()
+        self.__parent.die()
+
+    def _prepareConfig(self, values):
+        for name in ("exclusions", "randomExclusions"):
+            values[name] = frozenset(nick.lower() for nick in values[name])
 
     def doPrivmsg(self, irc, msg):
         self.talktimes[msg.nick] = time.time()
@@ -326,7 +347,8 @@ class TimeBomb(callbacks.Plugin):
                 schedule.addEvent(reinvite, time.time() + 5)
 
     def _canBomb(self, irc, channel, sender, victim, replyError):
-        if sender.lower() in self.registryValue("exclusions", channel):
+        config = self.config.get(channel)
+        if sender.lower() in config.exclusions:
             if replyError:
                 irc.reply(
                     "You can't bomb anyone because you're excluded from being bombed."
@@ -349,7 +371,7 @@ class TimeBomb(callbacks.Plugin):
         senderMask = ("{}@{}".format(user, host)).lower()
         victim = victim.lower()
         now = int(time.time())
-        storeTime = self.registryValue("rateLimitTime", channel)
+        storeTime = config.rateLimitTime
         victimCount = 0
         senderCount = 0
         totalCount = 0
@@ -368,10 +390,7 @@ class TimeBomb(callbacks.Plugin):
             bombHistory.append(bstr)
         self.setRegistryValue("bombHistory", bombHistory, channel)
 
-        if (
-            totalCount
-            > storeTime * self.registryValue("rateLimitTotal", channel) / 3600
-        ):
+        if totalCount > storeTime * config.rateLimitTotal / 3600:
             if replyError:
                 irc.reply(
                     "Sorry, I've stuffed so many timebombs down so many pants that I've"
@@ -379,10 +398,7 @@ class TimeBomb(callbacks.Plugin):
                 )
             return False
 
-        if (
-            senderCount
-            > storeTime * self.registryValue("rateLimitSender", channel) / 3600
-        ):
+        if senderCount > storeTime * config.rateLimitSender / 3600:
 
             if replyError:
                 irc.reply(
@@ -391,10 +407,7 @@ class TimeBomb(callbacks.Plugin):
                 )
             return False
 
-        if (
-            victimCount
-            > storeTime * self.registryValue("rateLimitVictim", channel) / 3600
-        ):
+        if victimCount > storeTime * config.rateLimitVictim / 3600:
             if replyError:
                 irc.reply(
                     "That user has been timebombed a lot recently, try picking someone"
@@ -537,12 +550,13 @@ class TimeBomb(callbacks.Plugin):
         if irc.nick in nicks and not self.registryValue("allowSelfBombs", channel):
             nicks.remove(irc.nick)
         eligibleNicks = []
+        config = self.config.get(channel)
 
         for victim in nicks:
             if not (
                 victim == self.lastBomb
-                or victim.lower() in self.registryValue("randomExclusions", channel)
-                or victim.lower() in self.registryValue("exclusions", channel)
+                or victim.lower() in config.randomExclusions
+                or victim.lower() in config.exclusions
             ) and self._canBomb(irc, channel, msg.nick, victim, False):
                 eligibleNicks.append(victim)
 
@@ -634,10 +648,9 @@ class TimeBomb(callbacks.Plugin):
         if not found:
             irc.reply("Error: nick not found.")
             return
-        for nick in self.registryValue("exclusions", channel):
-            if nick.lower() == victim.lower():
-                irc.reply("Error: that nick can't be bombed.")
-                return
+        if victim.lower() in self.config.get(channel).exclusions:
+            irc.reply("Error: that nick can't be bombed.")
+            return
 
         # not (victim == msg.nick and victim == 'mniip') and
         if not ircdb.checkCapability(msg.prefix, "admin") and not self._canBomb(
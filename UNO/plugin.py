@@ -40,6 +40,7 @@ import supybot.callbacks as callbacks
 import time
 import os, errno
 import pickle
+from . import storage
 
 try:
     from supybot.i18n import PluginInternationalization
@@ -82,6 +83,28 @@ class UNO(callbacks.Plugin):
     dataPath = r"%s%suno%s" % (conf.supybot.directories.data(), os.sep, os.sep)
     prefixChar = conf.supybot.reply.whenAddressedBy.chars()[0]
 
+    def __init__(self, irc):
+        self.__parent = super(UNO, self)
+        self.__parent.__init__(irc)
+        self.storage = storage.Storage(
+            conf.supybot.directories.data.dirize("UNO.sqlite"), "UNO"
+        )
+        self.options = self.storage.table(
+            "options",
+            (
+                ("network", "TEXT"),
+                ("channel", "TEXT"),
+                ("name", "TEXT"),
+                ("value", "JSON"),
+            ),
+            ("network", "channel", "name"),
+        )
+        self.storage.migrate("options", self._migrate_options)
+
+    def die(self):
+        self.storage.close()
+        self.__parent.die()
+
     def start(self, irc, msg, args, text):
         """
         Start a new game of UNO. For the rules of the game, use the "uno rules" command.
@@ -1122,7 +1145,7 @@ class UNO(callbacks.Plugin):
                 irc.reply("Set %s %s-->(unset)" % (text, self.channeloptions[text]))
                 del self.channeloptions[text]
                 try:
-                    self._write_options(irc)
+                    self._write_options(irc, text)
                 except:
                     irc.reply("Failed to write options to file. :(")
             else:
@@ -1135,7 +1158,7 @@ class UNO(callbacks.Plugin):
             irc.reply("Set %s (unset)-->%s" % (text, value))
             self.channeloptions[text] = value
         try:
-            self._write_options(irc)
+            self._write_options(irc, text)
         except:
             irc.reply("Failed to write options to file. :(")
 
@@ -1191,31 +1214,48 @@ class UNO(callbacks.Plugin):
     def _read_options(self, irc):
         network = irc.network.replace(" ", "_")
         channel = irc.msg.args[0]
-        # irc.reply('test: %s.%s.options' % (irc.network, irc.msg.args[0] ))
-
-        f = "%s%s.%s.options" % (self.dataPath, network, channel)
-        if os.path.isfile(f):
-            inputfile = open(f, "rb")
-            self.channeloptions = pickle.load(inputfile)
-            inputfile.close()
-        else:
-            # Use defaults
-            channeloptions = {}
-            channeloptions["allow_game"] = False
-            channeloptions["debug"] = False
-            channeloptions["use_queue"] = True
-            channeloptions["nplayers"] = 10
-            channeloptions["maxbots"] = 9
-            channeloptions["use_colors"] = True
-            channeloptions["use_notice"] = True
+        # Use defaults for the options that were never set
+        channeloptions = {}
+        channeloptions["allow_game"] = False
+        channeloptions["debug"] = False
+        channeloptions["use_queue"] = True
+        channeloptions["nplayers"] = 10
+        channeloptions["maxbots"] = 9
+        channeloptions["use_colors"] = True
+        channeloptions["use_notice"] = True
+        for row in self.options.select(network=network, channel=channel):
+            channeloptions[row["name"]] = row["value"]
+        self.channeloptions = channeloptions
         return
 
-    def _write_options(self, irc):
+    def _write_options(self, irc, name):
         network = irc.network.replace(" ", "_")
         channel = irc.msg.args[0]
-        outputfile = open("%s%s.%s.options" % (self.dataPath, network, channel), "wb")
-        pickle.dump(self.channeloptions, outputfile)
-        outputfile.close()
+        if name in self.channeloptions:
+            self.options.upsert(
+                {
+                    "network": network,
+                    "channel": channel,
+                    "name": name,
+                    "value": self.channeloptions[name],
+                }
+            )
+        else:
+            self.options.delete(network=network, channel=channel, name=name)
+
+    def _migrate_options(self):
+        # Imports the <network>.<channel>.options pickles
+        for filename in os.listdir(self.dataPath):
+            match = re.match(r"(.*?)\.([#&!+].*)\.options$", filename)
+            if not match:
+                continue
+            (network, channel) = match.groups()
+            with open(os.path.join(self.dataPath, filename), "rb") as inputfile:
+                channeloptions = pickle.load(inputfile)
+            self.options.upsert_many(
+                {"network": network, "channel": channel, "name": name, "value": value}
+                for (name, value) in channeloptions.items()
+            )
 
     def doNick(self, irc, msg):
         oldNick = msg.nick
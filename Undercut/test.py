@@ -0,0 +1,56 @@
+###
+# Copyright (c) SpiderDave
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+import os
+import pickle
+
+from supybot.test import *
+
+class UndercutTestCase(ChannelPluginTestCase):
+    plugins = ('Undercut',)
+    cleanDataDir = False
+
+    def setUp(self):
+        # Start from the options files of an older version
+        data=conf.supybot.directories.data()
+        shutil.rmtree(data)
+        os.makedirs(os.path.join(data, 'undercut'))
+        for channel, channeloptions in (('#test', {'allow_game':True, 'undercut_goal':20}), ('#other', {'flaunt1_goal':10})):
+            with open(os.path.join(data, 'undercut', 'test.%s.options' % channel), 'wb') as f:
+                pickle.dump(channeloptions, f)
+        ChannelPluginTestCase.setUp(self)
+
+    def testOptionsAreMigrated(self):
+        self.assertResponse('ucshowoptions', 'allow_game=True, debug=False, use_queue=True, undercut_goal=20, flaunt1_goal=40, flaunt2_goal=200, flaunt3_goal=40')
+        self.assertNotError('ucsetoption undercut_goal unset')
+        self.assertRegexp('ucshowoptions', 'undercut_goal=40')
+
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab textwidth=79:
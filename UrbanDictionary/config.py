@@ -56,5 +56,12 @@ conf.registerChannelValue(
     "disableANSI",
     registry.Boolean(False, """Do not display any ANSI formatting codes in output."""),
 )
+conf.registerGlobalValue(
+    UrbanDictionary,
+    "cacheLifetime",
+    registry.NonNegativeInteger(
+        86400, """Time in seconds definitions are cached. 0 disables the cache."""
+    ),
+)
 
 # vim:set shiftwidth=4 tabstop=4 expandtab textwidth=250:
@@ -41,6 +41,7 @@ import supybot.plugins as plugins
 import supybot.ircutils as ircutils
 import supybot.callbacks as callbacks
 from supybot.i18n import PluginInternationalization, internationalizeDocstring
+from . import responsecache
 
 _ = PluginInternationalization("UrbanDictionary")
 
@@ -52,10 +53,29 @@ class UrbanDictionary(callbacks.Plugin):
 
     threaded = True
 
+    def __init__(self, irc):
+        self.__parent = super(UrbanDictionary, self)
+        self.__parent.__init__(irc)
+        self.cache = responsecache.ResponseCache()
+        self._fetch = self.cache.wrap(
+            self._fetch, lambda: self.registryValue("cacheLifetime")
+        )
+
+    def die(self):
+        self.cache.close()
+        self.__parent.die()
+
     ######################
     # INTERNAL FUNCTIONS #
     ######################
 
+    def _fetch(self, term):
+        """fetch the definitions of term from the API, cached for cacheLifetime."""
+        url = "http://api.urbandictionary.com/v0/define?term=%s" % utils.web.urlquote(
+            term
+        )
+        return utils.web.getUrl(url)
+
     def _red(self, string):
         """return a red string."""
         return ircutils.mircColor(string, "red")
@@ -108,15 +128,12 @@ class UrbanDictionary(callbacks.Plugin):
                 if key == "num":  # if number is >, default to config var.
                     if 0 <= value <= self.registryValue("maxNumberOfDefinitions"):
                         args["numberOfDefinitions"] = value
-        # build and fetch url.
-        url = "http://api.urbandictionary.com/v0/define?term=%s" % utils.web.urlquote(
-            optterm
-        )
+        # fetch the definitions.
         try:
-            html = utils.web.getUrl(url)
+            html = self._fetch(optterm)
         except utils.web.Error as e:
-            self.log.error("ERROR opening {0} message: {1}".format(url, e))
-            irc.reply("ERROR: could not open {0} message: {1}".format(url, e))
+            self.log.error("ERROR fetching {0} message: {1}".format(optterm, e))
+            irc.reply("ERROR: could not fetch {0} message: {1}".format(optterm, e))
             return
         # try parsing json.
         # irc.reply("{0}".format(self._repairjson(html.decode('utf-8'))))
@@ -207,6 +224,15 @@ class UrbanDictionary(callbacks.Plugin):
         ],
     )
 
+    def cachestats(self, irc, msg, args):
+        """takes no arguments
+
+        Shows the size and hit rate of the definition cache.
+        """
+        irc.reply(self.cache.format_stats())
+
+    cachestats = wrap(cachestats, ["owner"])
+
 
 Class = UrbanDictionary
 
@@ -75,6 +75,14 @@ conf.registerGlobalValue(
         """Reinterpret input string if WA API cannot understand. Best to leave false.""",
     ),
 )
+conf.registerGlobalValue(
+    WolframAlpha,
+    "cacheLifetime",
+    registry.NonNegativeInteger(
+        300,
+        """Time in seconds successful query results are cached. Answers that change over time, like prices or the time of day, can be this old. 0 disables the cache.""",
+    ),
+)
 conf.registerChannelValue(
     WolframAlpha,
     "disableANSI",
@@ -42,6 +42,7 @@ import supybot.plugins as plugins
 import supybot.ircutils as ircutils
 import supybot.callbacks as callbacks
 import re
+from . import responsecache
 
 try:
     from supybot.i18n import PluginInternationalization
@@ -59,10 +60,51 @@ class WolframAlpha(callbacks.Plugin):
 
     threaded = True
 
+    def __init__(self, irc):
+        self.__parent = super(WolframAlpha, self)
+        self.__parent.__init__(irc)
+        self.cache = responsecache.ResponseCache()
+        # Results fetched with a previous API key are not reused. Registry
+        # callbacks are removed by identity, so keep one bound method.
+        self._clearCache = self.cache.clear
+        self.registryValue("apiKey", value=False).addCallback(self._clearCache)
+
+    def die(self):
+        self.registryValue("apiKey", value=False).removeCallback(self._clearCache)
+        self.cache.close()
+        self.__parent.die()
+
     ######################
     # INTERNAL FUNCTIONS #
     ######################
 
+    def _fetch(self, query, units, reinterpret):
+        """Fetches a query from the API. Successful results are cached for
+        cacheLifetime."""
+        # Cached by query and options rather than by URL, which has the API key
+        key = (query, units, reinterpret)
+        page = self.cache.get(key)
+        if page is not None:
+            return page
+        urlArgs = {
+            "input": query,
+            "appid": self.registryValue("apiKey"),
+            "reinterpret": reinterpret,
+            "format": "plaintext",
+            "units": units,
+        }
+        url = "http://api.wolframalpha.com/v2/query?" + utils.web.urlencode(urlArgs)
+        page = utils.web.getUrl(url)
+        # Failed queries and API key errors come back with a 200 status too,
+        # only <queryresult success="true"> answers are cached.
+        try:
+            result = ElementTree.fromstring(page).attrib
+        except Exception:
+            return page
+        if result.get("success") == "true" and result.get("error") != "true":
+            self.cache.set(key, page, self.registryValue("cacheLifetime"))
+        return page
+
     def _red(self, s):
         return ircutils.mircColor(s, "red")
 
@@ -96,10 +138,7 @@ class WolframAlpha(callbacks.Plugin):
             return
         # first, url arguments, some of which getopts and config variables can manipulate.
         urlArgs = {
-            "input": optinput,
-            "appid": apiKey,
             "reinterpret": "false",
-            "format": "plaintext",
             "units": "nonmetric",
         }
         # check for config variables to manipulate URL arguments.
@@ -126,13 +165,12 @@ class WolframAlpha(callbacks.Plugin):
                     urlArgs["units"] = "metric"
                 if key == "reinterpret":
                     urlArgs["reinterpret"] = "true"
-        # build url and query.
-        url = "http://api.wolframalpha.com/v2/query?" + utils.web.urlencode(urlArgs)
+        # fetch the query.
         try:
-            page = utils.web.getUrl(url)
+            page = self._fetch(optinput, urlArgs["units"], urlArgs["reinterpret"])
         except Exception as e:
-            self.log.error("ERROR opening {0} message: {1}".format(url, e))
-            irc.reply("ERROR: Failed to open WolframAlpha API: {0}".format(url))
+            self.log.error("ERROR opening WolframAlpha API message: {0}".format(e))
+            irc.reply("ERROR: Failed to open WolframAlpha API: {0}".format(e))
             return
         # now try to process XML.
         try:
@@ -347,6 +385,15 @@ class WolframAlpha(callbacks.Plugin):
 
     btc = wrap(btc, ["float", "text"])
 
+    def cachestats(self, irc, msg, args):
+        """takes no arguments
+
+        Shows the size and hit rate of the query cache.
+        """
+        irc.reply(self.cache.format_stats())
+
+    cachestats = wrap(cachestats, ["owner"])
+
 
 Class = WolframAlpha
 
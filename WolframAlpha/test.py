@@ -41,5 +41,39 @@ class WolframAlphaTestCase(PluginTestCase):
         conf.supybot.plugins.WolframAlpha.disableANSI.setValue("True")
         self.assertResponse("wolframalpha --shortest 2+2", "2+2 :: 4")
 
+    def testCache(self):
+        # Only successful answers are cached, and a new API key empties the cache
+        answer = (
+            b"<queryresult success='true' error='false'>"
+            b"<pod title='Result' position='200' id='Result'><subpod>"
+            b"<plaintext>4</plaintext></subpod></pod></queryresult>"
+        )
+        failure = (
+            b"<queryresult success='false' error='true'><error><code>1</code>"
+            b"<msg>Invalid appid</msg></error></queryresult>"
+        )
+        pages = [failure, failure, answer, answer]
+        urls = []
+
+        def getUrl(url):
+            urls.append(url)
+            return pages[len(urls) - 1]
+
+        getUrl_ = utils.web.getUrl
+        utils.web.getUrl = getUrl
+        try:
+            conf.supybot.plugins.WolframAlpha.apiKey.setValue("key")
+            self.assertNotError("wolframalpha 2+2")
+            self.assertNotError("wolframalpha 2+2")
+            self.assertEqual(len(urls), 2)
+            self.assertRegexp("wolframalpha 2+2", "4")
+            self.assertRegexp("wolframalpha 2+2", "4")
+            self.assertEqual(len(urls), 3)
+            conf.supybot.plugins.WolframAlpha.apiKey.setValue("other key")
+            self.assertRegexp("wolframalpha 2+2", "4")
+            self.assertEqual(len(urls), 4)
+        finally:
+            utils.web.getUrl = getUrl_
+
 
 # vim:set shiftwidth=4 tabstop=4 expandtab textwidth=79:
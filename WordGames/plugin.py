@@ -29,6 +29,7 @@
 ###
 
 from operator import add, mul
+import os
 import random
 import re
 import time
@@ -128,6 +129,29 @@ class Difficulty:
             raise WordGamesError("Unrecognized difficulty value: %s" % name)
 
 
+class WordList(object):
+    "The words of a dictionary file, shared read-only by all the games."
+
+    def __init__(self, path, regexp, mtime, words):
+        self.path = path
+        self.regexp = regexp
+        self.mtime = mtime
+        self.words = words
+        self._trie = None
+
+    def is_current(self, path, regexp, mtime):
+        "Is this the word list of the given dictionary file and regexp?"
+        return (self.path, self.regexp, self.mtime) == (path, regexp, mtime)
+
+    def trie(self):
+        "Return the prefix tree of the words, built the first time it is needed."
+        if self._trie is None:
+            wordtrie = Trie()
+            list(map(wordtrie.add, self.words))
+            self._trie = wordtrie
+        return self._trie
+
+
 class WordGames(callbacks.Plugin):
     "Please see the README file to configure and use this plugin."
 
@@ -156,6 +180,7 @@ class WordGames(callbacks.Plugin):
         self.parent = super(WordGames, self)
         self.parent.__init__(irc)
         self.games = {}
+        self.wordlist = None
 
     def die(self):
         for channel, game in self.games.items():
@@ -285,16 +310,26 @@ class WordGames(callbacks.Plugin):
         return my_game
 
     def _get_words(self):
+        "Return the word list, reading the dictionary file only if it changed."
+        pattern = self.registryValue("wordRegexp")
         try:
-            regexp = re.compile(self.registryValue("wordRegexp"))
+            regexp = re.compile(pattern)
         except Exception as e:
             raise WordGamesError("Bad value for wordRegexp: %s" % str(e))
         path = self.registryValue("wordFile")
         try:
-            wordFile = open(path)
+            mtime = os.path.getmtime(path)
         except Exception as e:
             raise WordGamesError("Unable to open word file: %s" % path)
-        return list(filter(regexp.match, list(map(str.strip, wordFile.readlines()))))
+        if not (self.wordlist and self.wordlist.is_current(path, pattern, mtime)):
+            try:
+                wordFile = open(path)
+            except Exception:
+                raise WordGamesError("Unable to open word file: %s" % path)
+            with wordFile:
+                words = tuple(filter(regexp.match, map(str.strip, wordFile)))
+            self.wordlist = WordList(path, pattern, mtime, words)
+        return self.wordlist
 
     def _start_game(self, Game, irc, channel, *args, **kwargs):
         try:
@@ -303,8 +338,8 @@ class WordGames(callbacks.Plugin):
                 irc.reply("A word game is already running here.")
                 game.show()
             else:
-                words = self._get_words()
-                self.games[channel] = Game(words, irc, channel, *args, **kwargs)
+                wordlist = self._get_words()
+                self.games[channel] = Game(wordlist, irc, channel, *args, **kwargs)
                 self.games[channel].start()
         except WordGamesError as e:
             # Get rid of the game in case it's in an indeterminate state
@@ -327,8 +362,9 @@ class WordGames(callbacks.Plugin):
 class BaseGame(object):
     "Base class for the games in this plugin."
 
-    def __init__(self, words, irc, channel):
-        self.words = words
+    def __init__(self, wordlist, irc, channel):
+        self.wordlist = wordlist
+        self.words = wordlist.words
         self.irc = irc
         self.channel = channel
         self.running = False
@@ -528,10 +564,10 @@ class Boggle(BaseGame):
         def sorted_results(self):
             return sorted(list(self.player_results.values()), reverse=True)
 
-    def __init__(self, words, irc, channel, nick, delay, duration, difficulty):
+    def __init__(self, wordlist, irc, channel, nick, delay, duration, difficulty):
         # See tech note in the WordGames class.
         self.parent = super(Boggle, self)
-        self.parent.__init__(words, irc, channel)
+        self.parent.__init__(wordlist, irc, channel)
         self.delay = delay
         self.duration = duration
         self.difficulty = difficulty
@@ -795,8 +831,7 @@ class Boggle(BaseGame):
     def _generate_board(self):
         "Generate several boards and return the most bountiful board."
         attempts = 5
-        wordtrie = Trie()
-        list(map(wordtrie.add, self.words))
+        wordtrie = self.wordlist.trie()
         boards = [
             BoggleBoard(wordtrie, Boggle.BOARD_SIZE, self.min_length)
             for i in range(0, attempts)
@@ -909,10 +944,10 @@ class WordChain(BaseGame):
             self.word_lengths = word_lengths
             self.num_solutions = num_solutions
 
-    def __init__(self, words, irc, channel, settings):
+    def __init__(self, wordlist, irc, channel, settings):
         # See tech note in the WordGames class.
         self.parent = super(WordChain, self)
-        self.parent.__init__(words, irc, channel)
+        self.parent.__init__(wordlist, irc, channel)
         self.settings = settings
         self.solution_length = random.choice(settings.puzzle_lengths)
         self.solution = []
@@ -1084,7 +1119,7 @@ class WordChain(BaseGame):
 
 
 class WordShrink(WordChain):
-    def __init__(self, words, irc, channel, difficulty):
+    def __init__(self, wordlist, irc, channel, difficulty):
         assert difficulty in ["easy", "medium", "hard", "evil"], "Bad mojo."
         settings = {
             "easy": WordChain.Settings([4], list(range(3, 9)), list(range(15, 100))),
@@ -1092,7 +1127,7 @@ class WordShrink(WordChain):
             "hard": WordChain.Settings([6], list(range(4, 12)), list(range(4, 12))),
             "evil": WordChain.Settings([7], list(range(4, 15)), list(range(1, 10))),
         }
-        super(WordShrink, self).__init__(words, irc, channel, settings[difficulty])
+        super(WordShrink, self).__init__(wordlist, irc, channel, settings[difficulty])
 
     def build_word_map(self):
         "Build a map of word -> [word1, word2] for all valid transitions."
@@ -1127,7 +1162,7 @@ class WordShrink(WordChain):
 
 
 class WordTwist(WordChain):
-    def __init__(self, words, irc, channel, difficulty):
+    def __init__(self, wordlist, irc, channel, difficulty):
         assert difficulty in ["easy", "medium", "hard", "evil"], "Bad mojo."
         settings = {
             "easy": WordChain.Settings([4], [3, 4], list(range(10, 100))),
@@ -1135,7 +1170,7 @@ class WordTwist(WordChain):
             "hard": WordChain.Settings([6], [4, 5, 6], list(range(2, 5))),
             "evil": WordChain.Settings([7], [4, 5, 6], list(range(1, 3))),
         }
-        super(WordTwist, self).__init__(words, irc, channel, settings[difficulty])
+        super(WordTwist, self).__init__(wordlist, irc, channel, settings[difficulty])
 
     def build_word_map(self):
         "Build the map of word -> [word1, word2, ...] for all valid pairs."
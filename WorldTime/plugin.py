@@ -29,11 +29,13 @@
 ###
 
 # my libs
+import os
 import sys
 import json
 import time
 import pickle
 import pendulum
+from . import storage
 
 # supybot libs
 import supybot.utils as utils
@@ -41,7 +43,6 @@ from supybot.commands import *
 import supybot.plugins as plugins
 import supybot.ircutils as ircutils
 import supybot.callbacks as callbacks
-import supybot.world as world
 import supybot.conf as conf
 import supybot.log as log
 
@@ -75,31 +76,27 @@ class WorldTime(callbacks.Plugin):
     def __init__(self, irc):
         self.__parent = super(WorldTime, self)
         self.__parent.__init__(irc)
-        self.db = {}
-        self._loadDb()
-        world.flushers.append(self._flushDb)
-
-    def _loadDb(self):
-        """Loads the (flatfile) database mapping ident@hosts to timezones."""
-
-        try:
-            with open(filename, "rb") as f:
-                self.db = pickle.load(f)
-        except Exception as e:
-            self.log.debug("WorldTime: Unable to load pickled database: %s", e)
+        self.storage = storage.Storage(
+            conf.supybot.directories.data.dirize("WorldTime.sqlite"), "WorldTime"
+        )
+        self.db = self.storage.table(
+            "locations", (("identhost", "TEXT"), ("location", "TEXT")), ("identhost",)
+        )
+        self.storage.migrate("WorldTime.db", self._migrateDb)
 
-    def _flushDb(self):
-        """Flushes the (flatfile) database mapping ident@hosts to timezones."""
+    def _migrateDb(self):
+        """Imports the (flatfile) database mapping ident@hosts to timezones."""
 
-        try:
-            with open(filename, "wb") as f:
-                pickle.dump(self.db, f, 2)
-        except Exception as e:
-            self.log.warning("WorldTime: Unable to write pickled database: %s", e)
+        if not os.path.exists(filename):
+            return
+        with open(filename, "rb") as f:
+            db = pickle.load(f)
+        self.db.upsert_many(
+            {"identhost": ih, "location": location} for (ih, location) in db.items()
+        )
 
     def die(self):
-        self._flushDb()
-        world.flushers.remove(self._flushDb)
+        self.storage.close()
         self.__parent.die()
 
     ##################
@@ -202,7 +199,10 @@ class WorldTime(callbacks.Plugin):
                 else:
                     host = msg.prefix
                 ih = host.split("!")[1]
-                location = self.db[ih]
+                row = self.db.get(ih)
+                if row is None:
+                    raise KeyError(ih)
+                location = row["location"]
             except KeyError:
                 irc.error(
                     "No location for %s is set. Use the 'set' command "
@@ -256,7 +256,7 @@ class WorldTime(callbacks.Plugin):
 
         Sets the location for your current ident@host to <location>."""
         ih = msg.prefix.split("!")[1]
-        self.db[ih] = timezone
+        self.db.upsert({"identhost": ih, "location": timezone})
         irc.replySuccess()
 
     set = wrap(set, ["text"])
@@ -266,11 +266,10 @@ class WorldTime(callbacks.Plugin):
 
         Unsets the location for your current ident@host."""
         ih = msg.prefix.split("!")[1]
-        try:
-            del self.db[ih]
-            irc.replySuccess()
-        except KeyError:
+        if self.db.get(ih) is None:
             irc.error("No entry for %s exists." % ircutils.bold("*!" + ih), Raise=True)
+        self.db.delete(identhost=ih)
+        irc.replySuccess()
 
 
 Class = WorldTime
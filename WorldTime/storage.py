@@ -0,0 +1,261 @@
+###
+# Copyright (c) 2020, oddluck <oddluck@riseup.net>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#   * Redistributions of source code must retain the above copyright notice,
+#     this list of conditions, and the following disclaimer.
+#   * Redistributions in binary form must reproduce the above copyright notice,
+#     this list of conditions, and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#   * Neither the name of the author of this software nor the name of
+#     contributors to this software may be used to endorse or promote products
+#     derived from this software without specific prior written consent.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+###
+
+
+
+"""
+storage: SQLite tables for plugin state, with batched commits.
+"""
+
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+
+import supybot.log as log
+import supybot.schedule as schedule
+import supybot.world as world
+
+# Seconds between commits of pending writes
+FLUSH_INTERVAL = 10
+
+
+class Table:
+    """
+    Table with typed columns and a primary key, read and written as dicts.
+    Columns declared as JSON hold any JSON-serializable value.
+    """
+
+    def __init__(self, storage, name, columns, key):
+        self.storage = storage
+        self.name = name
+        self.columns = tuple(column for (column, _) in columns)
+        self.key = tuple(key)
+        self._json = set()
+        definitions = []
+        for (column, type) in columns:
+            if type.split()[0].upper() == "JSON":
+                self._json.add(column)
+                # A declared type of JSON would get numeric affinity
+                type = "TEXT" + type[4:]
+            definitions.append("{0} {1}".format(column, type))
+        definitions.append("PRIMARY KEY ({0})".format(", ".join(self.key)))
+        storage.execute(
+            "CREATE TABLE IF NOT EXISTS {0} ({1})".format(name, ", ".join(definitions))
+        )
+        self._upserts = {}
+
+    def upsert(self, row):
+        """
+        Inserts row, or updates the columns it holds if a row with the same key
+        exists. row must hold every key column.
+        """
+        columns = tuple(row)
+        sql = self._upserts.get(columns)
+        if sql is None:
+            values = [column for column in columns if column not in self.key]
+            if values:
+                update = "DO UPDATE SET " + ", ".join(
+                    "{0} = excluded.{0}".format(column) for column in values
+                )
+            else:
+                update = "DO NOTHING"
+            sql = self._upserts[columns] = (
+                "INSERT INTO {0} ({1}) VALUES ({2}) ON CONFLICT ({3}) {4}".format(
+                    self.name,
+                    ", ".join(columns),
+                    ", ".join("?" * len(columns)),
+                    ", ".join(self.key),
+                    update,
+                )
+            )
+        self.storage.execute(sql, [self._encode(c, v) for (c, v) in row.items()])
+
+    def upsert_many(self, rows):
+        with self.storage._lock:
+            for row in rows:
+                self.upsert(row)
+
+    def get(self, *key):
+        """
+        Returns the row with the given key values, or None
+        """
+        rows = self.select(**dict(zip(self.key, key)))
+        return rows[0] if rows else None
+
+    def select(self, order=None, limit=None, **where):
+        """
+        Returns the rows whose columns equal the keyword arguments, as dicts,
+        sorted by the SQL expression order and at most limit of them
+        """
+        sql = "SELECT {0} FROM {1}".format(", ".join(self.columns), self.name)
+        (clause, params) = self._where(where)
+        sql += clause
+        if order:
+            sql += " ORDER BY " + order
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self.storage.query(sql, params)
+        return [self._decode(row) for row in rows]
+
+    def delete(self, **where):
+        """
+        Deletes the rows whose columns equal the keyword arguments
+        """
+        (clause, params) = self._where(where)
+        self.storage.execute("DELETE FROM {0}{1}".format(self.name, clause), params)
+
+    def _where(self, where):
+        if not where:
+            return ("", [])
+        clause = " WHERE " + " AND ".join("{0} = ?".format(c) for c in where)
+        return (clause, [self._encode(c, v) for (c, v) in where.items()])
+
+    def _encode(self, column, value):
+        if column in self._json:
+            return json.dumps(value)
+        return value
+
+    def _decode(self, row):
+        row = dict(zip(self.columns, row))
+        for column in self._json:
+            if row[column] is not None:
+                row[column] = json.loads(row[column])
+        return row
+
+
+class Storage:
+    """
+    SQLite database in WAL mode holding the tables of a plugin. Writes are
+    committed in batches every flush_interval seconds, when the bot flushes
+    its databases and when the storage is closed.
+    """
+
+    def __init__(self, filename, name, flush_interval=FLUSH_INTERVAL):
+        self.filename = filename
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(filename, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, time REAL)"
+        )
+        self.conn.commit()
+        self.tables = {}
+        self._event = None
+        if flush_interval:
+            self._event = "{0}.flush".format(name)
+            schedule.addPeriodicEvent(
+                self.flush, flush_interval, name=self._event, now=False
+            )
+        world.flushers.append(self.flush)
+
+    def table(self, name, columns, key):
+        """
+        Creates the table if needed and returns it. columns is a sequence of
+        (name, SQL type) pairs, key the names of the primary key columns.
+        """
+        with self._lock:
+            table = self.tables[name] = Table(self, name, columns, key)
+            return table
+
+    def execute(self, sql, params=()):
+        """
+        Runs a statement that changes data, committed at the next flush
+        """
+        with self._lock:
+            self.conn.execute(sql, params)
+
+    def query(self, sql, params=()):
+        """
+        Runs a query and returns all its rows, including pending writes
+        """
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def migrate(self, name, function):
+        """
+        Runs function once, in a transaction, to import data from an older
+        format. A migration that raises is rolled back and retried at the
+        next start.
+        """
+        with self._lock:
+            self.flush()
+            done = self.conn.execute(
+                "SELECT 1 FROM migrations WHERE name = ?", (name,)
+            ).fetchone()
+            if done:
+                return False
+            try:
+                function()
+            except Exception as e:
+                self.conn.rollback()
+                log.error("Unable to migrate %s to %s: %s", name, self.filename, e)
+                return False
+            self.conn.execute(
+                "INSERT INTO migrations (name, time) VALUES (?, ?)", (name, time.time())
+            )
+            self.conn.commit()
+            return True
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Runs the block alone, so that it can read rows and write them back
+        without other writes in between, and commits its writes at once when
+        it ends. The writes are rolled back if the block raises.
+        """
+        with self._lock:
+            self.flush()
+            try:
+                yield self
+            except Exception:
+                self.conn.rollback()
+                raise
+            self.flush()
+
+    def flush(self):
+        """
+        Commits pending writes
+        """
+        with self._lock:
+            if self.conn.in_transaction:
+                self.conn.commit()
+
+    def close(self):
+        if self._event:
+            schedule.removeEvent(self._event)
+            self._event = None
+        if self.flush in world.flushers:
+            world.flushers.remove(self.flush)
+        with self._lock:
+            self.flush()
+            self.conn.close()
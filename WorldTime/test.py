@@ -28,6 +28,9 @@
 # POSSIBILITY OF SUCH DAMAGE.
 ###
 
+import os
+import pickle
+
 from supybot.test import *
 
 
@@ -52,4 +55,27 @@ class WorldTimeTestCase(PluginTestCase):
         self.assertError("unset")  # But only once.
 
 
+class WorldTimeMigrationTestCase(PluginTestCase):
+    plugins = ("WorldTime",)
+    cleanDataDir = False
+
+    def setUp(self):
+        # Start from the pickled locations of an older version
+        data = conf.supybot.directories.data()
+        shutil.rmtree(data)
+        os.makedirs(data)
+        with open(os.path.join(data, "WorldTime.db"), "wb") as f:
+            pickle.dump({"bar@baz": "Vancouver, BC", "qux@quux": "Paris"}, f)
+        PluginTestCase.setUp(self)
+        self.prefix = "foo!bar@baz"
+
+    def testLocationsAreMigrated(self):
+        cb = self.irc.getCallback("WorldTime")
+        self.assertEqual(cb.db.get("bar@baz")["location"], "Vancouver, BC")
+        self.assertEqual(cb.db.get("qux@quux")["location"], "Paris")
+        self.assertNotError("unset")
+        self.assertError("unset")
+        self.assertEqual(cb.db.get("qux@quux")["location"], "Paris")
+
+
 # vim:set shiftwidth=4 tabstop=4 expandtab textwidth=79:
@@ -102,4 +102,46 @@ conf.registerChannelValue(
     YouTube, "useBold", registry.Boolean(True, _("""Use bold in replies"""))
 )
 
+conf.registerGlobalValue(
+    YouTube,
+    "searchCacheLifetime",
+    registry.NonNegativeInteger(
+        86400,
+        _(
+            """
+            Time in seconds the video found for a search is cached. 0 disables
+            the cache.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    YouTube,
+    "videoCacheLifetime",
+    registry.NonNegativeInteger(
+        300,
+        _(
+            """
+            Time in seconds video details and statistics are cached. 0 disables
+            the cache.
+            """
+        ),
+    ),
+)
+
+conf.registerGlobalValue(
+    YouTube,
+    "persistentCache",
+    registry.Boolean(
+        False,
+        _(
+            """
+            Also keep cached searches and videos in an SQLite database in the data
+            directory, so they survive restarts. Requires reloading the plugin.
+            """
+        ),
+    ),
+)
+
 # vim:set shiftwidth=4 tabstop=4 expandtab textwidth=79:
@@ -35,8 +35,12 @@ import supybot.ircutils as ircutils
 import supybot.ircmsgs as ircmsgs
 import supybot.callbacks as callbacks
 import supybot.log as log
+import supybot.conf as conf
+import supybot.schedule as schedule
 from string import Template
 import datetime, json, re
+from . import responsecache
+from . import templatecache
 
 try:
     from supybot.i18n import PluginInternationalization
@@ -48,38 +52,96 @@ except ImportError:
     _ = lambda x: x
 
 
+def compile_template(template):
+    """
+    Converts the {{variable}} placeholders of a template to $variable
+    """
+    return Template(template.replace("{{", "$").replace("}}", ""))
+
+
 class YouTube(callbacks.Plugin):
     """Queries OMDB database for information about YouTube titles"""
 
     threaded = True
 
+    def __init__(self, irc):
+        self.__parent = super(YouTube, self)
+        self.__parent.__init__(irc)
+        filename = None
+        if self.registryValue("persistentCache"):
+            filename = conf.supybot.directories.data.dirize("YouTube.cache.db")
+        self.cache = responsecache.ResponseCache(filename=filename)
+        # Searches cost 100 units of the daily API quota, video lookups 1
+        self.search = self.cache.wrap(
+            self.search, lambda: self.registryValue("searchCacheLifetime")
+        )
+        self.get_video = self.cache.wrap(
+            self.get_video, lambda: self.registryValue("videoCacheLifetime")
+        )
+        self.vacuum_event = None
+        if filename:
+            # Expired rows are only replaced on a miss, so drop them hourly
+            self.vacuum_event = schedule.addPeriodicEvent(
+                self.cache.vacuum, 3600, name="YouTube.cache.vacuum", now=False
+            )
+        self.templates = templatecache.TemplateCache(compile_template)
+
+    def die(self):
+        if self.vacuum_event:
+            schedule.removeEvent(self.vacuum_event)
+        self.cache.close()
+        self.templates.close()
+        self.__parent.die()
+
     def dosearch(self, query, channel):
-        apikey = self.registryValue("developerKey")
         safe_search = self.registryValue("safeSearch", channel)
         sort_order = self.registryValue("sortOrder", channel)
         video_id = None
+        try:
+            video_id = self.search(query, safe_search, sort_order)
+        except:
+            log.error(
+                "YouTube: Error retrieving data from API"
+            )
+        return video_id
+
+    def search(self, query, safe_search, sort_order):
+        """
+        Returns the ID of the first video found for query, cached for
+        searchCacheLifetime
+        """
         opts = {
             "q": query,
             "part": "snippet",
             "maxResults": "1",
             "order": sort_order,
-            "key": apikey,
+            "key": self.registryValue("developerKey"),
             "safeSearch": safe_search,
             "type": "video",
         }
         api_url = "https://www.googleapis.com/youtube/v3/search?{0}".format(
             utils.web.urlencode(opts)
         )
-        try:
-            log.debug("YouTube: requesting %s" % (api_url))
-            request = utils.web.getUrl(api_url).decode()
-            response = json.loads(request)
-            video_id = response["items"][0]["id"]["videoId"]
-        except:
-            log.error(
-                "YouTube: Error retrieving data from API"
-            )
-        return video_id
+        log.debug("YouTube: requesting %s" % (api_url))
+        request = utils.web.getUrl(api_url).decode()
+        response = json.loads(request)
+        return response["items"][0]["id"]["videoId"]
+
+    def get_video(self, video_id):
+        """
+        Returns the API response for a video, cached for videoCacheLifetime
+        """
+        opts = {
+            "part": "snippet,statistics,contentDetails",
+            "maxResults": 1,
+            "key": self.registryValue("developerKey"),
+            "id": video_id,
+        }
+        opts = utils.web.urlencode(opts)
+        api_url = "https://www.googleapis.com/youtube/v3/videos?%s" % (opts)
+        log.debug("YouTube: requesting %s" % (api_url))
+        request = utils.web.getUrl(api_url).decode()
+        return json.loads(request)
 
     def get_duration_from_seconds(self, duration_seconds):
         m, s = divmod(duration_seconds, 60)
@@ -134,25 +196,13 @@ class YouTube(callbacks.Plugin):
         if not apikey:
             irc.reply("Error: You need to set an API key to use this plugin.")
             return
-        template = self.registryValue("template", msg.channel)
-        template = template.replace("{{", "$").replace("}}", "")
-        template = Template(template)
+        template = self.templates.get_registry(self, "template", msg.channel)
         response = None
         title = None
         video_id = self.dosearch(query, msg.channel)
         if video_id:
             log.debug("YouTube: got video id: %s" % video_id)
-            opts = {
-                "part": "snippet,statistics,contentDetails",
-                "maxResults": 1,
-                "key": apikey,
-                "id": video_id,
-            }
-            opts = utils.web.urlencode(opts)
-            api_url = "https://www.googleapis.com/youtube/v3/videos?%s" % (opts)
-            log.debug("YouTube: requesting %s" % (api_url))
-            request = utils.web.getUrl(api_url).decode()
-            response = json.loads(request)
+            response = self.get_video(video_id)
             try:
                 if response["pageInfo"]["totalResults"] > 0:
                     items = response["items"]
@@ -215,6 +265,15 @@ class YouTube(callbacks.Plugin):
 
     yt = wrap(yt, ["text"])
 
+    def cachestats(self, irc, msg, args):
+        """takes no arguments
+
+        Shows the size and hit rate of the search and video cache.
+        """
+        irc.reply(self.cache.format_stats())
+
+    cachestats = wrap(cachestats, ["owner"])
+
 
 Class = YouTube
 